@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware", #corsheaders at the top
+    "geobackend_api.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -90,6 +91,55 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "geobackend.wsgi.application"
+ASGI_APPLICATION = "geobackend.asgi.application"
+
+# serve /calculate-wellbore with the asyncio view; enable when running under ASGI
+USE_ASYNC_VIEWS = env.bool('DJANGO_USE_ASYNC_VIEWS', default=False)
+
+# where wellbore calculations run: 'thread' (inline for the sync view, a thread pool
+# for the async and batch views) or 'process' (a pre-warmed process pool for all views)
+CALCULATION_EXECUTOR = env.str('CALCULATION_EXECUTOR', default='thread')
+CALCULATION_MAX_WORKERS = env.int('CALCULATION_MAX_WORKERS', default=4)
+# calculations waiting for a worker beyond this are rejected with 503
+CALCULATION_MAX_QUEUE = env.int('CALCULATION_MAX_QUEUE', default=32)
+# seconds; a calculation exceeding it is reported as 504
+CALCULATION_TIMEOUT = env.float('CALCULATION_TIMEOUT', default=60)
+# running + queued calculations of batch and sweep requests; they wait for one of these
+# slots instead of being rejected, and the remaining slots stay free for single-site requests
+CALCULATION_BULK_SLOTS = env.int('CALCULATION_BULK_SLOTS', default=max(CALCULATION_MAX_WORKERS // 2, 1))
+# pre-built GeoDrillCalcInterface instances reused per worker process (0 disables)
+CALCULATION_INTERFACE_POOL_SIZE = env.int('CALCULATION_INTERFACE_POOL_SIZE', default=CALCULATION_MAX_WORKERS)
+CALCULATION_PROCESS_START_METHOD = env.str('CALCULATION_PROCESS_START_METHOD', default='spawn')
+
+# calculation results per session: 'model' (WellBoreCalculationResult table) or 'redis'
+# (compressed, expiring after RESULT_STORE_TTL seconds, by default the session lifetime)
+RESULT_STORE = env.str('RESULT_STORE', default='model')
+RESULT_STORE_TTL = env.int('RESULT_STORE_TTL', default=None)
+# model store: rows are upserted by a background writer in batches;
+# when RESULT_WRITE_QUEUE_SIZE writes are pending, RESULT_WRITE_OVERFLOW decides:
+# 'sync' (write on the request thread), 'drop_newest' or 'drop_oldest'
+RESULT_WRITE_BEHIND = env.bool('RESULT_WRITE_BEHIND', default=True)
+RESULT_WRITE_QUEUE_SIZE = env.int('RESULT_WRITE_QUEUE_SIZE', default=1000)
+RESULT_WRITE_BATCH_SIZE = env.int('RESULT_WRITE_BATCH_SIZE', default=100)
+RESULT_WRITE_FLUSH_INTERVAL = env.float('RESULT_WRITE_FLUSH_INTERVAL', default=0.5)
+RESULT_WRITE_OVERFLOW = env.str('RESULT_WRITE_OVERFLOW', default='sync')
+# Cache-Control of GET /calculate-wellbore/result; clients revalidate with the ETag
+RESULT_CACHE_CONTROL = env.str('RESULT_CACHE_CONTROL', default='private, no-cache')
+
+# per-stage request timings (validation, bbox, wms_*, parse, calculation, serialization,
+# persistence) sent as a Server-Timing header and recorded as latency histograms
+REQUEST_TIMING_ENABLED = env.bool('REQUEST_TIMING_ENABLED', default=True)
+SERVER_TIMING_HEADER = env.bool('SERVER_TIMING_HEADER', default=True)
+# Prometheus metrics at /metrics (needs prometheus_client); per process, so scrape each worker
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+# clients allowed to scrape /metrics; loopback only unless listed, an empty list denies all
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
+# /calculate-wellbore/batch limits
+BATCH_MAX_SITES = env.int('BATCH_MAX_SITES', default=500)
+BATCH_FETCH_CONCURRENCY = env.int('BATCH_FETCH_CONCURRENCY', default=8)
+# /calculate-wellbore/sweep: maximum number of input combinations per request
+SWEEP_MAX_COMBINATIONS = env.int('SWEEP_MAX_COMBINATIONS', default=256)
 
 
 # Database
@@ -103,11 +153,17 @@ DATABASES = {
 }
 
 REST_FRAMEWORK = {
+    # orjson: numpy/pandas aware, and embeds pre-encoded calculation results as is
+    'DEFAULT_RENDERER_CLASSES': [
+        'geobackend_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '5/second'
+        # raise for load tests, e.g. ANON_THROTTLE_RATE=10000/second
+        'anon': env.str('ANON_THROTTLE_RATE', default='5/second')
     }
 }
 
@@ -156,12 +212,29 @@ if DEBUG:
     INTERNAL_IPS = [
         '127.0.0.1'
     ]
+# the test runner turns DEBUG off, so the toolbar stays hidden there anyway
+DEBUG_TOOLBAR_CONFIG = {
+    'IS_RUNNING_TESTS': False,
+}
 
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db' 
+# sessions live in the Redis cache by default, so creating one is not a database write;
+# geobackend_api.session_backends.cached_db also keeps them in the database.
+# These engines delete a session's results with it; run clear_expired_results for expired ones
+SESSION_ENGINE = env.str('SESSION_ENGINE', default='geobackend_api.session_backends.cache')
+SESSION_CACHE_ALIAS = 'default'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
 # Logging configuration
+# records queued for the log writer thread; further records are dropped while it is full
+LOG_QUEUE_SIZE = env.int('LOG_QUEUE_SIZE', default=10000)
+# request payloads are logged for LOG_PAYLOAD_SAMPLE_RATE of requests (0 to 1),
+# cut to LOG_PAYLOAD_MAX_CHARS characters
+LOG_PAYLOAD_SAMPLE_RATE = env.float('LOG_PAYLOAD_SAMPLE_RATE', default=0.01)
+LOG_PAYLOAD_MAX_CHARS = env.int('LOG_PAYLOAD_MAX_CHARS', default=500)
+# level of the geobackend_api loggers; records below it are discarded before they are
+# formatted or queued, so DEBUG costs request time even though only INFO reaches the files
+LOG_LEVEL = env.str('LOG_LEVEL', default='INFO')
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -187,26 +260,90 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        # loggers only enqueue; a background thread writes to the console and file
+        'queue': {
+            '()': 'geobackend_api.utils.logging_utils.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'queue_size': LOG_QUEUE_SIZE,
+            'level': LOG_LEVEL,
+        },
     },
     'root': {
-        'handlers': ['file', 'console'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
-            'propagate': True,
+            'propagate': False,
         },
         'geobackend_api': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
 }
 
 
+# GeoServer WMS client
+# WMS endpoint; http://127.0.0.1:8081/geoserver/vvg/wms with serve_stub_wms for load tests
+WMS_BASE_URL = env.str('WMS_BASE_URL', default='https://geo.cerdi.edu.au/geoserver/vvg/wms')
+# connect/read timeouts in seconds; pool sizes are per process
+WMS_CONNECT_TIMEOUT = env.float('WMS_CONNECT_TIMEOUT', default=5)
+WMS_READ_TIMEOUT = env.float('WMS_READ_TIMEOUT', default=30)
+WMS_POOL_CONNECTIONS = env.int('WMS_POOL_CONNECTIONS', default=4)
+WMS_POOL_MAXSIZE = env.int('WMS_POOL_MAXSIZE', default=16)
+# spatial quantization of WMS queries: points are snapped to the source raster
+# grid (EPSG:3857) and bbox/width/height are canonicalised, so all points in one
+# cell share one upstream request and cache entry. min_resolution and pixels
+# from the request are ignored while enabled.
+WMS_SPATIAL_QUANTIZATION = env.bool('WMS_SPATIAL_QUANTIZATION', default=False)
+WMS_GRID_CELL_SIZE = env.float('WMS_GRID_CELL_SIZE', default=100)
+WMS_GRID_ORIGIN = (env.float('WMS_GRID_ORIGIN_X', default=0.0),
+                   env.float('WMS_GRID_ORIGIN_Y', default=0.0))
+WMS_CANONICAL_PIXELS = (101, 101)
+# single-flight: concurrent misses for one WMS key are fetched once; other workers
+# poll the cache while a short Redis lock is held (seconds)
+WMS_SINGLE_FLIGHT_LOCK_TIMEOUT = env.float('WMS_SINGLE_FLIGHT_LOCK_TIMEOUT', default=WMS_CONNECT_TIMEOUT + WMS_READ_TIMEOUT)
+WMS_SINGLE_FLIGHT_WAIT_TIMEOUT = env.float('WMS_SINGLE_FLIGHT_WAIT_TIMEOUT', default=WMS_CONNECT_TIMEOUT + WMS_READ_TIMEOUT)
+WMS_SINGLE_FLIGHT_POLL_INTERVAL = env.float('WMS_SINGLE_FLIGHT_POLL_INTERVAL', default=0.05)
+# precomputed-first mode: answer depth tables and watertable depths from the local
+# grid store built by `manage.py precompute_aquifer_grid`, falling back to the WMS
+# outside its coverage
+PRECOMPUTED_FIRST = env.bool('PRECOMPUTED_FIRST', default=False)
+PRECOMPUTED_STORE_PATH = env.str('PRECOMPUTED_STORE_PATH', default=str(BASE_DIR / 'aquifer_grid.sqlite3'))
+# watertable depth source: 'wms' (GetFeatureInfo per request) or 'raster', which samples
+# the memory-mapped raster built by `manage.py build_watertable_raster` and falls back
+# to the WMS outside its coverage
+WATERTABLE_SOURCE = env.str('WATERTABLE_SOURCE', default='wms')
+WATERTABLE_RASTER_PATH = env.str('WATERTABLE_RASTER_PATH', default=str(BASE_DIR / 'watertable_depth.npy'))
+# seconds between checks for a raster published by a new build_watertable_raster run
+WATERTABLE_RASTER_CHECK_INTERVAL = env.float('WATERTABLE_RASTER_CHECK_INTERVAL', default=30)
+WATERTABLE_WCS_URL = env.str('WATERTABLE_WCS_URL', default='https://geo.cerdi.edu.au/geoserver/vvg/wcs')
+# HTML parser for GetFeatureInfo responses: 'fast' (streaming tokenizer) or 'bs4'
+WMS_HTML_PARSER = env.str('WMS_HTML_PARSER', default='fast')
+# async clients, used by the ASGI request path
+WMS_ASYNC_MAX_CONNECTIONS = env.int('WMS_ASYNC_MAX_CONNECTIONS', default=100)
+# threads running the watertable fetch next to the aquifer layer fetches of single-site
+# requests, one per request in flight; match the number of requests the server handles at once
+WMS_FETCH_MAX_WORKERS = env.int('WMS_FETCH_MAX_WORKERS', default=32)
+
+# WMS cache entries (parsed products, compact JSON framed with a format version)
+CACHE_COMPRESSION = env.bool('CACHE_COMPRESSION', default=True)
+CACHE_COMPRESSION_MIN_BYTES = env.int('CACHE_COMPRESSION_MIN_BYTES', default=512)
+# memoized wellbore calculation results, keyed on a hash of the canonicalised inputs;
+# payloads larger than CALCULATION_CACHE_MAX_BYTES are not stored
+CALCULATION_CACHE_ENABLED = env.bool('CALCULATION_CACHE_ENABLED', default=True)
+CALCULATION_CACHE_TTL = env.int('CALCULATION_CACHE_TTL', default=3600 * 24)
+CALCULATION_CACHE_MAX_BYTES = env.int('CALCULATION_CACHE_MAX_BYTES', default=256 * 1024)
+CALCULATION_CACHE_FLOAT_DIGITS = env.int('CALCULATION_CACHE_FLOAT_DIGITS', default=12)
+# in-process LRU tier in front of Redis; entries expire after LOCAL_CACHE_TTL seconds
+LOCAL_CACHE_MAX_ENTRIES = env.int('LOCAL_CACHE_MAX_ENTRIES', default=1024)
+LOCAL_CACHE_TTL = env.float('LOCAL_CACHE_TTL', default=300)
+
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
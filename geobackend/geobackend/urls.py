@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from geobackend_api.views import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/', include('geobackend_api.urls')),
+    path('metrics', metrics_view),
     path('__debug__/', include('debug_toolbar.urls')),
 ]
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "geobackend.settings")
 
 application = get_wsgi_application()
+
+# start the calculation process pool with the server rather than on the first request
+from django.conf import settings  # noqa: E402
+
+if settings.CALCULATION_EXECUTOR == 'process':
+    from geobackend_api.services.calculation_service import get_calculation_executor  # noqa: E402
+    get_calculation_executor()
@@ -6,4 +6,4 @@ class GeobackendApiConfig(AppConfig):
     name = "geobackend_api"
 
     def ready(self):
-        import geobackend_api.signals
+        import geobackend_api.checks
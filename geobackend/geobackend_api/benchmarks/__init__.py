@@ -0,0 +1,37 @@
+"""
+Benchmarks for the request hot path, run with `python manage.py benchmark`.
+
+Fixtures under fixtures/ are GetFeatureInfo responses for the three WMS
+request types, named <site>.<request_type>.html, and calculation_corpus.json,
+calculation inputs built from those responses. The responses shipped here
+are synthetic: written to match the GeoServer markup the parsers select, not
+captured from the live server. `manage.py record_wms_fixtures` records real
+ones for a location, marked by a "recorded from GeoServer" comment, and
+tests/test_wms_parsers.py checks the parsers against the BeautifulSoup
+reference on every fixture present.
+"""
+import copy
+import json
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURE_DIR / name).read_text(encoding='utf-8')
+
+
+def iter_fixtures(request_type: str):
+    """
+    yields (site, html) for every fixture response of request_type
+    """
+    for path in sorted(FIXTURE_DIR.glob(f'*.{request_type}.html')):
+        yield path.name.split('.')[0], path.read_text(encoding='utf-8')
+
+
+def load_calculation_corpus() -> list:
+    """
+    [{'name', 'is_production_pump', 'depth_data', 'watertable_depth', 'initial_input_values'}, ..]
+    initial_input_values are as a user sends them, before complete_initial_input_values
+    """
+    return copy.deepcopy(json.loads(load_fixture('calculation_corpus.json')))
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from . import iter_fixtures, load_calculation_corpus
+from .runner import measure
+from ..utils.cache_utils import generate_cache_key, encode_cache_value, decode_cache_value
+from ..utils.calculation_cache import calculation_cache_key
+from ..utils.data_fetch_utils import (get_bbox_params, generate_wms_request_params, stringify_layers,
+                                      wms_request_dict, wms_response_parsers)
+from ..services.calculation_service import complete_initial_input_values
+
+
+def run(number=100, repeat=5):
+    """
+    WMS cache keys, the cache value codec on each parsed product (with the
+    configured compression), and calculation cache keys
+    """
+    results = []
+    bbox_params = get_bbox_params((-37.8136, 144.9631), 100, (100, 100), 'epsg:4326')
+    for site, html in iter_fixtures('layers'):
+        layer_string = stringify_layers(wms_response_parsers['layers'](SimpleNamespace(status_code=200, text=html)))
+        params = generate_wms_request_params(bbox_params, layers=layer_string, query_layers=layer_string,
+                                             **wms_request_dict['aquifer_info'])
+        results.append({
+            'name': 'generate_cache_key',
+            'fixture': f'{site}.aquifer_info',
+            **measure(generate_cache_key, params, number=number, repeat=repeat),
+        })
+
+    for request_type, parse in wms_response_parsers.items():
+        for site, html in iter_fixtures(request_type):
+            product = parse(SimpleNamespace(status_code=200, text=html))
+            encoded = encode_cache_value(product)
+            fixture = f'{site}.{request_type}'
+            results.append({'name': 'encode_cache_value', 'fixture': fixture, 'bytes': len(encoded),
+                            **measure(encode_cache_value, product, number=number, repeat=repeat)})
+            results.append({'name': 'decode_cache_value', 'fixture': fixture,
+                            **measure(decode_cache_value, encoded, number=number, repeat=repeat)})
+
+    for case in load_calculation_corpus():
+        values = complete_initial_input_values(case['initial_input_values'], case['depth_data'],
+                                               case['watertable_depth'])
+        results.append({
+            'name': 'calculation_cache_key',
+            'fixture': case['name'],
+            **measure(calculation_cache_key, case['is_production_pump'], case['depth_data'], values,
+                      number=number, repeat=repeat),
+        })
+    return results
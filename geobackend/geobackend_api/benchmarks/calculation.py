@@ -0,0 +1,59 @@
+import json
+
+from . import load_calculation_corpus
+from .runner import measure
+from ..utils.serialization_utils import (GeoDjangoJSONEncoder, dumps_json, encode_results, loads_json,
+                                         pack_results, unpack_results)
+from ..services.calculation_service import perform_wellbore_calculation, complete_initial_input_values
+
+
+def _encode_with_encoder(results):
+    return json.dumps(results, cls=GeoDjangoJSONEncoder)
+
+
+def run(number=100, repeat=5):
+    """
+    perform_wellbore_calculation over the corpus of aquifer profiles, and the
+    cost of serialising each result with GeoDjangoJSONEncoder and with orjson,
+    and of reading it back from the calculation cache.
+    Cases the calculation rejects are reported with their error
+    """
+    results = []
+    # a calculation takes milliseconds; fewer calls keep the suite short
+    calculation_number = max(number // 10, 1)
+    for case in load_calculation_corpus():
+        values = complete_initial_input_values(case['initial_input_values'], case['depth_data'],
+                                               case['watertable_depth'])
+        args = (case['is_production_pump'], case['depth_data'], values)
+        try:
+            calculation_results = perform_wellbore_calculation(*args)
+        except Exception as e:
+            results.append({'name': 'perform_wellbore_calculation', 'fixture': case['name'], 'error': str(e)})
+            continue
+        results.append({
+            'name': 'perform_wellbore_calculation',
+            'fixture': case['name'],
+            **measure(perform_wellbore_calculation, *args, number=calculation_number, repeat=repeat),
+        })
+        for name, fn in (('GeoDjangoJSONEncoder', _encode_with_encoder),
+                         ('dumps_json', dumps_json),
+                         ('encode_results', encode_results)):
+            results.append({
+                'name': name,
+                'fixture': case['name'],
+                **measure(fn, calculation_results, number=number, repeat=repeat),
+            })
+        # calculation cache hits: slicing the packed fragments vs decoding and re-encoding
+        _, json_results, packed_results = pack_results(calculation_results)
+        for name, fn, data in (('unpack_results', unpack_results, packed_results),
+                               ('loads_json+encode_results', _decode_and_encode, json_results)):
+            results.append({
+                'name': name,
+                'fixture': case['name'],
+                **measure(fn, data, number=number, repeat=repeat),
+            })
+    return results
+
+
+def _decode_and_encode(json_results):
+    return encode_results(loads_json(json_results))
@@ -0,0 +1,53 @@
+import pandas as pd
+import geodrillcalc.geodrillcalc_interface as gdc
+
+from . import iter_fixtures
+from .runner import measure
+from ..utils.interface_pool import InterfacePool
+from ..utils.data_fetch_utils import parse_aquifer_info, format_data_depth_table
+from ..services.calculation_service import depth_table_to_frame
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+
+def _setup_before(depth_data):
+    # what perform_wellbore_calculation did per request before pooling
+    return pd.DataFrame(depth_data), gdc.GeoDrillCalcInterface()
+
+
+def _setup_after(pool, depth_data):
+    frame = depth_table_to_frame(depth_data)
+    with pool.checkout() as interface:
+        return frame, interface
+
+
+def run(number=100, repeat=5):
+    """
+    fixed per-request cost of preparing a calculation: building the
+    aquifer table and a GeoDrillCalcInterface, fresh versus pooled
+    """
+    pool = InterfacePool(gdc.GeoDrillCalcInterface, max_size=1)
+    pool.warm()
+    results = []
+    for site, html in iter_fixtures('aquifer_info'):
+        depth_data = format_data_depth_table(parse_aquifer_info(_Response(html)))
+        identical = pd.DataFrame(depth_data).equals(depth_table_to_frame(depth_data))
+        for name, fn, args in (
+                ('DataFrame(depth_data)', pd.DataFrame, (depth_data,)),
+                ('depth_table_to_frame', depth_table_to_frame, (depth_data,)),
+                ('setup[fresh]', _setup_before, (depth_data,)),
+                ('setup[pooled]', _setup_after, (pool, depth_data))):
+            results.append({
+                'name': name,
+                'fixture': f'{site}.aquifer_info',
+                'identical_frame': identical,
+                **measure(fn, *args, number=number, repeat=repeat),
+            })
+    results.append({'name': 'interface construction', **measure(gdc.GeoDrillCalcInterface,
+                                                                number=number, repeat=repeat)})
+    return results
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from . import iter_fixtures
+from .runner import measure
+from ..utils.data_fetch_utils import (get_bbox_params, parse_wms_layers, parse_aquifer_info,
+                                      stringify_layers, format_data_depth_table)
+
+# (crs, coordinates) of a point in Port Phillip, as clients send them
+BBOX_INPUTS = (
+    ('epsg:4326', (-37.8136, 144.9631)),
+    ('epsg:3857', (16137000.3, -4553000.7)),
+)
+
+
+def run(number=100, repeat=5):
+    """
+    the steps between the user's coordinates and the aquifer table, besides
+    the WMS requests and parsing: bbox transform, layer string, depth table
+    """
+    results = []
+    for crs, coordinates in BBOX_INPUTS:
+        results.append({
+            'name': 'get_bbox_params',
+            'fixture': crs,
+            **measure(get_bbox_params, coordinates, 100, (100, 100), crs, number=number, repeat=repeat),
+        })
+    for site, html in iter_fixtures('layers'):
+        layers = parse_wms_layers(SimpleNamespace(status_code=200, text=html))
+        results.append({
+            'name': 'stringify_layers',
+            'fixture': f'{site}.layers',
+            **measure(stringify_layers, layers, number=number, repeat=repeat),
+        })
+    for site, html in iter_fixtures('aquifer_info'):
+        aquifer_info = parse_aquifer_info(SimpleNamespace(status_code=200, text=html))
+        results.append({
+            'name': 'format_data_depth_table',
+            'fixture': f'{site}.aquifer_info',
+            **measure(format_data_depth_table, aquifer_info, number=number, repeat=repeat),
+        })
+    return results
@@ -0,0 +1,153 @@
+"""
+Load driver for /calculate-wellbore, used by the load_test command.
+
+Cache hits are read from each response's Server-Timing header (see
+utils.timing): a response without a `parse` stage made no WMS request,
+and one without a `calculation` stage was served from the calculation cache.
+Throughput and latencies count successful (200) responses only; other
+statuses and transport errors are reported in `statuses` and `failed`.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+WORKLOADS = ('cold', 'warm', 'mixed')
+
+# Victoria, where the aquifer layers are mapped (lat, lon)
+VICTORIA_BOUNDS = ((-38.6, 141.5), (-36.0, 147.5))
+
+DEFAULT_INPUT_VALUES = {
+    'required_flow_rate': 5,
+    'hydraulic_conductivity': 10,
+    'average_porosity': 0.3,
+    'bore_lifetime_year': 30,
+    'long_term_decline_rate': 1,
+    'allowable_drawdown': 25,
+    'safety_margin': 25,
+}
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    (min_lat, min_lon), (max_lat, max_lon) = VICTORIA_BOUNDS
+    return round(rng.uniform(min_lat, max_lat), 6), round(rng.uniform(min_lon, max_lon), 6)
+
+
+def random_input_values(rng: random.Random) -> dict:
+    """
+    DEFAULT_INPUT_VALUES with a random flow rate, so the calculation cache
+    misses even where the stub serves the same aquifer profile
+    """
+    return {**DEFAULT_INPUT_VALUES, 'required_flow_rate': round(rng.uniform(1, 20), 6)}
+
+
+def request_body(point, initial_input_values=None) -> dict:
+    return {
+        'coordinates': list(point),
+        'crs_type': 'epsg:4326',
+        'min_resolution': 100,
+        'pixels': [100, 100],
+        'is_production_pump': 'true',
+        'initial_input_values': initial_input_values or DEFAULT_INPUT_VALUES,
+    }
+
+
+def workload_requests(workload: str, requests: int, hot_points: list, hot_fraction: float,
+                      rng: random.Random) -> list:
+    """
+    request bodies for a workload:
+    cold: a new location and new inputs per request, so every cache misses
+    warm: the hot locations with the default inputs, requested once before timing starts
+    mixed: hot requests for hot_fraction of the requests, cold ones for the rest
+    """
+    def cold():
+        return request_body(random_point(rng), random_input_values(rng))
+
+    def hot():
+        return request_body(rng.choice(hot_points))
+
+    if workload == 'cold':
+        return [cold() for _ in range(requests)]
+    if workload == 'warm':
+        return [hot() for _ in range(requests)]
+    return [hot() if rng.random() < hot_fraction else cold() for _ in range(requests)]
+
+
+def parse_server_timing(header: str | None) -> set | None:
+    if not header:
+        return None
+    return {entry.split(';', 1)[0].strip() for entry in header.split(',')}
+
+
+def percentile(sorted_values: list, fraction: float):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_workload(url, bodies, concurrency: int = 8, timeout: float = 120) -> dict:
+    """
+    POSTs each request body with concurrency requests in flight
+    returns throughput, latency percentiles in ms, status counts and cache hit ratios
+    """
+    latencies = []
+    statuses = {}
+    stages = []
+    lock = threading.Lock()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    with httpx.Client(timeout=timeout, limits=limits) as client:
+        def send(body):
+            start = time.perf_counter()
+            try:
+                response = client.post(url, json=body)
+                status = response.status_code
+                timing = parse_server_timing(response.headers.get('Server-Timing'))
+            except httpx.HTTPError as e:
+                status, timing = type(e).__name__, None
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                # a 429 or a refused connection returns fast and would flatter the numbers
+                if status == 200:
+                    latencies.append(elapsed)
+                    if timing is not None:
+                        stages.append(timing)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(send, bodies))
+        wall_time = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(bodies),
+        'succeeded': len(latencies),
+        'failed': len(bodies) - len(latencies),
+        'concurrency': concurrency,
+        'wall_time_s': round(wall_time, 3),
+        'throughput_rps': round(len(latencies) / wall_time, 2) if wall_time else None,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+        'max_ms': _ms(latencies[-1] if latencies else None),
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'wms_cache_hit_ratio': _ratio(stages, lambda timing: 'parse' not in timing),
+        'calculation_cache_hit_ratio': _ratio(stages, lambda timing: 'calculation' not in timing),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _ratio(stages, is_hit):
+    """
+    None when the responses carried no Server-Timing header
+    """
+    if not stages:
+        return None
+    return round(sum(1 for timing in stages if is_hit(timing)) / len(stages), 3)
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from . import iter_fixtures
+from .runner import measure
+from ..utils.wms_parsers import PARSER_BACKENDS
+from ..utils.data_fetch_utils import parse_wms_layers, parse_aquifer_info, parse_watertable_depth
+
+# request type -> (backend extractor, full parse_* function)
+PARSE_TARGETS = {
+    'layers': ('aquifer_ids', parse_wms_layers),
+    'aquifer_info': ('rows', parse_aquifer_info),
+    'watertable_depth': ('watertable_text', parse_watertable_depth),
+}
+
+# markup variations beyond the fixtures that both backends must read alike
+PARITY_CASES = {
+    'watertable_text': {
+        'plain': '<table><tr><td>Depth to watertable</td><td>12.5 m</td></tr></table>',
+        'inline_label': '<table><tr><td><b>Depth to watertable</b></td><td>12.5 m</td></tr></table>',
+        'nested_inline_label': '<table><tr><td><span><b>Depth to watertable</b></span></td>'
+                               '<td>12.5 m</td></tr></table>',
+        'inline_value': '<table><tr><td>Depth to watertable</td><td><i>12.5</i> m</td></tr></table>',
+        'label_with_whitespace': '<table><tr><td>\n<b>Depth to watertable</b>\n</td><td>12.5 m</td></tr></table>',
+        'label_and_sibling': '<table><tr><td><b>Depth to watertable</b><br></td><td>12.5 m</td></tr></table>',
+        'label_then_text': '<table><tr><td><b>Depth to watertable</b> (m)</td><td>12.5</td></tr></table>',
+        'no_value_cell': '<table><tr><td><b>Depth to watertable</b></td></tr></table>',
+        'no_label': '<table><tr><td>Elevation</td><td>40 m</td></tr></table>',
+    },
+    'aquifer_ids': {
+        'nested': '<div class="aquifer-id">100<span>qa</span></div><div class="aquifer-id x">114bse</div>',
+    },
+    'rows': {
+        'inline_children': '<div class="row"><div><b>Depth to</b></div><div> 12 <i>m</i></div></div>',
+        'three_divs': '<div class="row"><div>a</div><div>b</div><div>c</div></div>',
+    },
+}
+
+
+def check_parity() -> list:
+    """
+    (extractor, case, outputs by backend) for every parity case the backends disagree on
+    """
+    mismatches = []
+    for extractor, cases in PARITY_CASES.items():
+        for case, html in cases.items():
+            outputs = {name: getattr(backend, extractor)(html) for name, backend in PARSER_BACKENDS.items()}
+            if any(output != outputs['bs4'] for output in outputs.values()):
+                mismatches.append((extractor, case, outputs))
+    return mismatches
+
+
+def run(number=100, repeat=5):
+    """
+    per-response parse time and peak memory of each HTML backend,
+    plus the full parse_* function with the configured backend, and
+    whether the backends agree on the PARITY_CASES
+    """
+    results = []
+    mismatches = {(extractor, case) for extractor, case, _ in check_parity()}
+    for extractor, cases in PARITY_CASES.items():
+        for case in cases:
+            results.append({'name': f'parity[{extractor}]', 'fixture': case,
+                            'identical_to_bs4': (extractor, case) not in mismatches})
+    for request_type, (extractor, parse) in PARSE_TARGETS.items():
+        for site, html in iter_fixtures(request_type):
+            outputs = {name: getattr(backend, extractor)(html)
+                       for name, backend in PARSER_BACKENDS.items()}
+            identical = all(output == outputs['bs4'] for output in outputs.values())
+            for name, backend in PARSER_BACKENDS.items():
+                results.append({
+                    'name': f'{extractor}[{name}]',
+                    'fixture': f'{site}.{request_type}',
+                    'identical_to_bs4': identical,
+                    **measure(getattr(backend, extractor), html, number=number, repeat=repeat),
+                })
+            response = SimpleNamespace(status_code=200, text=html)
+            results.append({
+                'name': parse.__name__,
+                'fixture': f'{site}.{request_type}',
+                **measure(parse, response, number=number, repeat=repeat),
+            })
+    return results
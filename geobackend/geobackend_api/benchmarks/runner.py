@@ -0,0 +1,42 @@
+import gc
+import time
+import tracemalloc
+
+
+def measure(fn, *args, number: int = 100, repeat: int = 5, **kwargs) -> dict:
+    """
+    times fn(*args, **kwargs) and records its peak memory
+
+    mean_us / min_us: per call, over `repeat` rounds of `number` calls
+    peak_kib: peak traced allocation during a single call
+    """
+    fn(*args, **kwargs)  # warm-up, also fills lazy imports and caches
+
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn(*args, **kwargs)
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'mean_us': round(sum(timings) / len(timings) * 1e6, 3),
+        'min_us': round(min(timings) * 1e6, 3),
+        'peak_kib': round(peak / 1024, 3),
+        'number': number,
+        'repeat': repeat,
+    }
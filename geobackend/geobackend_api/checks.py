@@ -0,0 +1,25 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .session_backends import DeleteResultsMixin
+
+
+@register()
+def check_session_engine(app_configs, **kwargs):
+    """
+    stored results are removed by the session engine when their session is
+    deleted; any other engine leaves them behind
+    """
+    try:
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+    except (ImportError, AttributeError) as e:
+        return [Error(f"SESSION_ENGINE {settings.SESSION_ENGINE!r} cannot be loaded: {e}",
+                      id='geobackend_api.E001')]
+    if not issubclass(session_store, DeleteResultsMixin):
+        return [Error(f"SESSION_ENGINE {settings.SESSION_ENGINE!r} does not remove calculation results "
+                      f"when a session is deleted",
+                      hint="Use geobackend_api.session_backends.cache, .cached_db or .db.",
+                      id='geobackend_api.E002')]
+    return []
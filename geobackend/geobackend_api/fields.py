@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class RawJSON:
+    """
+    already encoded JSON (bytes or str), stored by RawJSONField without
+    being decoded and encoded again
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes | str):
+        self.data = data
+
+    def __str__(self):
+        return self.data.decode('utf-8') if isinstance(self.data, bytes) else self.data
+
+    def __eq__(self, other):
+        return isinstance(other, RawJSON) and str(self) == str(other)
+
+    __hash__ = None
+
+
+class RawJSONField(models.JSONField):
+    """
+    JSONField that also accepts RawJSON values, written to the database as
+    is; reads return decoded values like JSONField
+    """
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, RawJSON):
+            return str(value)
+        return super().get_db_prep_value(value, connection, prepared)
@@ -0,0 +1,81 @@
+import json
+import platform
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from geobackend_api.benchmarks import parsers, fetch_format, cache, calculation, calculation_setup
+
+SUITES = {
+    'parsers': parsers.run,
+    'fetch_format': fetch_format.run,
+    'cache': cache.run,
+    'calculation': calculation.run,
+    'calculation_setup': calculation_setup.run,
+}
+
+
+class Command(BaseCommand):
+    help = "Runs hot path microbenchmarks and optionally writes the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('suites', nargs='*', default=list(SUITES),
+                            help=f"suites to run (default: all): {', '.join(SUITES)}")
+        parser.add_argument('--number', type=int, default=100, help='calls per timing round')
+        parser.add_argument('--repeat', type=int, default=5, help='timing rounds')
+        parser.add_argument('--output', help='write results to this JSON file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to report changes against')
+
+    def handle(self, *args, **options):
+        unknown = set(options['suites']) - set(SUITES)
+        if unknown:
+            raise CommandError(f"Unknown suite(s): {', '.join(sorted(unknown))}")
+        baseline = self._load_baseline(options['compare']) if options['compare'] else {}
+
+        report = {'meta': self._meta(), 'suites': {}}
+        for suite in options['suites']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {suite}"))
+            results = SUITES[suite](number=options['number'], repeat=options['repeat'])
+            report['suites'][suite] = results
+            for result in results:
+                label = f"{result['name']} {result.get('fixture', '')}".strip()
+                if 'error' in result:
+                    self.stdout.write(self.style.WARNING(f"{label:<60} error: {result['error']}"))
+                    continue
+                if result.get('identical_to_bs4') is False:
+                    self.stdout.write(self.style.ERROR(f"{label:<60} output differs from bs4"))
+                if 'mean_us' not in result:
+                    # checks without a timing, e.g. parser parity cases
+                    continue
+                line = f"{label:<60} {result['mean_us']:>12.1f} us {result['peak_kib']:>10.1f} KiB"
+                previous = baseline.get(self._result_key(suite, result))
+                if previous and previous.get('mean_us'):
+                    line += f" {(result['mean_us'] / previous['mean_us'] - 1) * 100:>+8.1f}%"
+                self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    @staticmethod
+    def _result_key(suite, result):
+        return suite, result['name'], result.get('fixture')
+
+    def _load_baseline(self, path) -> dict:
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        self.stdout.write(f"Comparing mean times with {path} (commit {report['meta'].get('commit')})")
+        return {self._result_key(suite, result): result
+                for suite, results in report['suites'].items() for result in results}
+
+    def _meta(self):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {'commit': commit, 'python': platform.python_version()}
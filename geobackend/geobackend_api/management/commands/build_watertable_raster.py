@@ -0,0 +1,108 @@
+import math
+import urllib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from geobackend_api.utils.data_fetch_utils import (get_transformer, wms_request_dict,
+                                                   WMS_GRID_CELL_SIZE, WMS_GRID_ORIGIN)
+from geobackend_api.utils.watertable_raster import (WatertableRaster, parse_arc_grid, new_raster_version,
+                                                    publish_raster_version)
+from geobackend_api.utils.wms_client import get_wms_client
+
+
+class Command(BaseCommand):
+    help = ("Builds the local watertable depth raster sampled when WATERTABLE_SOURCE is "
+            "'raster', either by fetching raw values from GeoServer WCS in tiles or from "
+            "a local ESRI ASCII grid in EPSG:3857.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bbox', nargs=4, type=float,
+                            metavar=('MINX', 'MINY', 'MAXX', 'MAXY'),
+                            help='area to fetch, in --crs axis order')
+        parser.add_argument('--crs', default='epsg:3857', help='CRS of --bbox (default: epsg:3857)')
+        parser.add_argument('--pixel-size', type=float, default=WMS_GRID_CELL_SIZE,
+                            help='raster resolution in metres (EPSG:3857)')
+        parser.add_argument('--tile-size', type=int, default=512, help='tile width and height in pixels')
+        parser.add_argument('--from-file', help='ESRI ASCII grid (.asc) to import instead of fetching')
+        parser.add_argument('--wcs-url', default=getattr(settings, 'WATERTABLE_WCS_URL', None))
+        parser.add_argument('--coverage', default=wms_request_dict['watertable_depth']['layers'])
+        parser.add_argument('--output', default=getattr(settings, 'WATERTABLE_RASTER_PATH', None),
+                            help='raster path (default: WATERTABLE_RASTER_PATH)')
+        parser.add_argument('--keep', type=int, default=2, help='raster versions kept on disk')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("No --output given and WATERTABLE_RASTER_PATH is not set")
+        if not (options['from_file'] or options['bbox']):
+            raise CommandError("Give either --bbox or --from-file")
+        # build the array and its sidecar in a new version directory, then swap the
+        # symlink at --output in one rename; workers pick it up on their next check
+        output = options['output']
+        version = new_raster_version(output)
+        if options['from_file']:
+            self._import_file(options['from_file'], version)
+        else:
+            self._fetch_tiles(options, version)
+        publish_raster_version(output, version, keep=options['keep'])
+
+        raster = WatertableRaster(output)
+        covered = int((raster.data == raster.data).sum())  # NaN != NaN
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output}: {raster.width} x {raster.height} px, {covered} with data"))
+
+    def _import_file(self, path, output):
+        with open(path) as f:
+            values, west, north, cell_size = parse_arc_grid(f.read())
+        height, width = values.shape
+        data = WatertableRaster.create(output, west, north, cell_size, width, height)
+        data[:] = values
+        data.flush()
+
+    def _fetch_tiles(self, options, output):
+        if not options['wcs_url']:
+            raise CommandError("No --wcs-url given and WATERTABLE_WCS_URL is not set")
+        minx, miny, maxx, maxy = options['bbox']
+        if options['crs'].lower() != 'epsg:3857':
+            transformer = get_transformer(options['crs'], 'epsg:3857')
+            (minx, maxx), (miny, maxy) = transformer.transform((minx, maxx), (miny, maxy))
+        minx, maxx = sorted((minx, maxx))
+        miny, maxy = sorted((miny, maxy))
+
+        # align the raster to the WMS grid so pixels match the cells queries are snapped to
+        size = options['pixel_size']
+        west = WMS_GRID_ORIGIN[0] + math.floor((minx - WMS_GRID_ORIGIN[0]) / size) * size
+        north = WMS_GRID_ORIGIN[1] + math.ceil((maxy - WMS_GRID_ORIGIN[1]) / size) * size
+        width = math.ceil((maxx - west) / size)
+        height = math.ceil((north - miny) / size)
+        data = WatertableRaster.create(output, west, north, size, width, height)
+
+        tile = options['tile_size']
+        tiles = [(col, row) for row in range(0, height, tile) for col in range(0, width, tile)]
+        self.stdout.write(f"Fetching {width} x {height} px in {len(tiles)} tiles")
+        client = get_wms_client()
+        for done, (col, row) in enumerate(tiles, start=1):
+            tile_width, tile_height = min(tile, width - col), min(tile, height - row)
+            tile_west, tile_north = west + col * size, north - row * size
+            params = {
+                "service": "WCS",
+                "version": "1.0.0",
+                "request": "GetCoverage",
+                "coverage": options['coverage'],
+                "crs": "EPSG:3857",
+                "bbox": f"{tile_west},{tile_north - tile_height * size},"
+                        f"{tile_west + tile_width * size},{tile_north}",
+                "width": tile_width,
+                "height": tile_height,
+                "format": "ArcGrid",
+            }
+            response = client.get(f"{options['wcs_url']}?{urllib.parse.urlencode(params)}")
+            if response.status_code != 200:
+                raise CommandError(f"Tile ({col}, {row}) failed: {response.status_code}, {response.text[:200]}")
+            values, *_ = parse_arc_grid(response.text)
+            if values.shape != (tile_height, tile_width):
+                raise CommandError(f"Tile ({col}, {row}) returned {values.shape}, "
+                                   f"expected {(tile_height, tile_width)}")
+            data[row:row + tile_height, col:col + tile_width] = values
+            self.stdout.write(f"{done}/{len(tiles)} tiles")
+        data.flush()
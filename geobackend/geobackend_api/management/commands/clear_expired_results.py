@@ -0,0 +1,31 @@
+from functools import partial
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from geobackend_api.services.result_service import clear_expired_calculation_results
+from geobackend_api.session_backends import existing_sessions
+
+
+class Command(BaseCommand):
+    help = ("Removes expired sessions (for engines that keep them) and the stored "
+            "calculation results of sessions that no longer exist. Run it periodically, "
+            "e.g. from cron, in place of clearsessions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=settings.SESSION_COOKIE_AGE,
+                            help='results not updated for this many seconds are removed '
+                                 'without checking their session (default: SESSION_COOKIE_AGE)')
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        try:
+            engine.SessionStore.clear_expired()
+        except NotImplementedError:
+            self.stderr.write(f"{settings.SESSION_ENGINE} cannot clear expired sessions; "
+                              f"only results are cleaned up")
+
+        removed = clear_expired_calculation_results(partial(existing_sessions, engine.SessionStore()),
+                                                    max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} expired result(s)"))
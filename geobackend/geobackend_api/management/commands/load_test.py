@@ -0,0 +1,75 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from geobackend_api.benchmarks.load import (WORKLOADS, run_workload, workload_requests, request_body,
+                                            random_point)
+
+
+class Command(BaseCommand):
+    help = ("Load tests a running API's /calculate-wellbore with cold-cache, warm-cache and mixed "
+            "workloads, reporting throughput, latency percentiles and cache hit ratios. Run the "
+            "API against serve_stub_wms (WMS_BASE_URL) rather than the real GeoServer. Throughput and "
+            "latencies cover successful responses only; any other response fails the run.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('workloads', nargs='*', default=list(WORKLOADS),
+                            help=f"workloads to run (default: all): {', '.join(WORKLOADS)}")
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/calculate-wellbore')
+        parser.add_argument('--requests', type=int, default=200, help='requests per workload')
+        parser.add_argument('--concurrency', type=int, default=8, help='requests in flight')
+        parser.add_argument('--hot-locations', type=int, default=10,
+                            help='locations reused by the warm and mixed workloads')
+        parser.add_argument('--hot-fraction', type=float, default=0.8,
+                            help='share of mixed workload requests for hot locations')
+        parser.add_argument('--timeout', type=float, default=120, help='per request, seconds')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='write results to this JSON file')
+        parser.add_argument('--allow-errors', action='store_true',
+                            help='only warn about non-200 responses, e.g. with serve_stub_wms --error-rate')
+
+    def handle(self, *args, **options):
+        unknown = set(options['workloads']) - set(WORKLOADS)
+        if unknown:
+            raise CommandError(f"Unknown workload(s): {', '.join(sorted(unknown))}")
+
+        rng = random.Random(options['seed'])
+        hot_points = [random_point(rng) for _ in range(options['hot_locations'])]
+        if {'warm', 'mixed'} & set(options['workloads']):
+            self.stdout.write(f"Warming {len(hot_points)} hot locations")
+            result = run_workload(options['url'], [request_body(point) for point in hot_points],
+                                  concurrency=options['concurrency'], timeout=options['timeout'])
+            if result['failed']:
+                self.stderr.write(f"Warm-up: {result['failed']} of {result['requests']} requests failed, "
+                                  f"statuses {result['statuses']}")
+
+        report = {'url': options['url'], 'workloads': {}}
+        failed = 0
+        for workload in options['workloads']:
+            bodies = workload_requests(workload, options['requests'], hot_points, options['hot_fraction'], rng)
+            result = run_workload(options['url'], bodies, concurrency=options['concurrency'],
+                                  timeout=options['timeout'])
+            report['workloads'][workload] = result
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {workload}"))
+            self.stdout.write(
+                f"{result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                f"p99 {result['p99_ms']} ms, statuses {result['statuses']}\n"
+                f"cache hit ratio: WMS {self._ratio(result['wms_cache_hit_ratio'])}, "
+                f"calculation {self._ratio(result['calculation_cache_hit_ratio'])}")
+            if result['failed']:
+                failed += result['failed']
+                self.stderr.write(self.style.WARNING(
+                    f"{result['failed']} of {result['requests']} requests did not return 200; "
+                    f"the figures above cover the {result['succeeded']} that did"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        if failed and not options['allow_errors']:
+            raise CommandError(f"{failed} requests did not return 200 (pass --allow-errors to accept them)")
+
+    @staticmethod
+    def _ratio(value):
+        return 'n/a (no Server-Timing header)' if value is None else f"{value:.1%}"
@@ -0,0 +1,121 @@
+import itertools
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from geobackend_api.utils.data_fetch_utils import (get_bbox_params, get_transformer,
+                                                   request_wms_uncached, stringify_layers,
+                                                   format_data_depth_table,
+                                                   WMS_SPATIAL_QUANTIZATION, WMS_GRID_CELL_SIZE,
+                                                   WMS_GRID_ORIGIN, WMS_CANONICAL_PIXELS)
+from geobackend_api.utils.precomputed_store import PrecomputedAquiferStore, STATUS_NO_DATA
+
+# upstream requests made per cell: layers, aquifer info, watertable depth
+REQUESTS_PER_CELL = 3
+
+
+class Command(BaseCommand):
+    help = ("Sweeps a bbox on the WMS grid and stores the aquifer profile and watertable "
+            "depth of every cell in the local precomputed store. Re-running resumes "
+            "from the cells already stored.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bbox', nargs=4, type=float, required=True,
+                            metavar=('MINX', 'MINY', 'MAXX', 'MAXY'),
+                            help='area to sweep, in --crs axis order')
+        parser.add_argument('--crs', default='epsg:3857', help='CRS of --bbox (default: epsg:3857)')
+        parser.add_argument('--cell-size', type=float, default=WMS_GRID_CELL_SIZE,
+                            help='grid cell size in metres (EPSG:3857); must be WMS_GRID_CELL_SIZE '
+                                 'when WMS_SPATIAL_QUANTIZATION is on')
+        parser.add_argument('--output', default=getattr(settings, 'PRECOMPUTED_STORE_PATH', None),
+                            help='store path (default: PRECOMPUTED_STORE_PATH)')
+        parser.add_argument('--rate', type=float, default=2.0,
+                            help='maximum upstream requests per second')
+        parser.add_argument('--limit', type=int, default=None, help='stop after this many new cells')
+        parser.add_argument('--checkpoint-every', type=int, default=50,
+                            help='cells written between commits')
+        parser.add_argument('--max-consecutive-errors', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError("No --output given and PRECOMPUTED_STORE_PATH is not set")
+        if WMS_SPATIAL_QUANTIZATION and options['cell_size'] != WMS_GRID_CELL_SIZE:
+            # lookups are snapped to the WMS grid, so they would land between the swept cells
+            raise CommandError(f"--cell-size must be WMS_GRID_CELL_SIZE ({WMS_GRID_CELL_SIZE}) "
+                               f"while WMS_SPATIAL_QUANTIZATION is on")
+        try:
+            store = PrecomputedAquiferStore.create(options['output'], options['cell_size'], WMS_GRID_ORIGIN)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        minx, miny, maxx, maxy = options['bbox']
+        if options['crs'].lower() != 'epsg:3857':
+            transformer = get_transformer(options['crs'], 'epsg:3857')
+            (minx, maxx), (miny, maxy) = transformer.transform((minx, maxx), (miny, maxy))
+        col_min, row_min = store.cell_index(min(minx, maxx), min(miny, maxy))
+        col_max, row_max = store.cell_index(max(minx, maxx), max(miny, maxy))
+        total = (col_max - col_min + 1) * (row_max - row_min + 1)
+        self.stdout.write(f"Sweeping {total} cells ({col_max - col_min + 1} x {row_max - row_min + 1}) "
+                          f"into {options['output']}")
+
+        interval = REQUESTS_PER_CELL / options['rate']
+        written = skipped = errors = consecutive_errors = 0
+        last_start = 0.0
+        cells = itertools.product(range(row_min, row_max + 1), range(col_min, col_max + 1))
+        for row, col in cells:
+            if store.has_cell(col, row):
+                skipped += 1
+                continue
+            if options['limit'] is not None and written >= options['limit']:
+                break
+
+            # rate limit: space cells so upstream sees at most --rate requests per second
+            wait = last_start + interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_start = time.monotonic()
+
+            try:
+                self._sweep_cell(store, col, row)
+                written += 1
+                consecutive_errors = 0
+            except Exception as e:
+                # not stored, so the cell is retried on the next run
+                errors += 1
+                consecutive_errors += 1
+                self.stderr.write(f"cell ({col}, {row}) failed: {e}")
+                if consecutive_errors >= options['max_consecutive_errors']:
+                    store.commit()
+                    raise CommandError(f"Aborting after {consecutive_errors} consecutive errors; "
+                                       f"re-run to resume")
+
+            if written and written % options['checkpoint_every'] == 0:
+                store.commit()
+                self.stdout.write(f"{written + skipped}/{total} cells done ({errors} errors)")
+        store.commit()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {written} new, {skipped} already stored, {errors} failed; store has {store.count()}"))
+
+    def _sweep_cell(self, store, col, row):
+        x, y = store.cell_centre(col, row)
+        bbox_params = get_bbox_params((x, y), store.cell_size, WMS_CANONICAL_PIXELS, 'epsg:3857')
+        # straight to the WMS: each cell is visited once, caching it would only evict live entries
+        layers = request_wms_uncached('layers', bbox_params=bbox_params)
+        if len(layers) <= 1:
+            # only the basement layer: the cell is outside the aquifer model
+            store.put(col, row, status=STATUS_NO_DATA)
+            return
+        layer_string = stringify_layers(layers)
+        layer_data = request_wms_uncached('aquifer_info', layers=layer_string, query_layers=layer_string,
+                                          bbox_params=bbox_params)
+        depth_data = format_data_depth_table(layer_data)
+        try:
+            watertable_depth = request_wms_uncached('watertable_depth', bbox_params=bbox_params)
+        except AttributeError:
+            # parse_watertable_depth found no value for this cell
+            watertable_depth = None
+        if not depth_data['aquifer_layer'] or watertable_depth is None:
+            store.put(col, row, status=STATUS_NO_DATA)
+            return
+        store.put(col, row, depth_data=depth_data, watertable_depth=watertable_depth)
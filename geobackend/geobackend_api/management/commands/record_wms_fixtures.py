@@ -0,0 +1,66 @@
+import re
+import urllib.parse
+from datetime import date
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from geobackend_api.benchmarks import FIXTURE_DIR
+from geobackend_api.utils import data_fetch_utils
+from geobackend_api.utils.data_fetch_utils import (get_bbox_params, generate_wms_request_params,
+                                                   generate_wms_request_url, parse_wms_layers,
+                                                   stringify_layers, wms_request_dict)
+from geobackend_api.utils.wms_client import get_wms_client
+
+
+class Command(BaseCommand):
+    help = ("Records the GetFeatureInfo responses GeoServer returns for one location as "
+            "<site>.<request_type>.html fixtures, for the parser tests, benchmarks and the stub WMS. "
+            "The GeoServer host is scrubbed from the responses.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('site', help='fixture name, e.g. the nearest town')
+        parser.add_argument('--coordinates', type=float, nargs=2, required=True, metavar=('LAT', 'LON'))
+        parser.add_argument('--crs', default='epsg:4326')
+        parser.add_argument('--min-resolution', type=float, default=100)
+        parser.add_argument('--pixels', type=int, nargs=2, default=[100, 100])
+        parser.add_argument('--output', default=str(FIXTURE_DIR), help='fixture directory')
+
+    def handle(self, *args, **options):
+        if not re.fullmatch(r'[a-z0-9_]+', options['site']):
+            raise CommandError("site must be lowercase letters, digits and underscores")
+        bbox_params = get_bbox_params(options['coordinates'], options['min_resolution'],
+                                      options['pixels'], options['crs'])
+        layers = self._fetch('layers', bbox_params=bbox_params)
+        layer_string = stringify_layers(parse_wms_layers(layers))
+        responses = {
+            'layers': layers,
+            'aquifer_info': self._fetch('aquifer_info', layers=layer_string, query_layers=layer_string,
+                                        bbox_params=bbox_params),
+            'watertable_depth': self._fetch('watertable_depth', bbox_params=bbox_params),
+        }
+
+        output = Path(options['output'])
+        output.mkdir(parents=True, exist_ok=True)
+        lat, lon = options['coordinates']
+        for request_type, response in responses.items():
+            header = (f"<!-- recorded from GeoServer on {date.today().isoformat()}: {request_type} "
+                      f"at {lat}, {lon} ({options['crs']}) -->\n")
+            path = output / f"{options['site']}.{request_type}.html"
+            path.write_text(header + scrub(response.text), encoding='utf-8')
+            self.stdout.write(f"Wrote {path}")
+
+    def _fetch(self, request_type, **request_params):
+        params = generate_wms_request_params(**request_params, **wms_request_dict[request_type])
+        response = get_wms_client().get(generate_wms_request_url(params))
+        if response.status_code != 200:
+            raise CommandError(f"{request_type} request failed: {response.status_code}")
+        return response
+
+
+def scrub(html: str) -> str:
+    """
+    replaces the GeoServer host, which appears in links and stylesheets, with a placeholder
+    """
+    host = urllib.parse.urlsplit(data_fetch_utils.WMS_BASE_URL).netloc
+    return html.replace(host, 'geoserver.invalid') if host else html
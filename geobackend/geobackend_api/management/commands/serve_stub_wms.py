@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from geobackend_api.benchmarks import FIXTURE_DIR
+from geobackend_api.utils.stub_wms import StubWMSServer, load_responses
+
+
+class Command(BaseCommand):
+    help = ("Serves canned GetFeatureInfo responses as a local stand-in for the GeoServer "
+            "WMS, for load tests. Point WMS_BASE_URL at it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8081)
+        parser.add_argument('--fixtures', default=str(FIXTURE_DIR),
+                            help='directory of <site>.<request_type>.html responses '
+                                 '(default: the benchmark fixtures)')
+        parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every response')
+        parser.add_argument('--jitter', type=float, default=0, help='+- milliseconds, uniform')
+        parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests that fail')
+        parser.add_argument('--error-status', type=int, default=503, help='status of failed requests')
+        parser.add_argument('--seed', type=int, default=None, help='seed for jitter and errors')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['error_rate'] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1")
+        try:
+            responses = load_responses(options['fixtures'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        server = StubWMSServer((options['host'], options['port']), responses,
+                               latency=options['latency'] / 1000,
+                               jitter=options['jitter'] / 1000,
+                               error_rate=options['error_rate'],
+                               error_status=options['error_status'],
+                               seed=options['seed'])
+        host, port = server.server_address[:2]
+        sites = ', '.join(server.sites)
+        self.stdout.write(f"Stub WMS serving {sites} at http://{host}:{port}/geoserver/vvg/wms")
+        self.stdout.write(f"Run the API with WMS_BASE_URL=http://{host}:{port}/geoserver/vvg/wms")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Requests served: {server.stats()}")
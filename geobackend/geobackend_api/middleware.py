@@ -0,0 +1,62 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .utils import metrics
+from .utils.timing import (REQUEST_TIMING_ENABLED, start_request_timing, end_request_timing,
+                           format_server_timing)
+
+# send the collected timings to clients; metrics are recorded either way
+SERVER_TIMING_HEADER = getattr(settings, 'SERVER_TIMING_HEADER', True)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the stage timings of each request (see utils.timing), adds them
+    as a Server-Timing header and records the request and stage latencies
+    in /metrics. Removed from the stack when REQUEST_TIMING_ENABLED is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = start_request_timing()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = end_request_timing(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        token = start_request_timing()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = end_request_timing(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    def finish(self, request, response, timings, total):
+        if SERVER_TIMING_HEADER:
+            server_timing = format_server_timing(timings, total)
+            # keep entries added further down the stack, e.g. by the debug toolbar
+            if response.has_header('Server-Timing'):
+                server_timing = f"{response['Server-Timing']}, {server_timing}"
+            response['Server-Timing'] = server_timing
+        match = request.resolver_match
+        # the route pattern rather than the path keeps the label set small
+        route = match.route if match is not None else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, total)
+        return response
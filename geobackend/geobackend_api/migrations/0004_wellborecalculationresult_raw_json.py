@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:44
+
+import geobackend_api.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("geobackend_api", "0003_wellborecalculationresult_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="wellborecalculationresult",
+            name="result_data",
+            field=geobackend_api.fields.RawJSONField(),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def keep_latest_result_per_session(apps, schema_editor):
+    """
+    results used to be inserted once per calculation; keep the most recent
+    row of each session so session_key can be made unique
+    """
+    WellBoreCalculationResult = apps.get_model("geobackend_api", "WellBoreCalculationResult")
+    latest_ids = (
+        WellBoreCalculationResult.objects.values("session_key")
+        .annotate(latest_id=models.Max("id"))
+        .values_list("latest_id", flat=True)
+    )
+    WellBoreCalculationResult.objects.exclude(id__in=list(latest_ids)).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("geobackend_api", "0004_wellborecalculationresult_raw_json"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wellborecalculationresult",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(
+            keep_latest_result_per_session, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name="wellborecalculationresult",
+            name="session_key",
+            field=models.CharField(max_length=40, unique=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:10
+
+import json
+
+from django.db import migrations
+
+from geobackend_api.fields import RawJSON
+
+
+def decode_legacy_result_data(apps, schema_editor, batch_size=500):
+    """
+    result_data used to be given the already encoded results, which JSONField
+    stored a second time as one JSON string; store the JSON inside instead
+    """
+    WellBoreCalculationResult = apps.get_model("geobackend_api", "WellBoreCalculationResult")
+    rows = WellBoreCalculationResult.objects.only("id", "result_data").order_by("id")
+    decoded = []
+    for row in rows.iterator(chunk_size=batch_size):
+        if not isinstance(row.result_data, str):
+            continue
+        try:
+            json.loads(row.result_data)
+        except ValueError:
+            # a plain string result, not encoded JSON
+            continue
+        row.result_data = RawJSON(row.result_data)
+        decoded.append(row)
+        if len(decoded) >= batch_size:
+            WellBoreCalculationResult.objects.bulk_update(decoded, ["result_data"])
+            decoded = []
+    if decoded:
+        WellBoreCalculationResult.objects.bulk_update(decoded, ["result_data"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("geobackend_api", "0005_wellborecalculationresult_unique_session"),
+    ]
+
+    operations = [
+        migrations.RunPython(decode_legacy_result_data, migrations.RunPython.noop),
+    ]
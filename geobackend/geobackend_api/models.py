@@ -1,12 +1,16 @@
 from django.db import models
+
+from .fields import RawJSONField
 #from django.contrib.gis.db import models as gis_models
 # Create your models here.
 
 
 class WellBoreCalculationResult(models.Model):
-    session_key = models.CharField(max_length=40)
-    result_data = models.JSONField()
+    # one row per session, upserted on every calculation
+    session_key = models.CharField(max_length=40, unique=True)
+    result_data = RawJSONField()  # accepts pre-encoded JSON, see fields.RawJSON
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Calculation result for session {self.session_key}"
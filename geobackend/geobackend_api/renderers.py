@@ -0,0 +1,21 @@
+from rest_framework.renderers import BaseRenderer
+
+from .utils.serialization_utils import dumps_json
+from .utils.timing import timed
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson. Handles numpy and pandas values, and
+    embeds orjson.Fragment values (results encoded once by encode_results)
+    without re-serialising them.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with timed('serialization'):
+            return dumps_json(data)
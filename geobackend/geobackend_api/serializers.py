@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 class UserProvidedInitialInputValuesSerializer(serializers.Serializer):
@@ -43,7 +44,42 @@ class UserInputSerializer(serializers.Serializer):
         if value.lower() not in ['true', 'false']:
             raise serializers.ValidationError("is_production_pump must be 'true' or 'false'")
         return value.lower() == 'true'
-    
+
+
+
+class BatchSiteSerializer(serializers.Serializer):
+    coordinates = serializers.ListField(
+        child = serializers.FloatField(),
+        min_length = 2,
+        max_length = 2
+    )
+    initial_input_values = UserProvidedInitialInputValuesSerializer(required=False)
+
+
+class BatchUserInputSerializer(UserInputSerializer):
+    """
+    query options shared by every site in a batch; a site's own
+    initial_input_values take precedence over the shared ones
+    """
+    coordinates = None
+    sites = BatchSiteSerializer(many=True, allow_empty=False)
+    initial_input_values = UserProvidedInitialInputValuesSerializer(required=False)
+
+    def validate_sites(self, value):
+        max_sites = getattr(settings, 'BATCH_MAX_SITES', 500)
+        if len(value) > max_sites:
+            raise serializers.ValidationError(f"a batch can contain at most {max_sites} sites")
+        return value
+
+    def validate(self, data):
+        if 'initial_input_values' not in data:
+            missing = [index for index, site in enumerate(data['sites'])
+                       if 'initial_input_values' not in site]
+            if missing:
+                raise serializers.ValidationError(
+                    {"initial_input_values": f"required when sites {missing} do not provide their own"})
+        return data
+
 
 class DepthDataSerializer(serializers.Serializer):
     aquifer_layer = serializers.ListField(
@@ -81,3 +117,40 @@ class CalculationInputSerializer(serializers.Serializer):
     is_production_pump = serializers.BooleanField()
 
 
+
+
+class SweepUserInputSerializer(UserInputSerializer):
+    """
+    inputs for one site, plus lists of values for some of the initial input
+    values; every combination of the swept values is evaluated
+    """
+    sweep = serializers.DictField(
+        child=serializers.ListField(child=serializers.FloatField(), allow_empty=False),
+        allow_empty=False)
+    # dotted paths into the calculation results, e.g. 'cost_results.total_cost'
+    # or 'cost_results.0.cost'; a path to a group selects every value below it.
+    # all scalar results are returned when omitted
+    outputs = serializers.ListField(child=serializers.CharField(max_length=255),
+                                    required=False, allow_empty=False)
+
+    def validate_sweep(self, value):
+        fields = UserProvidedInitialInputValuesSerializer().fields
+        unknown = [name for name in value if name not in fields]
+        if unknown:
+            raise serializers.ValidationError(
+                f"cannot sweep {unknown}; choose from {list(fields)}")
+        swept = {}
+        for name, values in value.items():
+            try:
+                # same constraints as the single value, duplicates dropped
+                swept[name] = list(dict.fromkeys(fields[name].run_validation(v) for v in values))
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({name: e.detail})
+        combinations = 1
+        for values in swept.values():
+            combinations *= len(values)
+        max_combinations = getattr(settings, 'SWEEP_MAX_COMBINATIONS', 256)
+        if combinations > max_combinations:
+            raise serializers.ValidationError(
+                f"the sweep has {combinations} combinations; at most {max_combinations} are allowed")
+        return swept
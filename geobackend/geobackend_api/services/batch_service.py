@@ -0,0 +1,141 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+
+from ..serializers import CalculationInputSerializer
+from ..utils.data_fetch_utils import get_bbox_params_bulk
+from ..utils.timing import submit_with_context
+from .data_fetch_service import fetch_depth_data_and_watertable
+from .calculation_service import (complete_initial_input_values, submit_wellbore_calculation,
+                                  wait_for_calculation)
+
+logger = logging.getLogger(__name__)
+
+# number of locations fetched from the WMS at once, across all batch requests
+BATCH_FETCH_CONCURRENCY = getattr(settings, 'BATCH_FETCH_CONCURRENCY', 8)
+_batch_fetch_executor = ThreadPoolExecutor(max_workers=BATCH_FETCH_CONCURRENCY,
+                                           thread_name_prefix='batch-fetch')
+# watertable branches of the batch fetches, kept off the pool of single-site requests
+_batch_watertable_executor = ThreadPoolExecutor(max_workers=BATCH_FETCH_CONCURRENCY,
+                                                thread_name_prefix='batch-watertable')
+
+
+def run_batch_calculation(sites,
+                          crs_type,
+                          min_resolution,
+                          pixels,
+                          is_production_pump,
+                          initial_input_values=None) -> tuple[list, dict]:
+    """
+    Fetches WMS data and runs the wellbore calculation for many sites.
+
+    sites: list of {'coordinates': [..], 'initial_input_values': {..} (optional)}
+    initial_input_values: shared inputs for sites without their own
+
+    Sites that resolve to the same WMS request (identical points, or the
+    same grid cell when spatial quantization is enabled) are fetched once,
+    and identical calculations are run once. A failing site does not fail
+    the batch: returns one result per site, in input order, plus a summary.
+    """
+    coordinates = [site['coordinates'] for site in sites]
+    bbox_params_list = get_bbox_params_bulk(coordinates, min_resolution, pixels, crs_type)
+
+    # bbox params -> indices of the sites sharing that WMS request
+    locations = {}
+    for index, bbox_params in enumerate(bbox_params_list):
+        locations.setdefault(bbox_params, []).append(index)
+
+    results = [None] * len(sites)
+    fetch_futures = {
+        submit_with_context(_batch_fetch_executor, fetch_depth_data_and_watertable,
+                            coordinates[indices[0]], min_resolution, pixels, crs_type,
+                            bbox_params=bbox_params,
+                            watertable_executor=_batch_watertable_executor): (bbox_params, indices)
+        for bbox_params, indices in locations.items()
+    }
+
+    # calculation key -> (future, depth_data, [site indices])
+    calculations = {}
+    for fetch_future in as_completed(fetch_futures):
+        bbox_params, indices = fetch_futures[fetch_future]
+        try:
+            depth_data, watertable_depth = fetch_future.result()
+        except Exception as e:
+            for index in indices:
+                results[index] = _site_error(index, sites[index], "Error fetching data.", e)
+            continue
+
+        for index in indices:
+            site_values = sites[index].get('initial_input_values', initial_input_values)
+            try:
+                site_values = complete_initial_input_values(dict(site_values), depth_data, watertable_depth)
+            except (IndexError, KeyError) as e:
+                results[index] = _site_error(index, sites[index], "Incomplete aquifer data.",
+                                             e, aquifer_table=depth_data)
+                continue
+            serializer = CalculationInputSerializer(data={
+                "is_production_pump": is_production_pump,
+                "depth_data": depth_data,
+                "initial_input_values": site_values,
+            })
+            if not serializer.is_valid():
+                results[index] = _site_error(index, sites[index], "Failed serialization.",
+                                             serializer.errors, aquifer_table=depth_data)
+                continue
+
+            calculation_key = (bbox_params, json.dumps(site_values, sort_keys=True))
+            if calculation_key not in calculations:
+                # waits for one of CALCULATION_BULK_SLOTS, so a large batch queues
+                # behind itself and the other slots stay free for single-site requests
+                try:
+                    future = submit_wellbore_calculation(is_production_pump, depth_data, site_values,
+                                                         block=True)
+                except Exception as e:
+                    results[index] = _site_error(index, sites[index], 'An error occurred during calculation.',
+                                                 e, aquifer_table=depth_data)
+                    continue
+                calculations[calculation_key] = (future, depth_data, [])
+            calculations[calculation_key][2].append(index)
+
+    for future, depth_data, indices in calculations.values():
+        try:
+            calculation_results = wait_for_calculation(future)
+        except Exception as e:
+            message = 'Error during calculation.' if isinstance(e, ValueError) else \
+                'An error occurred during calculation.'
+            for index in indices:
+                results[index] = _site_error(index, sites[index], message, e, aquifer_table=depth_data)
+            continue
+        for index in indices:
+            results[index] = {
+                "index": index,
+                "coordinates": sites[index]['coordinates'],
+                "status": "ok",
+                "data": {
+                    "aquifer_table": depth_data,
+                    "installation_results": calculation_results.get("installation_results"),
+                    "cost_results": calculation_results.get("cost_results"),
+                },
+                "details": None,
+            }
+
+    summary = {
+        "sites": len(sites),
+        "unique_locations": len(locations),
+        "calculations": len(calculations),
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+    }
+    logger.info("Batch calculation complete: %s", summary)
+    return results, summary
+
+
+def _site_error(index, site, message, error, aquifer_table=None):
+    return {
+        "index": index,
+        "coordinates": site['coordinates'],
+        "status": "error",
+        "data": {"aquifer_table": aquifer_table} if aquifer_table is not None else None,
+        "details": {"message": message,
+                    "error": error if isinstance(error, (dict, list)) else str(error)},
+    }
@@ -1,40 +1,392 @@
+import time
+import asyncio
+import pickle
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+import numpy as np
 import pandas as pd
 import geodrillcalc.geodrillcalc_interface as gdc
 import geodrillcalc.exceptions as exceptions
 import logging
 
+from ..utils.calculation_cache import (calculation_cache_key, get_calculation_result, set_calculation_result,
+                                       aget_calculation_result, aset_calculation_result)
+from ..utils.serialization_utils import pack_results, unpack_results
+from ..utils.interface_pool import InterfacePool
+from ..utils.timing import timed
+
 logger = logging.getLogger(__name__)
 
+# calculations are CPU bound: 'thread' runs them inline in sync views and on a thread
+# pool for the async and batch views; 'process' runs every calculation on a process
+# pool, so throughput scales with cores instead of contending for one GIL
+CALCULATION_EXECUTOR = getattr(settings, 'CALCULATION_EXECUTOR', 'thread')
+CALCULATION_MAX_WORKERS = getattr(settings, 'CALCULATION_MAX_WORKERS', 4)
+# calculations allowed to wait for a free worker before submissions are rejected
+CALCULATION_MAX_QUEUE = getattr(settings, 'CALCULATION_MAX_QUEUE', 32)
+CALCULATION_TIMEOUT = getattr(settings, 'CALCULATION_TIMEOUT', 60)  # seconds, None to wait forever
+# share of the slots that batch and sweep calculations may hold
+CALCULATION_BULK_SLOTS = getattr(settings, 'CALCULATION_BULK_SLOTS', max(CALCULATION_MAX_WORKERS // 2, 1))
+CALCULATION_PROCESS_START_METHOD = getattr(settings, 'CALCULATION_PROCESS_START_METHOD', 'spawn')
+
+# idle GeoDrillCalcInterface instances kept per process, 0 to build one per calculation
+CALCULATION_INTERFACE_POOL_SIZE = getattr(settings, 'CALCULATION_INTERFACE_POOL_SIZE', CALCULATION_MAX_WORKERS)
+_interface_pool = InterfacePool(gdc.GeoDrillCalcInterface, max_size=CALCULATION_INTERFACE_POOL_SIZE)
+
+_calculation_executor = None
+_calculation_executor_lock = threading.Lock()
+# running + queued calculations
+_calculation_slots = threading.BoundedSemaphore(CALCULATION_MAX_WORKERS + CALCULATION_MAX_QUEUE)
+# taken by blocking submissions before a calculation slot, so batches and sweeps
+# wait among themselves and leave the other slots to single-site requests
+_bulk_calculation_slots = threading.BoundedSemaphore(CALCULATION_BULK_SLOTS)
+
+_stats_lock = threading.Lock()
+# in_flight: calculations holding a slot; overdue: those among them whose caller
+# timed out. A started calculation cannot be interrupted, so it keeps its slot
+# until it finishes; a steadily high overdue count means CALCULATION_TIMEOUT is
+# too short for the inputs, or that the slots are pinned by stuck calculations
+_calculation_stats = {'in_flight': 0, 'overdue': 0}
+
+
+class CalculationQueueFullError(RuntimeError):
+    """
+    raised when CALCULATION_MAX_QUEUE calculations are already waiting
+    """
+
+
+class CalculationTimeoutError(RuntimeError):
+    """
+    raised when a calculation does not finish within CALCULATION_TIMEOUT
+    """
+
+
+def get_calculation_stats() -> dict:
+    with _stats_lock:
+        return dict(_calculation_stats)
+
+
+def _count_calculation(name, delta):
+    with _stats_lock:
+        _calculation_stats[name] += delta
+
+
+def get_interface_pool_stats() -> dict:
+    """
+    interface pool of this process; with the process executor the
+    calculations use the pools of the worker processes instead
+    """
+    return _interface_pool.stats()
+
+
+def _init_calculation_worker():
+    """
+    process pool initializer: sets up Django and imports pandas and
+    geodrillcalc once, before the worker takes its first task
+    """
+    import django
+    django.setup()
+    import pandas  # noqa: F401
+    import geodrillcalc.geodrillcalc_interface  # noqa: F401
+    _interface_pool.warm()
+
+
+def _warm_calculation_worker():
+    return multiprocessing.current_process().pid
+
+
+def _create_calculation_executor():
+    if CALCULATION_EXECUTOR == 'process':
+        executor = ProcessPoolExecutor(max_workers=CALCULATION_MAX_WORKERS,
+                                       mp_context=multiprocessing.get_context(CALCULATION_PROCESS_START_METHOD),
+                                       initializer=_init_calculation_worker)
+        # one task per worker, so every process is started and initialised now
+        # rather than on the first requests
+        warm = [executor.submit(_warm_calculation_worker) for _ in range(CALCULATION_MAX_WORKERS)]
+        concurrent.futures.wait(warm)
+        logger.info("Calculation process pool ready: %d workers (%s)",
+                    CALCULATION_MAX_WORKERS, CALCULATION_PROCESS_START_METHOD)
+        return executor
+    if CALCULATION_EXECUTOR != 'thread':
+        raise ValueError(f"Unknown CALCULATION_EXECUTOR: {CALCULATION_EXECUTOR}")
+    return ThreadPoolExecutor(max_workers=CALCULATION_MAX_WORKERS,
+                              thread_name_prefix='wellbore-calc')
+
+
+def get_calculation_executor():
+    """
+    returns the calculation pool, creating (and for processes, warming) it on first use
+    """
+    global _calculation_executor
+    if _calculation_executor is None:
+        with _calculation_executor_lock:
+            if _calculation_executor is None:
+                _calculation_executor = _create_calculation_executor()
+    return _calculation_executor
+
+
+def _replace_broken_executor(broken):
+    global _calculation_executor
+    with _calculation_executor_lock:
+        if _calculation_executor is broken:
+            logger.error("Calculation process pool is broken, starting a new one")
+            broken.shutdown(wait=False, cancel_futures=True)
+            _calculation_executor = None
+
+# lower tertiary aquifer
+TARGET_AQUIFER_LAYER = '111lta'
+
+# columns of format_data_depth_table, in order, with their dtypes
+DEPTH_TABLE_DTYPES = {'aquifer_layer': object, 'is_aquifer': bool, 'depth_to_base': float}
+_DEPTH_TABLE_COLUMNS = pd.Index(list(DEPTH_TABLE_DTYPES))
+
+
+def complete_initial_input_values(initial_input_values, depth_data, watertable_depth):
+    """
+    adds the WMS-derived values the calculation needs to the user inputs (in place)
+    """
+    initial_input_values['groundwater_depth'] = watertable_depth
+    initial_input_values['top_aquifer_layer'] = depth_data['aquifer_layer'][0]
+    initial_input_values['target_aquifer_layer'] = TARGET_AQUIFER_LAYER
+    return initial_input_values
+
+
+def depth_table_to_frame(depth_data) -> pd.DataFrame:
+    """
+    builds the aquifer layer table from the format_data_depth_table dict of lists.
+    Columns are converted to known dtypes up front, so pd.DataFrame takes the
+    arrays without per-column inference or copies; anything that does not
+    have the expected shape takes the generic constructor
+    """
+    if list(depth_data) != list(DEPTH_TABLE_DTYPES):
+        return pd.DataFrame(depth_data)
+    try:
+        arrays = [np.array(depth_data[column], dtype=dtype) for column, dtype in DEPTH_TABLE_DTYPES.items()]
+    except (TypeError, ValueError):
+        return pd.DataFrame(depth_data)
+    if any(array.ndim != 1 or len(array) != len(arrays[0]) for array in arrays):
+        return pd.DataFrame(depth_data)
+    # pandas infers int64 for whole-number depths, and object for an empty table
+    if not any(isinstance(depth, float) for depth in depth_data['depth_to_base']):
+        return pd.DataFrame(depth_data)
+    return pd.DataFrame(dict(zip(_DEPTH_TABLE_COLUMNS, arrays)), copy=False)
+
+
 def perform_wellbore_calculation(is_production_pump,
                                  depth_data,
                                  initial_input_values):
-    depth_data_df = pd.DataFrame(depth_data)
-    # initialise the calculation module
-    geo_interface = gdc.GeoDrillCalcInterface()
+    depth_data_df = depth_table_to_frame(depth_data)
 
     try:
-        geo_interface.calculate_and_return_wellbore_parameters(
-            is_production_well=is_production_pump,
-            aquifer_layer_table=depth_data_df,
-            initial_input_params=initial_input_values
-        )
-        results = geo_interface.export_results_to_dict()
-        logger.info(f"Calculation successful.")
+        # a warm calculation module from the pool, reset after use
+        with _interface_pool.checkout() as geo_interface:
+            geo_interface.calculate_and_return_wellbore_parameters(
+                is_production_well=is_production_pump,
+                aquifer_layer_table=depth_data_df,
+                initial_input_params=initial_input_values
+            )
+            results = geo_interface.export_results_to_dict()
+        logger.info("Calculation successful.")
         return results
     except ValueError as e:
-        logger.error(f"Validation error during calculation: {e}")
+        logger.error("Validation error during calculation: %s", e)
         raise ValueError(f"Calculation error.- {e}") from e
     except exceptions.ShallowLTAError as e:
-        logger.error(f"Shallow LTA error: {e}")
+        logger.error("Shallow LTA error: %s", e)
         raise exceptions.ShallowLTAError(
             f"Shallow LTA Error: {e}. The LTA layer may be too shallow for drilling."
         ) from e
     except exceptions.InvalidGroundwaterLayerError as e:
-        logger.error(f"Invalid groundwater")
+        logger.error("Invalid groundwater layer: %s", e)
         raise exceptions.InvalidGroundwaterLayerError(f"Invalid groundwater layer detected: {e}") from e
     except exceptions.MissingDataError as e:
-        logger.error(f"Missing data error: {e}")
+        logger.error("Missing data error: %s", e)
         raise exceptions.MissingDataError(f"Missing data required for calculation: {e}") from e 
     except Exception as e:
         logger.exception("Unexpected error during calculation.")
         raise RuntimeError(f"{e}") from e
+
+
+def _perform_wellbore_calculation_in_worker(is_production_pump,
+                                            depth_data,
+                                            initial_input_values):
+    """
+    perform_wellbore_calculation, with exceptions that cannot cross the
+    process boundary replaced by a RuntimeError carrying the same message
+    """
+    try:
+        return perform_wellbore_calculation(is_production_pump, depth_data, initial_input_values)
+    except Exception as e:
+        if multiprocessing.parent_process() is None:
+            raise
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise RuntimeError(str(e)) from None
+        raise
+
+
+def _acquire_calculation_slots(block: bool = False) -> list:
+    """
+    takes a calculation slot, and for blocking submissions a bulk slot first
+    returns the slots to pass to _release_calculation_slots
+    raises CalculationQueueFullError when none is free (within CALCULATION_TIMEOUT when blocking)
+    """
+    if not block:
+        if not _calculation_slots.acquire(blocking=False):
+            raise CalculationQueueFullError("Too many calculations in progress, try again later.")
+        _count_calculation('in_flight', 1)
+        return [_calculation_slots]
+
+    deadline = None if CALCULATION_TIMEOUT is None else time.monotonic() + CALCULATION_TIMEOUT
+    acquired = []
+    for slot in (_bulk_calculation_slots, _calculation_slots):
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not slot.acquire(timeout=timeout):
+            for held in acquired:
+                held.release()
+            raise CalculationQueueFullError("Too many calculations in progress, try again later.")
+        acquired.append(slot)
+    _count_calculation('in_flight', 1)
+    return acquired
+
+
+def _release_calculation_slots(slots):
+    _count_calculation('in_flight', -1)
+    for slot in slots:
+        slot.release()
+
+
+def submit_wellbore_calculation(is_production_pump,
+                                depth_data,
+                                initial_input_values,
+                                block: bool = False) -> Future:
+    """
+    schedules perform_wellbore_calculation on the calculation pool
+    raises CalculationQueueFullError when the pool and its queue are full
+
+    block is for batch and sweep requests: the submission waits for one of
+    CALCULATION_BULK_SLOTS, then for a calculation slot, and is rejected only
+    when none frees up within CALCULATION_TIMEOUT
+    """
+    slots = _acquire_calculation_slots(block)
+    try:
+        executor = get_calculation_executor()
+        try:
+            future = executor.submit(_perform_wellbore_calculation_in_worker,
+                                     is_production_pump, depth_data, initial_input_values)
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory); retry once on a fresh pool
+            _replace_broken_executor(executor)
+            future = get_calculation_executor().submit(_perform_wellbore_calculation_in_worker,
+                                                       is_production_pump, depth_data, initial_input_values)
+    except BaseException:
+        _release_calculation_slots(slots)
+        raise
+    future.add_done_callback(lambda _: _release_calculation_slots(slots))
+    return future
+
+
+def abandon_calculation(future: Future):
+    """
+    cancels a calculation its caller no longer waits for. One that has
+    started cannot be interrupted: it keeps its slot until it finishes,
+    its result is discarded, and it is counted as overdue meanwhile
+    """
+    if future.cancel():
+        return
+    _count_calculation('overdue', 1)
+    future.add_done_callback(lambda _: _count_calculation('overdue', -1))
+
+
+def wait_for_calculation(future: Future, timeout=CALCULATION_TIMEOUT):
+    """
+    returns the result of a submitted calculation, re-raising its exception
+    raises CalculationTimeoutError after timeout seconds
+    """
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        abandon_calculation(future)
+        raise CalculationTimeoutError(f"Calculation did not finish within {timeout} s.") from None
+
+
+def run_wellbore_calculation(is_production_pump,
+                             depth_data,
+                             initial_input_values):
+    """
+    runs the calculation inline on the request thread, or on the
+    process pool when CALCULATION_EXECUTOR is 'process'. Either way it
+    holds a calculation slot, so the sync views count against the same
+    bound as the async, batch and sweep paths
+    """
+    if CALCULATION_EXECUTOR == 'process':
+        return wait_for_calculation(submit_wellbore_calculation(
+            is_production_pump, depth_data, initial_input_values))
+    slots = _acquire_calculation_slots()
+    try:
+        return perform_wellbore_calculation(is_production_pump, depth_data, initial_input_values)
+    finally:
+        _release_calculation_slots(slots)
+
+
+async def aperform_wellbore_calculation(is_production_pump,
+                                        depth_data,
+                                        initial_input_values):
+    """
+    runs perform_wellbore_calculation on the calculation pool
+    so the event loop is never blocked
+    """
+    future = submit_wellbore_calculation(is_production_pump, depth_data, initial_input_values)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), CALCULATION_TIMEOUT)
+    except asyncio.TimeoutError:
+        abandon_calculation(future)
+        raise CalculationTimeoutError(f"Calculation did not finish within {CALCULATION_TIMEOUT} s.") from None
+
+
+def perform_cached_wellbore_calculation(is_production_pump,
+                                        depth_data,
+                                        initial_input_values) -> tuple[dict, bytes]:
+    """
+    perform_wellbore_calculation, memoized on its canonicalised inputs
+    returns ({key: orjson.Fragment}, results encoded as JSON). Results are
+    encoded once and cached with pack_results; a hit slices the fragments
+    out of the stored bytes and skips the calculation without decoding them
+    """
+    with timed('calculation_cache'):
+        cache_key = calculation_cache_key(is_production_pump, depth_data, initial_input_values)
+        cached_results = get_calculation_result(cache_key)
+    if cached_results is not None:
+        return unpack_results(cached_results)
+    with timed('calculation'):
+        results = run_wellbore_calculation(is_production_pump, depth_data, initial_input_values)
+    with timed('serialization'):
+        fragments, json_results, packed_results = pack_results(results)
+    with timed('calculation_cache'):
+        set_calculation_result(cache_key, packed_results)
+    return fragments, json_results
+
+
+async def aperform_cached_wellbore_calculation(is_production_pump,
+                                               depth_data,
+                                               initial_input_values) -> tuple[dict, bytes]:
+    """
+    asyncio variant of perform_cached_wellbore_calculation
+    """
+    with timed('calculation_cache'):
+        cache_key = calculation_cache_key(is_production_pump, depth_data, initial_input_values)
+        cached_results = await aget_calculation_result(cache_key)
+    if cached_results is not None:
+        return unpack_results(cached_results)
+    with timed('calculation'):
+        results = await aperform_wellbore_calculation(is_production_pump, depth_data, initial_input_values)
+    with timed('serialization'):
+        fragments, json_results, packed_results = pack_results(results)
+    with timed('calculation_cache'):
+        await aset_calculation_result(cache_key, packed_results)
+    return fragments, json_results
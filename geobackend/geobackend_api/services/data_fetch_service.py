@@ -1,22 +1,80 @@
+import asyncio
 import logging
-from ..utils.data_fetch_utils import generate_formatted_depth_data, fetch_watertable_depth
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from ..utils.data_fetch_utils import (generate_formatted_depth_data, fetch_watertable_depth,
+                                     agenerate_formatted_depth_data, afetch_watertable_depth,
+                                     get_bbox_params)
+from ..utils.timing import timed, submit_with_context
 
 logger = logging.getLogger(__name__)
 
+# runs the watertable branch of single-site requests, one thread per request;
+# size it to the number of requests the server handles at once
+WMS_FETCH_MAX_WORKERS = getattr(settings, 'WMS_FETCH_MAX_WORKERS', 32)
+_fetch_executor = ThreadPoolExecutor(max_workers=WMS_FETCH_MAX_WORKERS,
+                                     thread_name_prefix='wms-fetch')
 
-def fetch_depth_data_and_watertable(coordinates, min_resolution, pixels, crs_type):
+
+def fetch_depth_data_and_watertable(coordinates, min_resolution, pixels, crs_type, bbox_params=None,
+                                    watertable_executor=None):
     """
     Fetches both depth data and watertable depth from WMS sources.
+
+    The watertable request does not depend on the layer discovery /
+    aquifer info chain, so it runs on watertable_executor (the shared
+    fetch pool by default; batches pass their own) while the calling
+    thread fetches the depth data. If the depth data fails the watertable
+    fetch is cancelled, and the error is re-raised. bbox_params are computed once here and
+    shared by both branches.
+    """
+    watertable_future = None
+    try:
+        if bbox_params is None:
+            with timed('bbox'):
+                bbox_params = get_bbox_params(coordinates, min_resolution, pixels, crs_type)
+        watertable_future = submit_with_context(
+            watertable_executor or _fetch_executor, fetch_watertable_depth,
+            coordinates, min_resolution, pixels, crs_type, bbox_params=bbox_params
+        )
+        depth_data = generate_formatted_depth_data(coordinates, min_resolution, pixels, crs_type,
+                                                   bbox_params=bbox_params)
+        watertable_depth = watertable_future.result()
+        return depth_data, watertable_depth
+    except Exception as e:
+        if watertable_future is not None:
+            # a fetch that has already started cannot be interrupted; its result is discarded
+            watertable_future.cancel()
+        logger.error("Error fetching WMS data: %s", e)
+        raise Exception("Error fetching WMS data") from e
+
+
+async def afetch_depth_data_and_watertable(coordinates, min_resolution, pixels, crs_type, bbox_params=None):
+    """
+    asyncio variant of fetch_depth_data_and_watertable.
+    Both branches run as tasks on the current loop; the first failure
+    cancels the other one, as does cancellation of the caller.
     """
+    tasks = ()
     try:
-        depth_data = generate_formatted_depth_data(
-            coordinates, min_resolution, pixels, crs_type
+        if bbox_params is None:
+            with timed('bbox'):
+                bbox_params = get_bbox_params(coordinates, min_resolution, pixels, crs_type)
+        depth_task = asyncio.create_task(
+            agenerate_formatted_depth_data(coordinates, min_resolution, pixels, crs_type,
+                                           bbox_params=bbox_params)
         )
-        watertable_depth = fetch_watertable_depth(
-            coordinates, min_resolution, pixels, crs_type
+        watertable_task = asyncio.create_task(
+            afetch_watertable_depth(coordinates, min_resolution, pixels, crs_type,
+                                    bbox_params=bbox_params)
         )
-        #logger.info("Fetched depth data and watertable depth successfully.")
+        tasks = (depth_task, watertable_task)
+        depth_data, watertable_depth = await asyncio.gather(*tasks)
         return depth_data, watertable_depth
     except Exception as e:
-        logger.error(f"Error fetching WMS data: {str(e)}")
-        raise Exception("Error fetching WMS data") from e
\ No newline at end of file
+        logger.error("Error fetching WMS data: %s", e)
+        raise Exception("Error fetching WMS data") from e
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
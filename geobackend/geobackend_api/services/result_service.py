@@ -0,0 +1,296 @@
+import zlib
+import threading
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.db import close_old_connections
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from asgiref.sync import sync_to_async
+
+from ..fields import RawJSON
+from ..models import WellBoreCalculationResult
+from ..utils.cache_utils import (redis_client, get_async_redis_client, frame_payload, unframe_payload,
+                                 CacheDecodeError)
+from ..utils.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# where calculation results are kept: 'model' (WellBoreCalculationResult rows)
+# or 'redis' (compressed, expiring with the session)
+RESULT_STORE = getattr(settings, 'RESULT_STORE', 'model')
+
+# model store: persist results from a background thread instead of the request path
+RESULT_WRITE_BEHIND = getattr(settings, 'RESULT_WRITE_BEHIND', True)
+RESULT_WRITE_QUEUE_SIZE = getattr(settings, 'RESULT_WRITE_QUEUE_SIZE', 1000)
+RESULT_WRITE_BATCH_SIZE = getattr(settings, 'RESULT_WRITE_BATCH_SIZE', 100)
+RESULT_WRITE_FLUSH_INTERVAL = getattr(settings, 'RESULT_WRITE_FLUSH_INTERVAL', 0.5)  # seconds
+RESULT_WRITE_OVERFLOW = getattr(settings, 'RESULT_WRITE_OVERFLOW', 'sync')
+
+# redis store: results live as long as the session cookie
+RESULT_STORE_TTL = getattr(settings, 'RESULT_STORE_TTL', None) or settings.SESSION_COOKIE_AGE  # seconds
+RESULT_KEY_PREFIX = 'result:'
+
+
+class ResultStore:
+    """
+    Keeps the latest calculation results of each session, as JSON bytes.
+    save replaces any previous results of the session.
+    """
+
+    def save(self, session_key, json_results):
+        raise NotImplementedError
+
+    async def asave(self, session_key, json_results):
+        await sync_to_async(self.save)(session_key, json_results)
+
+    def get(self, session_key) -> bytes | None:
+        raise NotImplementedError
+
+    async def aget(self, session_key) -> bytes | None:
+        return await sync_to_async(self.get)(session_key)
+
+    def delete(self, session_key):
+        raise NotImplementedError
+
+    def clear_expired(self, existing_sessions, max_age) -> int:
+        """
+        removes results whose session has expired: those not updated for
+        max_age seconds, and any others whose key existing_sessions(keys),
+        called with a chunk of session keys, leaves out.
+        returns the number removed; stores that expire on their own return 0
+        """
+        return 0
+
+    def flush(self):
+        """
+        waits for buffered writes, if the store has any
+        """
+
+    def stats(self) -> dict:
+        return {}
+
+
+def upsert_results(items):
+    """
+    items: (session_key, JSON encoded results)
+    inserts or replaces the result row of each session in one statement
+    """
+    close_old_connections()
+    WellBoreCalculationResult.objects.bulk_create(
+        [WellBoreCalculationResult(session_key=session_key, result_data=RawJSON(json_results))
+         for session_key, json_results in items],
+        update_conflicts=True,
+        unique_fields=['session_key'],
+        update_fields=['result_data', 'updated_at'],
+    )
+
+
+class ModelResultStore(ResultStore):
+    """
+    WellBoreCalculationResult rows, upserted by a write-behind queue
+    (or inline with RESULT_WRITE_BEHIND off)
+    """
+
+    def __init__(self):
+        # results queued but not yet written, so this process reads its own writes
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self.writer = WriteBehindQueue(self._write_batch,
+                                       key=lambda item: item[0],
+                                       max_size=RESULT_WRITE_QUEUE_SIZE,
+                                       batch_size=RESULT_WRITE_BATCH_SIZE,
+                                       flush_interval=RESULT_WRITE_FLUSH_INTERVAL,
+                                       overflow=RESULT_WRITE_OVERFLOW,
+                                       name='result-writer',
+                                       on_discard=self._forget_pending)
+
+    def _write_batch(self, items):
+        upsert_results(items)
+        self._forget_pending(items)
+
+    def _forget_pending(self, items):
+        """
+        called once items are written, dropped or failed; a newer result
+        queued for the same session since then stays pending
+        """
+        with self._pending_lock:
+            for session_key, json_results in items:
+                if self._pending.get(session_key) is json_results:
+                    del self._pending[session_key]
+
+    def _mark_pending(self, session_key, json_results):
+        with self._pending_lock:
+            self._pending[session_key] = json_results
+
+    def save(self, session_key, json_results):
+        if RESULT_WRITE_BEHIND:
+            self._mark_pending(session_key, json_results)
+            self.writer.put((session_key, json_results))
+        else:
+            upsert_results([(session_key, json_results)])
+
+    async def asave(self, session_key, json_results):
+        item = (session_key, json_results)
+        if not RESULT_WRITE_BEHIND:
+            await sync_to_async(upsert_results)([item])
+            return
+        self._mark_pending(session_key, json_results)
+        if not self.writer.try_put(item):
+            if RESULT_WRITE_OVERFLOW == 'sync':
+                # the overflow write touches the database, so keep it off the event loop
+                await sync_to_async(self.writer.write_now)(item)
+            else:
+                self.writer.put(item)
+
+    def get(self, session_key) -> bytes | None:
+        with self._pending_lock:
+            pending = self._pending.get(session_key)
+        if pending is not None:
+            return pending.encode('utf-8') if isinstance(pending, str) else pending
+        # the stored text as written, not decoded and encoded again, so the
+        # ETag hashes the bytes that were saved
+        result_data = WellBoreCalculationResult.objects.filter(session_key=session_key).annotate(
+            raw=Cast('result_data', TextField())).values_list('raw', flat=True).first()
+        return None if result_data is None else result_data.encode('utf-8')
+
+    def delete(self, session_key):
+        with self._pending_lock:
+            self._pending.pop(session_key, None)
+        WellBoreCalculationResult.objects.filter(session_key=session_key).delete()
+
+    def clear_expired(self, existing_sessions, max_age, chunk_size=500) -> int:
+        results = WellBoreCalculationResult.objects
+        removed, _ = results.filter(updated_at__lt=timezone.now() - timedelta(seconds=max_age)).delete()
+        session_keys = results.values_list('session_key', flat=True).distinct().order_by('session_key')
+        orphaned = []
+        chunk = []
+        for session_key in session_keys.iterator(chunk_size=chunk_size):
+            chunk.append(session_key)
+            if len(chunk) >= chunk_size:
+                orphaned.extend(self._orphaned(existing_sessions, chunk))
+                chunk = []
+        if chunk:
+            orphaned.extend(self._orphaned(existing_sessions, chunk))
+        for start in range(0, len(orphaned), chunk_size):
+            count, _ = results.filter(session_key__in=orphaned[start:start + chunk_size]).delete()
+            removed += count
+        return removed
+
+    def _orphaned(self, existing_sessions, session_keys) -> list:
+        with self._pending_lock:
+            session_keys = [session_key for session_key in session_keys if session_key not in self._pending]
+        existing = existing_sessions(session_keys) if session_keys else set()
+        return [session_key for session_key in session_keys if session_key not in existing]
+
+    def flush(self):
+        self.writer.flush()
+
+    def stats(self) -> dict:
+        return self.writer.stats()
+
+
+class RedisResultStore(ResultStore):
+    """
+    One compressed Redis value per session, expiring after RESULT_STORE_TTL;
+    a save is a single SETEX, so there is nothing to queue or lock
+    """
+
+    def __init__(self, ttl=RESULT_STORE_TTL):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(session_key):
+        return RESULT_KEY_PREFIX + session_key
+
+    @staticmethod
+    def _encode(json_results):
+        if isinstance(json_results, str):
+            json_results = json_results.encode('utf-8')
+        return frame_payload(json_results, compress=True)
+
+    def _decode(self, session_key, data):
+        if data is None:
+            return None
+        try:
+            return unframe_payload(data)
+        except (CacheDecodeError, zlib.error) as e:
+            logger.warning("Discarding unreadable results of session %s: %s", session_key, e)
+            return None
+
+    def save(self, session_key, json_results):
+        redis_client.setex(self._key(session_key), self.ttl, self._encode(json_results))
+
+    async def asave(self, session_key, json_results):
+        await get_async_redis_client().setex(self._key(session_key), self.ttl, self._encode(json_results))
+
+    def get(self, session_key) -> bytes | None:
+        return self._decode(session_key, redis_client.get(self._key(session_key)))
+
+    async def aget(self, session_key) -> bytes | None:
+        return self._decode(session_key, await get_async_redis_client().get(self._key(session_key)))
+
+    def delete(self, session_key):
+        redis_client.delete(self._key(session_key))
+
+
+RESULT_STORES = {
+    'model': ModelResultStore,
+    'redis': RedisResultStore,
+}
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """
+    returns the configured result store, creating it on first use
+    """
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                if RESULT_STORE not in RESULT_STORES:
+                    raise ValueError(f"Unknown RESULT_STORE: {RESULT_STORE}")
+                _result_store = RESULT_STORES[RESULT_STORE]()
+    return _result_store
+
+
+def save_calculation_result(session_key, json_results):
+    """
+    stores the session's latest results, replacing any previous ones
+    """
+    get_result_store().save(session_key, json_results)
+
+
+async def asave_calculation_result(session_key, json_results):
+    await get_result_store().asave(session_key, json_results)
+
+
+def load_calculation_result(session_key) -> bytes | None:
+    """
+    the session's latest results as JSON bytes, None when there are none
+    """
+    return get_result_store().get(session_key)
+
+
+def delete_calculation_results(session_key):
+    get_result_store().delete(session_key)
+
+
+def clear_expired_calculation_results(existing_sessions, max_age=None) -> int:
+    """
+    removes stored results of sessions that no longer exist, see ResultStore.clear_expired;
+    max_age defaults to SESSION_COOKIE_AGE
+    """
+    return get_result_store().clear_expired(existing_sessions, max_age or settings.SESSION_COOKIE_AGE)
+
+
+def flush_calculation_results():
+    get_result_store().flush()
+
+
+def get_result_writer_stats() -> dict:
+    return get_result_store().stats()
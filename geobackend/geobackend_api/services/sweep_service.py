@@ -0,0 +1,118 @@
+import itertools
+import logging
+
+from ..utils.calculation_cache import calculation_cache_key, get_calculation_results, set_calculation_result
+from ..utils.serialization_utils import loads_json, pack_results, unpack_results
+from .calculation_service import submit_wellbore_calculation, wait_for_calculation
+
+logger = logging.getLogger(__name__)
+
+
+def run_parameter_sweep(is_production_pump,
+                        depth_data,
+                        initial_input_values,
+                        sweep,
+                        outputs=None) -> tuple[dict, dict]:
+    """
+    Evaluates the wellbore calculation for every combination of the swept
+    input values at one site.
+
+    initial_input_values: complete calculation inputs (see complete_initial_input_values)
+    sweep: {input name: [values]}; each combination overrides initial_input_values
+    outputs: dotted paths into the results to report, default every scalar result;
+             list items are addressed by position, see flatten_scalars
+
+    Combinations already in the calculation cache, looked up in one round
+    trip, are not recomputed; the rest are submitted to the calculation pool
+    together and run in parallel.
+    returns a compact table, {'columns': [..], 'rows': [[..], ..]} with one
+    row per combination, and a summary
+    """
+    names = list(sweep)
+    combinations = list(itertools.product(*(sweep[name] for name in names)))
+
+    results = [None] * len(combinations)
+    errors = [None] * len(combinations)
+    pending = {}
+    cached = 0
+    inputs = [{**initial_input_values, **dict(zip(names, combination))} for combination in combinations]
+    cache_keys = [calculation_cache_key(is_production_pump, depth_data, values) for values in inputs]
+    for index, cached_results in enumerate(get_calculation_results(cache_keys)):
+        cache_key = cache_keys[index]
+        if cached_results is not None:
+            _, json_results = unpack_results(cached_results)
+            results[index] = loads_json(json_results)
+            cached += 1
+            continue
+        try:
+            pending[index] = (cache_key, submit_wellbore_calculation(is_production_pump, depth_data,
+                                                                     inputs[index], block=True))
+        except Exception as e:
+            errors[index] = str(e)
+
+    for index, (cache_key, future) in pending.items():
+        try:
+            calculation_results = wait_for_calculation(future)
+        except Exception as e:
+            errors[index] = str(e)
+            continue
+        _, json_results, packed_results = pack_results(calculation_results)
+        set_calculation_result(cache_key, packed_results)
+        # reported from the JSON form, so cached and fresh rows are identical
+        results[index] = loads_json(json_results)
+
+    flattened = [flatten_scalars(result) if result is not None else {} for result in results]
+    columns = list(dict.fromkeys(key for row in flattened for key in row))
+    if outputs is None:
+        outputs = columns
+    elif any(result is not None for result in results):
+        outputs = expand_outputs(outputs, columns)
+    rows = [[*combination, 'error' if errors[index] else 'ok', errors[index],
+             *(flattened[index].get(output) for output in outputs)]
+            for index, combination in enumerate(combinations)]
+
+    summary = {
+        "combinations": len(combinations),
+        "cached": cached,
+        "calculated": len(pending) - sum(1 for index in pending if errors[index]),
+        "failed": sum(1 for error in errors if error),
+    }
+    logger.info("Parameter sweep complete: %s", summary)
+    return {"columns": [*names, 'status', 'error', *outputs], "rows": rows}, summary
+
+
+def flatten_scalars(value, prefix='') -> dict:
+    """
+    {'a': {'b': 1, 'c': [2, {'d': 3}]}} -> {'a.b': 1, 'a.c.0': 2, 'a.c.1.d': 3}
+    list items, including the records of a result table, are keyed by position
+    """
+    flattened = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flattened.update(flatten_scalars(item, f'{prefix}{key}.'))
+    elif isinstance(value, list):
+        for position, item in enumerate(value):
+            flattened.update(flatten_scalars(item, f'{prefix}{position}.'))
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        flattened[prefix[:-1]] = value
+    return flattened
+
+
+def expand_outputs(outputs, columns) -> list:
+    """
+    a requested output naming a scalar is kept; one naming a dict or list,
+    e.g. 'cost_results', stands for every scalar below it
+    """
+    expanded = []
+    unknown = []
+    for output in outputs:
+        if output in columns:
+            expanded.append(output)
+            continue
+        below = [column for column in columns if column.startswith(f'{output}.')]
+        if not below:
+            unknown.append(output)
+        expanded.extend(below)
+    if unknown:
+        raise ValueError(f"outputs {unknown} are not in the calculation results")
+    return list(dict.fromkeys(expanded))
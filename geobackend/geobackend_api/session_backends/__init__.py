@@ -0,0 +1,44 @@
+"""
+Session engines that remove a session's stored calculation results when the
+session is deleted (logout, flush, cycle_key). Point SESSION_ENGINE at
+geobackend_api.session_backends.cache, .cached_db or .db.
+
+Sessions that simply expire are never deleted through the engine; the
+clear_expired_results command cleans up after those.
+"""
+
+
+class DeleteResultsMixin:
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            # imported here, session engines are loaded before the app's models
+            from ..services.result_service import delete_calculation_results
+            delete_calculation_results(session_key)
+
+
+def existing_sessions(session_store, session_keys) -> set:
+    """
+    the keys among session_keys whose session exists, looked up with one
+    get_many on the session cache and one query on the session table where
+    the engine has them, instead of an exists() call per key
+    """
+    session_keys = list(session_keys)
+    found = set()
+    prefix = getattr(session_store, 'cache_key_prefix', None)
+    if prefix is not None:
+        cached = session_store._cache.get_many([prefix + session_key for session_key in session_keys])
+        found.update(session_key for session_key in session_keys if prefix + session_key in cached)
+    missing = [session_key for session_key in session_keys if session_key not in found]
+    if not missing:
+        return found
+    if hasattr(session_store, 'get_model_class'):
+        # db and cached_db; a cached_db session may have left the cache
+        found.update(session_store.get_model_class().objects.filter(
+            session_key__in=missing).values_list('session_key', flat=True))
+    elif prefix is None:
+        found.update(session_key for session_key in missing if session_store.exists(session_key))
+    return found
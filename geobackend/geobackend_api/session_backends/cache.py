@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cache
+
+from . import DeleteResultsMixin
+
+
+class SessionStore(DeleteResultsMixin, cache.SessionStore):
+    pass
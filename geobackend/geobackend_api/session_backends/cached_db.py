@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cached_db
+
+from . import DeleteResultsMixin
+
+
+class SessionStore(DeleteResultsMixin, cached_db.SessionStore):
+    pass
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import db
+
+from . import DeleteResultsMixin
+
+
+class SessionStore(DeleteResultsMixin, db.SessionStore):
+    pass
@@ -0,0 +1,46 @@
+"""
+In-memory stand-ins shared by the tests
+"""
+import threading
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+import fakeredis
+
+from ..utils import cache_utils
+
+
+def patch_redis_cache(test_case) -> fakeredis.FakeStrictRedis:
+    """
+    points cache_utils at an in-memory Redis, sync and asyncio clients
+    sharing one server, with an empty local tier and zeroed counters,
+    for the duration of test_case
+    returns the sync client
+    """
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeStrictRedis(server=server)
+    patcher = mock.patch.multiple(
+        cache_utils,
+        redis_client=client,
+        _release_lock=client.register_script(cache_utils._RELEASE_LOCK_SCRIPT),
+        get_async_redis_client=lambda: fakeredis.FakeAsyncRedis(server=server),
+        _cache_stats={'local': {'hits': 0, 'misses': 0}, 'redis': {'hits': 0, 'misses': 0}},
+    )
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    cache_utils.local_cache.clear()
+    test_case.addCleanup(cache_utils.local_cache.clear)
+    return client
+
+
+def serve_in_thread(test_case, server: ThreadingHTTPServer) -> str:
+    """
+    serves server on a daemon thread until test_case finishes
+    returns its base url
+    """
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test_case.addCleanup(server.server_close)
+    test_case.addCleanup(server.shutdown)
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+from django.test.client import AsyncRequestFactory
+
+from .. import views
+from ..benchmarks import FIXTURE_DIR, load_calculation_corpus
+from ..throttling import AsyncAnonRateThrottle
+from ..utils import cache_utils, data_fetch_utils
+from ..utils.data_fetch_utils import (generate_formatted_depth_data, fetch_watertable_depth,
+                                      agenerate_formatted_depth_data, afetch_watertable_depth)
+from ..utils.stub_wms import StubWMSServer, load_responses
+from .fakes import patch_redis_cache, serve_in_thread
+
+LOCATION = ([-37.8, 144.9], 100, [100, 100], 'epsg:4326')
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class AsyncFetchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = patch_redis_cache(self)
+        self.stub = StubWMSServer(('127.0.0.1', 0), load_responses(FIXTURE_DIR))
+        base_url = serve_in_thread(self, self.stub)
+        patcher = mock.patch.object(data_fetch_utils, 'WMS_BASE_URL', f"{base_url}/geoserver/vvg/wms")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def forget_cached(self):
+        self.redis.flushall()
+        cache_utils.local_cache.clear()
+
+    def test_async_pipeline_matches_sync(self):
+        depth_data = generate_formatted_depth_data(*LOCATION)
+        watertable_depth = fetch_watertable_depth(*LOCATION)
+        self.forget_cached()
+
+        async def fetch():
+            return await asyncio.gather(agenerate_formatted_depth_data(*LOCATION),
+                                        afetch_watertable_depth(*LOCATION))
+
+        self.assertEqual(asyncio.run(fetch()), [depth_data, watertable_depth])
+        self.assertEqual(self.stub.stats()['layers'], 2)
+        self.assertEqual(self.stub.stats()['watertable_depth'], 2)
+
+    def test_async_hits_are_served_from_the_cache(self):
+        first = asyncio.run(agenerate_formatted_depth_data(*LOCATION))
+        requests_made = self.stub.stats()
+        self.assertEqual(asyncio.run(agenerate_formatted_depth_data(*LOCATION)), first)
+        self.assertEqual(self.stub.stats(), requests_made)
+
+    def test_upstream_error(self):
+        self.stub.error_rate = 1
+        with self.assertLogs('geobackend_api', 'ERROR'), \
+                self.assertRaisesMessage(Exception, 'Error retrieving watertable depth'):
+            asyncio.run(afetch_watertable_depth(*LOCATION))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class AsyncWellBoreCalcViewTests(SimpleTestCase):
+
+    def setUp(self):
+        case = load_calculation_corpus()[0]
+        self.depth_data = case['depth_data']
+        self.body = {
+            'coordinates': LOCATION[0],
+            'crs_type': 'epsg:4326',
+            'min_resolution': 100,
+            'pixels': [100, 100],
+            'is_production_pump': 'true',
+            'initial_input_values': case['initial_input_values'],
+        }
+        self.results = {'installation_results': {'pump_depth': 12.5}, 'cost_results': {'total': 1000.0}}
+        self.saved = []
+
+        async def fetch(**kwargs):
+            return self.depth_data, case['watertable_depth']
+
+        async def calculate(is_production_pump, depth_data, initial_input_values):
+            return self.results, b'{"installation_results":{"pump_depth":12.5}}'
+
+        async def save(session_key, json_results):
+            self.saved.append((session_key, json_results))
+
+        patcher = mock.patch.multiple(views, afetch_depth_data_and_watertable=fetch,
+                                      aperform_cached_wellbore_calculation=calculate,
+                                      asave_calculation_result=save)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # throttle history from earlier tests
+        cache.clear()
+        self.view = views.AsyncWellBoreCalcView.as_view()
+        self.factory = AsyncRequestFactory()
+
+    def post(self):
+        request = self.factory.post('/api/calculate-wellbore', self.body, content_type='application/json')
+        request.session = SessionStore()
+        response = asyncio.run(self.view(request))
+        response.render()
+        return request, response
+
+    def test_calculation(self):
+        request, response = self.post()
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['data']['aquifer_table'], self.depth_data)
+        self.assertEqual(response.data['data']['cost_results'], self.results['cost_results'])
+        self.assertIsNotNone(request.session.session_key)
+        self.assertEqual(self.saved, [(request.session.session_key,
+                                       b'{"installation_results":{"pump_depth":12.5}}')])
+
+    def test_invalid_input(self):
+        del self.body['coordinates']
+        _, response = self.post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.saved, [])
+
+    def test_throttle_and_session_stay_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        blocking_calls = []
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                blocking_calls.append((method.__qualname__, threading.get_ident()))
+                return method(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(LocMemCache, 'get', record(LocMemCache.get)), \
+                mock.patch.object(LocMemCache, 'set', record(LocMemCache.set)), \
+                mock.patch.object(SessionStore, 'create', record(SessionStore.create)):
+            _, response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({name for name, _ in blocking_calls},
+                         {'LocMemCache.get', 'LocMemCache.set', 'SessionStore.create'})
+        self.assertNotIn(loop_thread, {thread for _, thread in blocking_calls})
+
+    def test_throttle(self):
+        with mock.patch.object(AsyncAnonRateThrottle, 'rate', '2/minute', create=True):
+            statuses = [self.post()[1].status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..benchmarks import load_calculation_corpus
+from ..services import batch_service, calculation_service
+from ..services.batch_service import run_batch_calculation
+
+CASE = load_calculation_corpus()[0]
+GOOD, UNREACHABLE, NO_AQUIFER = [-37.8, 144.9], [-37.8, 145.9], [-37.8, 146.9]
+FAILING_FLOW_RATE = 666
+
+
+def fetch(coordinates, *args, **kwargs):
+    if list(coordinates) == UNREACHABLE:
+        raise Exception("Error fetching WMS data")
+    if list(coordinates) == NO_AQUIFER:
+        return {'aquifer_layer': [], 'is_aquifer': [], 'depth_to_base': []}, 3.0
+    return CASE['depth_data'], CASE['watertable_depth']
+
+
+def calculate(is_production_pump, depth_data, initial_input_values):
+    if initial_input_values['required_flow_rate'] == FAILING_FLOW_RATE:
+        raise ValueError("Calculation error.- drawdown exceeds the allowable drawdown")
+    return {'installation_results': {'flow_rate': initial_input_values['required_flow_rate']},
+            'cost_results': {'total': 1}}
+
+
+class BatchCalculationTests(SimpleTestCase):
+
+    def setUp(self):
+        for patcher in (mock.patch.object(batch_service, 'fetch_depth_data_and_watertable', fetch),
+                        mock.patch.object(calculation_service, '_perform_wellbore_calculation_in_worker',
+                                          calculate)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_batch(self, sites):
+        return run_batch_calculation(sites, crs_type='epsg:4326', min_resolution=100, pixels=[100, 100],
+                                     is_production_pump=True, initial_input_values=CASE['initial_input_values'])
+
+    def test_site_errors_do_not_fail_the_batch(self):
+        failing_values = {**CASE['initial_input_values'], 'required_flow_rate': FAILING_FLOW_RATE}
+        results, summary = self.run_batch([
+            {'coordinates': GOOD},
+            {'coordinates': UNREACHABLE},
+            {'coordinates': GOOD, 'initial_input_values': failing_values},
+            {'coordinates': NO_AQUIFER},
+            {'coordinates': GOOD},
+        ])
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3, 4])
+        self.assertEqual([result['status'] for result in results], ['ok', 'error', 'error', 'error', 'ok'])
+        self.assertEqual(results[1]['details']['message'], "Error fetching data.")
+        self.assertEqual(results[2]['details']['message'], "Error during calculation.")
+        self.assertIn('drawdown', results[2]['details']['error'])
+        self.assertEqual(results[3]['details']['message'], "Incomplete aquifer data.")
+        self.assertEqual(results[0]['data']['installation_results'], {'flow_rate': 5})
+        self.assertEqual(summary['failed'], 3)
+
+    def test_identical_sites_are_fetched_and_calculated_once(self):
+        with mock.patch.object(batch_service, 'fetch_depth_data_and_watertable', wraps=fetch) as fetched:
+            results, summary = self.run_batch([{'coordinates': GOOD}] * 3)
+        self.assertEqual(fetched.call_count, 1)
+        self.assertEqual(summary['unique_locations'], 1)
+        self.assertEqual(summary['calculations'], 1)
+        self.assertEqual([result['status'] for result in results], ['ok'] * 3)
+
+    def test_rejected_submission_fails_only_its_sites(self):
+        submit = calculation_service.submit_wellbore_calculation
+        calls = []
+
+        def reject_first(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise calculation_service.CalculationQueueFullError("Too many calculations in progress")
+            return submit(*args, **kwargs)
+
+        other_values = {**CASE['initial_input_values'], 'required_flow_rate': 7}
+        with mock.patch.object(batch_service, 'submit_wellbore_calculation', reject_first):
+            results, summary = self.run_batch([{'coordinates': GOOD},
+                                               {'coordinates': GOOD, 'initial_input_values': other_values}])
+        self.assertEqual([result['status'] for result in results], ['error', 'ok'])
+        self.assertEqual(summary['failed'], 1)
@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..utils import data_fetch_utils
+from ..utils.data_fetch_utils import get_bbox_params, get_bbox_params_bulk, get_transformer
+
+COORDINATES = [[-37.8, 144.9], [-38.1, 145.3], [-36.5, 142.05], [-37.8, 144.9]]
+
+
+class BboxParamsBulkTests(SimpleTestCase):
+
+    def assertMatchesSingle(self, min_resolution, pixels, crs_type='epsg:4326'):
+        self.assertEqual(get_bbox_params_bulk(COORDINATES, min_resolution, pixels, crs_type),
+                         [get_bbox_params(point, min_resolution, pixels, crs_type) for point in COORDINATES])
+
+    def test_bulk_matches_single(self):
+        self.assertMatchesSingle(100, [100, 100])
+        self.assertMatchesSingle(25, (40, 60))
+
+    def test_bulk_matches_single_when_quantized(self):
+        with mock.patch.object(data_fetch_utils, 'WMS_SPATIAL_QUANTIZATION', True):
+            self.assertMatchesSingle(100, [100, 100])
+
+    def test_projected_input(self):
+        points = [[16130000.0, -4555000.0], [16200000.5, -4600000.25]]
+        self.assertEqual(get_bbox_params_bulk(points, 100, [100, 100], 'epsg:3857'),
+                         [get_bbox_params(point, 100, [100, 100], 'epsg:3857') for point in points])
+
+    def test_transformers_are_reused(self):
+        self.assertIs(get_transformer('epsg:4326', 'epsg:3857'), get_transformer('epsg:4326', 'epsg:3857'))
+
+    def test_bbox_params(self):
+        bbox, width, height, x, y = get_bbox_params([16130000.0, -4555000.0], 100, [100, 100], 'epsg:3857')
+        self.assertEqual(bbox, '16125000.0, -4560000.0, 16135000.0, -4550000.0')
+        self.assertEqual((width, height, x, y), (100, 100, 50, 50))
+
+
+class SpatialQuantizationTests(SimpleTestCase):
+
+    def test_snap_to_grid(self):
+        self.assertEqual(data_fetch_utils.snap_to_grid(149.9, -0.1, cell_size=100), (150.0, -50.0))
+        self.assertEqual(data_fetch_utils.snap_to_grid(200.0, 100.0, cell_size=100), (250.0, 150.0))
+        self.assertEqual(data_fetch_utils.snap_to_grid(10.0, 10.0, cell_size=100, origin=(30.0, 30.0)),
+                         (-20.0, -20.0))
+
+    def test_snap_to_grid_arrays(self):
+        xs, ys = data_fetch_utils.snap_to_grid([1.0, 99.0, 101.0], [-1.0, -99.0, -101.0], cell_size=100)
+        self.assertEqual(list(xs), [50.0, 50.0, 150.0])
+        self.assertEqual(list(ys), [-50.0, -50.0, -150.0])
+
+    def test_points_in_one_cell_share_a_request(self):
+        with mock.patch.multiple(data_fetch_utils, WMS_SPATIAL_QUANTIZATION=True, WMS_GRID_CELL_SIZE=100,
+                                 WMS_GRID_ORIGIN=(0.0, 0.0), WMS_CANONICAL_PIXELS=(101, 101)):
+            first = get_bbox_params([16130001.0, -4555099.0], 25, [40, 40], 'epsg:3857')
+            second = get_bbox_params([16130099.0, -4555001.0], 100, [100, 100], 'epsg:3857')
+            neighbour = get_bbox_params([16130101.0, -4555001.0], 100, [100, 100], 'epsg:3857')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, neighbour)
+        # the centre pixel of the canonical request covers exactly the snapped cell
+        bbox, width, height, x, y = first
+        self.assertEqual(bbox, '16125000.0, -4560100.0, 16135100.0, -4550000.0')
+        self.assertEqual((width, height, x, y), (101, 101, 50, 50))
+
+    def test_off_by_default(self):
+        self.assertNotEqual(get_bbox_params([16130001.0, -4555099.0], 100, [100, 100], 'epsg:3857'),
+                            get_bbox_params([16130099.0, -4555001.0], 100, [100, 100], 'epsg:3857'))
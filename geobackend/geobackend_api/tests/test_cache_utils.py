@@ -0,0 +1,65 @@
+import pickle
+import zlib
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..utils import cache_utils
+from ..utils.cache_utils import (encode_cache_value, decode_cache_value, frame_payload, unframe_payload,
+                                 CacheDecodeError, CACHE_MAGIC, CACHE_FORMAT_VERSION, FLAG_COMPRESSED,
+                                 get_cache, set_cache)
+from .fakes import patch_redis_cache
+
+AQUIFER_INFO = {'100qa': {'Aqdepth': 0.0, 'Thickness': 11.4}, '102utqa': {'Aqdepth': 11.4, 'Thickness': 20.6}}
+
+
+class CacheCodecTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        for value in (AQUIFER_INFO, ['100qa', '114bse'], 12.5):
+            for compress in (True, False):
+                self.assertEqual(decode_cache_value(encode_cache_value(value, compress=compress)), value)
+
+    def test_frame(self):
+        data = encode_cache_value(['100qa'], compress=False)
+        self.assertEqual(data, CACHE_MAGIC + bytes((CACHE_FORMAT_VERSION, 0)) + b'["100qa"]')
+
+    def test_large_payloads_are_compressed(self):
+        payload = b'x' * cache_utils.CACHE_COMPRESSION_MIN_BYTES
+        data = frame_payload(payload, compress=True)
+        self.assertEqual(data[len(CACHE_MAGIC) + 1], FLAG_COMPRESSED)
+        self.assertEqual(zlib.decompress(data[len(CACHE_MAGIC) + 2:]), payload)
+        self.assertEqual(unframe_payload(data), payload)
+        self.assertEqual(frame_payload(payload[1:], compress=True)[len(CACHE_MAGIC) + 1], 0)
+
+    def test_unknown_format(self):
+        for data in (b'', b'GB', b'{"a": 1}', CACHE_MAGIC + bytes((CACHE_FORMAT_VERSION + 1, 0)) + b'1'):
+            with self.assertRaises(CacheDecodeError):
+                decode_cache_value(data)
+
+
+class LegacyCacheEntryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = patch_redis_cache(self)
+
+    def test_pickled_response_is_a_miss(self):
+        # entries written before the framed format held pickled objects
+        self.redis.set('legacy', pickle.dumps({'status_code': 200, 'text': '<html></html>'}))
+        with self.assertLogs('geobackend_api.utils.cache_utils', 'WARNING'):
+            self.assertIsNone(get_cache('legacy'))
+        self.assertEqual(cache_utils.get_cache_stats()['redis'], {'hits': 0, 'misses': 1})
+
+    def test_miss_is_overwritten(self):
+        self.redis.set('legacy', pickle.dumps(['100qa', '114bse']))
+        with self.assertLogs('geobackend_api.utils.cache_utils', 'WARNING'):
+            self.assertIsNone(get_cache('legacy'))
+        set_cache('legacy', AQUIFER_INFO)
+        cache_utils.local_cache.clear()
+        self.assertEqual(get_cache('legacy'), AQUIFER_INFO)
+        self.assertEqual(decode_cache_value(self.redis.get('legacy')), AQUIFER_INFO)
+
+    def test_corrupt_compressed_entry_is_a_miss(self):
+        self.redis.set('corrupt', CACHE_MAGIC + bytes((CACHE_FORMAT_VERSION, FLAG_COMPRESSED)) + b'not zlib')
+        with self.assertLogs('geobackend_api.utils.cache_utils', 'WARNING'):
+            self.assertIsNone(get_cache('corrupt'))
@@ -0,0 +1,125 @@
+from unittest import mock
+
+import fakeredis
+import numpy as np
+import orjson
+import pandas as pd
+import redis
+from django.test import SimpleTestCase
+
+from ..benchmarks import load_calculation_corpus
+from ..utils import calculation_cache
+from ..utils.calculation_cache import (canonicalize, calculation_cache_key, get_calculation_result,
+                                       set_calculation_result, CALCULATION_KEY_PREFIX)
+from ..utils.serialization_utils import pack_results, unpack_results, encode_results, dumps_json
+
+RESULTS = {
+    'installation_results': {'pump_depth': 12.5, 'screen': [1, 2.25], 'note': 'café "A"\n'},
+    'cost_results': pd.DataFrame({'stage': ['drill', 'pump'], 'cost': [np.float64(1000.5), np.int64(3)]}),
+    'pipe_sizes': np.array([0.1, 0.2]),
+    'ünïcode "key"': None,
+}
+
+
+class CanonicalizeTests(SimpleTestCase):
+
+    def test_equal_numbers_match(self):
+        self.assertEqual(canonicalize(10), canonicalize(10.0))
+        self.assertEqual(canonicalize(10), canonicalize(10.000000000001))
+        self.assertEqual(canonicalize(np.float32(0.5)), 0.5)
+        self.assertEqual(canonicalize('10'), '10')
+        self.assertNotEqual(canonicalize(10), canonicalize(10.0001))
+
+    def test_special_values(self):
+        self.assertEqual(repr(canonicalize(-0.0)), '0.0')
+        self.assertEqual(canonicalize(float('nan')), 'nan')
+        self.assertEqual(canonicalize(float('-inf')), '-inf')
+        self.assertIs(canonicalize(True), True)
+        self.assertIsNone(canonicalize(None))
+
+    def test_containers(self):
+        self.assertEqual(canonicalize({1: (1, 2.0), 'a': [np.int64(3)]}), {'1': [1.0, 2.0], 'a': [3.0]})
+
+
+class CalculationCacheKeyTests(SimpleTestCase):
+
+    def setUp(self):
+        case = load_calculation_corpus()[0]
+        self.args = (case['is_production_pump'], case['depth_data'], case['initial_input_values'])
+
+    def test_key_is_stable(self):
+        key = calculation_cache_key(*self.args)
+        self.assertTrue(key.startswith(CALCULATION_KEY_PREFIX))
+        self.assertEqual(calculation_cache_key(*self.args), key)
+
+        is_production_pump, depth_data, initial_input_values = self.args
+        reordered = {name: initial_input_values[name] for name in reversed(list(initial_input_values))}
+        as_floats = {name: float(value) for name, value in initial_input_values.items()}
+        self.assertEqual(calculation_cache_key(is_production_pump, depth_data, reordered), key)
+        self.assertEqual(calculation_cache_key(is_production_pump, depth_data, as_floats), key)
+        self.assertEqual(calculation_cache_key(1, depth_data, initial_input_values), key)
+
+    def test_key_changes_with_the_inputs(self):
+        is_production_pump, depth_data, initial_input_values = self.args
+        key = calculation_cache_key(*self.args)
+        changed = dict(initial_input_values, required_flow_rate=initial_input_values['required_flow_rate'] + 1)
+        self.assertNotEqual(calculation_cache_key(not is_production_pump, depth_data, initial_input_values), key)
+        self.assertNotEqual(calculation_cache_key(is_production_pump, depth_data, changed), key)
+        with mock.patch.object(calculation_cache, '_CALCULATOR_VERSION', 'another'):
+            self.assertNotEqual(calculation_cache_key(*self.args), key)
+
+
+class PackResultsTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        fragments, json_results, packed = pack_results(RESULTS)
+        unpacked_fragments, unpacked_json = unpack_results(packed)
+        self.assertEqual(unpacked_json, json_results)
+        self.assertEqual(list(unpacked_fragments), list(RESULTS))
+        for key, fragment in unpacked_fragments.items():
+            self.assertEqual(orjson.dumps(fragment), dumps_json(RESULTS[key]))
+        self.assertEqual(orjson.dumps(unpacked_fragments), json_results)
+        self.assertEqual(orjson.loads(json_results)['cost_results'],
+                         [{'stage': 'drill', 'cost': 1000.5}, {'stage': 'pump', 'cost': 3}])
+
+    def test_encode_results_matches_pack_results(self):
+        self.assertEqual(encode_results(RESULTS)[1], pack_results(RESULTS)[1])
+
+    def test_plain_json_is_still_read(self):
+        json_results = encode_results(RESULTS)[1]
+        fragments, unpacked_json = unpack_results(json_results)
+        self.assertEqual(unpacked_json, json_results)
+        self.assertEqual(list(fragments), list(RESULTS))
+
+
+class CalculationCacheStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        patcher = mock.patch.multiple(calculation_cache, redis_client=self.redis, CALCULATION_CACHE_ENABLED=True,
+                                      _calculation_cache_stats=dict.fromkeys(
+                                          ('hits', 'misses', 'stores', 'oversize', 'errors'), 0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_store_and_read(self):
+        packed = pack_results(RESULTS)[2]
+        self.assertIsNone(get_calculation_result('calc:a'))
+        set_calculation_result('calc:a', packed, timeout=60)
+        self.assertEqual(get_calculation_result('calc:a'), packed)
+        self.assertLessEqual(self.redis.ttl('calc:a'), 60)
+        self.assertEqual(calculation_cache.get_calculation_cache_stats(),
+                         {'hits': 1, 'misses': 1, 'stores': 1, 'oversize': 0, 'errors': 0})
+
+    def test_oversize_results_are_not_stored(self):
+        with mock.patch.object(calculation_cache, 'CALCULATION_CACHE_MAX_BYTES', 4), \
+                self.assertLogs('geobackend_api.utils.calculation_cache', 'WARNING'):
+            set_calculation_result('calc:a', b'12345')
+        self.assertIsNone(self.redis.get('calc:a'))
+        self.assertEqual(calculation_cache.get_calculation_cache_stats()['oversize'], 1)
+
+    def test_unavailable_redis_is_a_miss(self):
+        with mock.patch.object(self.redis, 'get', side_effect=redis.ConnectionError('down')), \
+                self.assertLogs('geobackend_api.utils.calculation_cache', 'WARNING'):
+            self.assertIsNone(get_calculation_result('calc:a'))
+        self.assertEqual(calculation_cache.get_calculation_cache_stats()['errors'], 1)
@@ -0,0 +1,228 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import geodrillcalc.exceptions as exceptions
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from ..benchmarks import load_calculation_corpus
+from ..services import calculation_service
+from ..services.calculation_service import (CalculationQueueFullError, CalculationTimeoutError,
+                                            submit_wellbore_calculation, wait_for_calculation,
+                                            run_wellbore_calculation, get_calculation_stats,
+                                            perform_wellbore_calculation, _perform_wellbore_calculation_in_worker,
+                                            depth_table_to_frame)
+from ..utils.interface_pool import InterfacePool
+
+
+class CalculationSlotTests(SimpleTestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        patcher = mock.patch.multiple(
+            calculation_service,
+            _calculation_slots=threading.BoundedSemaphore(3),
+            _bulk_calculation_slots=threading.BoundedSemaphore(1),
+            CALCULATION_TIMEOUT=0.05,
+            _calculation_stats={'in_flight': 0, 'overdue': 0},
+            _calculation_executor=ThreadPoolExecutor(max_workers=4),
+            _perform_wellbore_calculation_in_worker=lambda *args: self.release.wait(5))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # the done callbacks count into the patched stats, so every calculation finishes first
+        self.addCleanup(lambda: calculation_service._calculation_executor.shutdown(wait=True))
+        self.addCleanup(self.release.set)
+
+    def submit(self, block=False):
+        return submit_wellbore_calculation('true', {}, {}, block=block)
+
+    def test_bulk_submissions_leave_slots_to_single_site_requests(self):
+        self.submit(block=True)
+        with self.assertRaises(CalculationQueueFullError):
+            self.submit(block=True)
+        self.submit()
+        self.submit()
+        with self.assertRaises(CalculationQueueFullError):
+            self.submit()
+
+    def test_slots_are_released(self):
+        futures = [self.submit(block=True), self.submit()]
+        self.release.set()
+        for future in futures:
+            future.result(timeout=5)
+        # done callbacks run just after the result is set
+        self.assertTrue(calculation_service._bulk_calculation_slots.acquire(timeout=1))
+        for _ in range(3):
+            self.assertTrue(calculation_service._calculation_slots.acquire(timeout=1))
+
+    def test_bulk_slot_is_returned_when_no_calculation_slot_frees_up(self):
+        for _ in range(3):
+            self.submit()
+        with self.assertRaises(CalculationQueueFullError):
+            self.submit(block=True)
+        self.assertTrue(calculation_service._bulk_calculation_slots.acquire(blocking=False))
+
+    def test_timed_out_calculation_keeps_its_slot_until_it_finishes(self):
+        future = self.submit()
+        with self.assertRaises(CalculationTimeoutError):
+            wait_for_calculation(future, timeout=0.05)
+        self.assertEqual(get_calculation_stats(), {'in_flight': 1, 'overdue': 1})
+        self.release.set()
+        future.result(timeout=5)
+        for _ in range(3):
+            self.assertTrue(calculation_service._calculation_slots.acquire(timeout=1))
+        self.assertEqual(get_calculation_stats(), {'in_flight': 0, 'overdue': 0})
+
+    def test_queued_calculation_is_cancelled_on_timeout(self):
+        with mock.patch.object(calculation_service, '_calculation_executor', ThreadPoolExecutor(max_workers=1)):
+            running, queued = self.submit(), self.submit()
+            with self.assertRaises(CalculationTimeoutError):
+                wait_for_calculation(queued, timeout=0.01)
+            self.assertTrue(queued.cancelled())
+            self.assertEqual(get_calculation_stats(), {'in_flight': 1, 'overdue': 0})
+            self.release.set()
+            calculation_service._calculation_executor.shutdown(wait=True)
+        self.assertEqual(get_calculation_stats(), {'in_flight': 0, 'overdue': 0})
+
+    def test_inline_calculations_hold_a_slot(self):
+        started = threading.Event()
+
+        def calculate(*args):
+            started.set()
+            self.release.wait(5)
+            return {'installation_results': {}}
+
+        with mock.patch.multiple(calculation_service, CALCULATION_EXECUTOR='thread',
+                                 _calculation_slots=threading.BoundedSemaphore(1),
+                                 perform_wellbore_calculation=calculate):
+            thread = threading.Thread(target=run_wellbore_calculation, args=('true', {}, {}))
+            thread.start()
+            self.assertTrue(started.wait(5))
+            self.assertEqual(get_calculation_stats()['in_flight'], 1)
+            with self.assertRaises(CalculationQueueFullError):
+                run_wellbore_calculation('true', {}, {})
+            self.release.set()
+            thread.join(5)
+            self.assertEqual(run_wellbore_calculation('true', {}, {}), {'installation_results': {}})
+        self.assertEqual(get_calculation_stats()['in_flight'], 0)
+
+
+class BrokenPoolTests(SimpleTestCase):
+
+    def test_submission_is_retried_on_a_fresh_pool(self):
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool('a worker died')
+        fresh = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(fresh.shutdown)
+        with mock.patch.multiple(calculation_service, _calculation_executor=broken,
+                                 _create_calculation_executor=lambda: fresh,
+                                 _calculation_slots=threading.BoundedSemaphore(1),
+                                 _calculation_stats={'in_flight': 0, 'overdue': 0},
+                                 _perform_wellbore_calculation_in_worker=lambda *args: 'result'), \
+                self.assertLogs('geobackend_api.services.calculation_service', 'ERROR'):
+            future = submit_wellbore_calculation('true', {}, {})
+            self.assertEqual(future.result(timeout=5), 'result')
+            self.assertIs(calculation_service._calculation_executor, fresh)
+            broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+            self.assertTrue(calculation_service._calculation_slots.acquire(timeout=1))
+
+    def test_slot_is_released_when_the_retry_fails(self):
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool('a worker died')
+        with mock.patch.multiple(calculation_service, _calculation_executor=broken,
+                                 _create_calculation_executor=lambda: broken,
+                                 _calculation_slots=threading.BoundedSemaphore(1),
+                                 _calculation_stats={'in_flight': 0, 'overdue': 0}), \
+                self.assertLogs('geobackend_api.services.calculation_service', 'ERROR'):
+            with self.assertRaises(BrokenProcessPool):
+                submit_wellbore_calculation('true', {}, {})
+            self.assertTrue(calculation_service._calculation_slots.acquire(blocking=False))
+            self.assertEqual(get_calculation_stats()['in_flight'], 0)
+
+
+class FailingInterface:
+
+    error = None
+
+    def calculate_and_return_wellbore_parameters(self, **kwargs):
+        raise self.error
+
+    def export_results_to_dict(self):
+        return {}
+
+
+class ExceptionMappingTests(SimpleTestCase):
+
+    def setUp(self):
+        case = load_calculation_corpus()[0]
+        self.args = (case['is_production_pump'], case['depth_data'], case['initial_input_values'])
+        patcher = mock.patch.object(calculation_service, '_interface_pool', InterfacePool(FailingInterface))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def calculate_raising(self, error, calculate=perform_wellbore_calculation):
+        FailingInterface.error = error
+        with self.assertLogs('geobackend_api.services.calculation_service', 'ERROR'):
+            calculate(*self.args)
+
+    def test_calculation_errors(self):
+        cases = [
+            (ValueError('bad flow rate'), ValueError, 'Calculation error.- bad flow rate'),
+            (exceptions.ShallowLTAError('at 20 m'), exceptions.ShallowLTAError, 'Shallow LTA Error: at 20 m'),
+            (exceptions.InvalidGroundwaterLayerError('102utqa'), exceptions.InvalidGroundwaterLayerError,
+             'Invalid groundwater layer detected: 102utqa'),
+            (exceptions.MissingDataError('depth'), exceptions.MissingDataError,
+             'Missing data required for calculation: depth'),
+            (KeyError('x'), RuntimeError, "'x'"),
+        ]
+        for error, expected, message in cases:
+            with self.subTest(error=type(error).__name__):
+                with self.assertRaisesMessage(expected, message):
+                    self.calculate_raising(error)
+
+    def test_unpicklable_errors_are_replaced_in_worker_processes(self):
+        class LocalError(Exception):
+            pass
+
+        with mock.patch('multiprocessing.parent_process', return_value=object()):
+            with self.assertRaises(RuntimeError) as raised:
+                self.calculate_raising(LocalError('local'), _perform_wellbore_calculation_in_worker)
+            self.assertNotIsInstance(raised.exception, LocalError)
+            self.assertEqual(str(raised.exception), 'local')
+            # picklable errors cross the process boundary as they are
+            with self.assertRaisesMessage(exceptions.MissingDataError, 'Missing data required'):
+                self.calculate_raising(exceptions.MissingDataError('depth'), _perform_wellbore_calculation_in_worker)
+
+    def test_errors_are_kept_in_the_server_process(self):
+        class LocalError(Exception):
+            pass
+
+        # the message only: perform_wellbore_calculation wraps it in a RuntimeError
+        with self.assertRaisesMessage(RuntimeError, 'local'):
+            self.calculate_raising(LocalError('local'), _perform_wellbore_calculation_in_worker)
+
+
+class DepthTableToFrameTests(SimpleTestCase):
+
+    def test_matches_the_generic_constructor(self):
+        tables = [case['depth_data'] for case in load_calculation_corpus()] + [
+            {'aquifer_layer': [], 'is_aquifer': [], 'depth_to_base': []},
+            {'aquifer_layer': ['100qa'], 'is_aquifer': [True], 'depth_to_base': [np.int64(10)]},
+            # not the expected shape: taken by pd.DataFrame as it is
+            {'is_aquifer': [True], 'aquifer_layer': ['100qa'], 'depth_to_base': [10.0]},
+            {'aquifer_layer': ['100qa'], 'is_aquifer': [True], 'depth_to_base': ['deep']},
+        ]
+        for depth_data in tables:
+            with self.subTest(depth_data=depth_data):
+                frame = depth_table_to_frame(depth_data)
+                expected = pd.DataFrame(depth_data)
+                self.assertTrue(frame.equals(expected))
+                self.assertEqual(list(frame.dtypes), list(expected.dtypes))
+
+    def test_mismatched_lengths_still_raise(self):
+        with self.assertRaises(ValueError):
+            depth_table_to_frame({'aquifer_layer': ['100qa', '114bse'], 'is_aquifer': [True],
+                                  'depth_to_base': [10.0]})
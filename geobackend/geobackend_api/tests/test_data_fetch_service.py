@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..services import data_fetch_service
+from ..services.data_fetch_service import fetch_depth_data_and_watertable, afetch_depth_data_and_watertable
+
+BBOX_PARAMS = ('16130000,-4560000,16130100,-4559900', 100, 100, 50, 50)
+ARGS = ([-37.8, 144.9], 100, [100, 100], 'epsg:4326')
+
+
+class FetchDepthDataAndWatertableTests(SimpleTestCase):
+
+    def setUp(self):
+        # one busy thread, so a submitted watertable fetch stays queued
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.release = threading.Event()
+        self.executor.submit(self.release.wait, 5)
+        self.addCleanup(self.executor.shutdown)
+        self.addCleanup(self.release.set)
+
+    def test_results(self):
+        self.release.set()
+        with mock.patch.object(data_fetch_service, 'generate_formatted_depth_data', return_value={'depth': 1}), \
+                mock.patch.object(data_fetch_service, 'fetch_watertable_depth', return_value=3.0):
+            result = fetch_depth_data_and_watertable(*ARGS, bbox_params=BBOX_PARAMS,
+                                                     watertable_executor=self.executor)
+        self.assertEqual(result, ({'depth': 1}, 3.0))
+
+    def test_depth_failure_cancels_the_watertable_fetch(self):
+        watertable = mock.Mock(return_value=3.0)
+        with mock.patch.object(data_fetch_service, 'generate_formatted_depth_data',
+                               side_effect=RuntimeError('layers failed')), \
+                mock.patch.object(data_fetch_service, 'fetch_watertable_depth', watertable), \
+                self.assertLogs('geobackend_api.services.data_fetch_service', 'ERROR'):
+            with self.assertRaisesMessage(Exception, 'Error fetching WMS data') as raised:
+                fetch_depth_data_and_watertable(*ARGS, bbox_params=BBOX_PARAMS,
+                                                watertable_executor=self.executor)
+            self.release.set()
+            self.executor.shutdown(wait=True)
+        self.assertIsInstance(raised.exception.__cause__, RuntimeError)
+        watertable.assert_not_called()
+
+    def test_watertable_failure(self):
+        self.release.set()
+        with mock.patch.object(data_fetch_service, 'generate_formatted_depth_data', return_value={'depth': 1}), \
+                mock.patch.object(data_fetch_service, 'fetch_watertable_depth',
+                                  side_effect=AttributeError('no watertable value')), \
+                self.assertLogs('geobackend_api.services.data_fetch_service', 'ERROR'):
+            with self.assertRaisesMessage(Exception, 'Error fetching WMS data') as raised:
+                fetch_depth_data_and_watertable(*ARGS, bbox_params=BBOX_PARAMS,
+                                                watertable_executor=self.executor)
+        self.assertIsInstance(raised.exception.__cause__, AttributeError)
+
+
+class AsyncFetchDepthDataAndWatertableTests(SimpleTestCase):
+
+    def test_depth_failure_cancels_the_watertable_fetch(self):
+        cancelled = []
+
+        async def watertable(*args, **kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def depth(*args, **kwargs):
+            await asyncio.sleep(0)
+            raise RuntimeError('layers failed')
+
+        async def scenario():
+            with self.assertRaisesMessage(Exception, 'Error fetching WMS data'):
+                await afetch_depth_data_and_watertable(*ARGS, bbox_params=BBOX_PARAMS)
+            # let the cancellation reach the task
+            await asyncio.sleep(0)
+
+        with mock.patch.object(data_fetch_service, 'agenerate_formatted_depth_data', depth), \
+                mock.patch.object(data_fetch_service, 'afetch_watertable_depth', watertable), \
+                self.assertLogs('geobackend_api.services.data_fetch_service', 'ERROR'):
+            asyncio.run(scenario())
+        self.assertEqual(cancelled, [True])
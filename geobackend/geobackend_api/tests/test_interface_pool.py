@@ -0,0 +1,96 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from ..utils.interface_pool import InterfacePool
+
+
+class Interface:
+
+    def __init__(self):
+        self.inputs = {'flow_rate': None}
+        self.results = []
+
+
+class ResettableInterface(Interface):
+
+    resets = 0
+
+    def reset(self):
+        ResettableInterface.resets += 1
+        self.results = []
+
+
+class InterfacePoolTests(SimpleTestCase):
+
+    def test_state_is_restored_between_checkouts(self):
+        pool = InterfacePool(Interface, max_size=1)
+        with pool.checkout() as interface:
+            interface.inputs['flow_rate'] = 5
+            interface.results.append('result')
+            interface.extra = 'set during use'
+            first = interface
+        with pool.checkout() as interface:
+            self.assertIs(interface, first)
+            self.assertEqual(vars(interface), {'inputs': {'flow_rate': None}, 'results': []})
+        self.assertEqual(pool.stats(), {'idle': 1, 'created': 1, 'reused': 1})
+
+    def test_reset_method_is_used(self):
+        pool = InterfacePool(ResettableInterface, max_size=1)
+        resets = ResettableInterface.resets
+        with pool.checkout() as interface:
+            interface.results.append('result')
+        with pool.checkout() as interface:
+            self.assertEqual(interface.results, [])
+        self.assertEqual(ResettableInterface.resets, resets + 2)
+
+    def test_failed_instances_are_dropped(self):
+        pool = InterfacePool(Interface, max_size=1)
+        with self.assertRaises(RuntimeError):
+            with pool.checkout() as interface:
+                failed = interface
+                raise RuntimeError('calculation failed')
+        with pool.checkout() as interface:
+            self.assertIsNot(interface, failed)
+        self.assertEqual(pool.stats(), {'idle': 1, 'created': 2, 'reused': 0})
+
+    def test_unpooled_instances(self):
+        class Unsnapshottable(Interface):
+            def __init__(self):
+                super().__init__()
+                self.lock = threading.Lock()
+
+        pool = InterfacePool(Unsnapshottable)
+        with self.assertLogs('geobackend_api.utils.interface_pool', 'WARNING'):
+            with pool.checkout():
+                pass
+        self.assertEqual(pool.stats()['idle'], 0)
+        pool = InterfacePool(Interface, max_size=0)
+        pool.warm()
+        with pool.checkout():
+            pass
+        self.assertEqual(pool.stats(), {'idle': 0, 'created': 1, 'reused': 0})
+
+    def test_warm(self):
+        pool = InterfacePool(Interface, max_size=3)
+        pool.warm(2)
+        self.assertEqual(pool.stats(), {'idle': 2, 'created': 2, 'reused': 0})
+
+    def test_counters_under_concurrent_checkouts(self):
+        pool = InterfacePool(Interface, max_size=4)
+        barrier = threading.Barrier(8)
+
+        def use():
+            barrier.wait()
+            for _ in range(50):
+                with pool.checkout() as interface:
+                    interface.results.append(1)
+
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.stats()
+        self.assertEqual(stats['created'] + stats['reused'], 8 * 50)
+        self.assertLessEqual(stats['idle'], 4)
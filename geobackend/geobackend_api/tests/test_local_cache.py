@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..utils import cache_utils, local_cache as local_cache_module
+from ..utils.cache_utils import get_cache, set_cache, get_cache_stats
+from ..utils.local_cache import LocalTTLCache
+from .fakes import patch_redis_cache
+
+
+class LocalTTLCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(local_cache_module.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_entries_expire(self):
+        cache = LocalTTLCache(max_entries=4, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=5)
+        self.now += 5
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.now += 5
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_is_capped_by_the_cache_ttl(self):
+        cache = LocalTTLCache(max_entries=4, ttl=10)
+        cache.set('a', 1, ttl=3600)
+        self.now += 10
+        self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LocalTTLCache(max_entries=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        cache.set('a', 4)
+        cache.set('d', 5)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual((cache.get('a'), cache.get('d')), (4, 5))
+
+    def test_disabled(self):
+        cache = LocalTTLCache(max_entries=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_delete_and_clear(self):
+        cache = LocalTTLCache(max_entries=4, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertIsNone(cache.get('a'))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class CacheTierTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = patch_redis_cache(self)
+
+    def test_counters_per_tier(self):
+        self.assertIsNone(get_cache('key'))
+        self.assertEqual(get_cache_stats(), {'local': {'hits': 0, 'misses': 1},
+                                             'redis': {'hits': 0, 'misses': 1}})
+        set_cache('key', ['100qa'])
+        self.assertEqual(get_cache('key'), ['100qa'])
+        self.assertEqual(get_cache_stats()['local'], {'hits': 1, 'misses': 1})
+
+        # another worker's write is found in Redis and kept locally
+        cache_utils.local_cache.clear()
+        self.assertEqual(get_cache('key'), ['100qa'])
+        self.assertEqual(get_cache('key'), ['100qa'])
+        self.assertEqual(get_cache_stats(), {'local': {'hits': 2, 'misses': 2},
+                                             'redis': {'hits': 1, 'misses': 1}})
+
+    def test_local_hit_skips_redis(self):
+        set_cache('key', ['100qa'])
+        with mock.patch.object(self.redis, 'get', side_effect=AssertionError('Redis was queried')):
+            self.assertEqual(get_cache('key'), ['100qa'])
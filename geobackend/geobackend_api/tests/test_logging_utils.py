@@ -0,0 +1,87 @@
+import logging
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..utils import logging_utils
+from ..utils.logging_utils import QueueListenerHandler, Truncated, sample_payload, get_log_queue_stats
+
+
+class BlockingHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.proceed = threading.Event()
+        self.messages = []
+
+    def emit(self, record):
+        self.started.set()
+        self.proceed.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def make_record(message, *args):
+    return logging.LogRecord('geobackend_api', logging.INFO, __file__, 1, message, args, None)
+
+
+class QueueListenerHandlerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.target = BlockingHandler()
+
+    def make_handler(self, queue_size):
+        self.handler = QueueListenerHandler([self.target], queue_size=queue_size)
+        self.addCleanup(self.handler.close)
+        # cleanups run last first: unblock the writer before stopping it
+        self.addCleanup(self.target.proceed.set)
+
+    def test_records_are_written_in_the_background(self):
+        self.make_handler(queue_size=10)
+        self.target.proceed.set()
+        self.handler.handle(make_record('site %s', 1))
+        self.handler.handle(make_record('site %s', 2))
+        self.handler.stop()
+        self.assertEqual(self.target.messages, ['site 1', 'site 2'])
+
+    def test_records_are_dropped_when_the_queue_is_full(self):
+        self.make_handler(queue_size=1)
+        self.handler.handle(make_record('first'))
+        self.assertTrue(self.target.started.wait(5))
+        # the writer is busy with the first record, and the queue holds one more
+        self.handler.handle(make_record('second'))
+        dropped = get_log_queue_stats()['dropped']
+        self.handler.handle(make_record('third'))
+        self.assertEqual(self.handler.dropped, 1)
+        self.assertEqual(get_log_queue_stats()['dropped'], dropped + 1)
+
+        self.target.proceed.set()
+        self.handler.stop()
+        self.assertEqual(self.target.messages, ['first', 'second'])
+        self.assertEqual(self.handler.queue.qsize(), 0)
+
+
+class TruncatedTests(SimpleTestCase):
+
+    def test_long_values_are_cut(self):
+        self.assertEqual(str(Truncated('x' * 10, max_chars=4)), 'xxxx... (10 chars)')
+        self.assertEqual(str(Truncated({'a': 1}, max_chars=8)), "{'a': 1}")
+
+    def test_rendered_only_when_emitted(self):
+        value = mock.MagicMock()
+        logger = logging.getLogger('geobackend_api.tests.truncated')
+        with mock.patch.object(logger, 'isEnabledFor', return_value=False):
+            logger.debug('payload: %s', Truncated(value))
+        value.__str__.assert_not_called()
+        self.assertEqual(make_record('payload: %s', Truncated('abc')).getMessage(), 'payload: abc')
+
+
+class SamplePayloadTests(SimpleTestCase):
+
+    def test_rate(self):
+        self.assertTrue(sample_payload(1))
+        self.assertFalse(sample_payload(0))
+        with mock.patch.object(logging_utils.random, 'random', return_value=0.25):
+            self.assertTrue(sample_payload(0.5))
+            self.assertFalse(sample_payload(0.1))
@@ -0,0 +1,30 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, RequestFactory
+
+from ..utils import metrics
+from ..views import metrics_view
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    def setUp(self):
+        if not metrics.METRICS_ENABLED:
+            self.skipTest('prometheus_client is not installed')
+        self.factory = RequestFactory()
+
+    def scrape(self, remote_addr):
+        return metrics_view(self.factory.get('/metrics', REMOTE_ADDR=remote_addr))
+
+    def test_loopback_only_by_default(self):
+        self.assertEqual(self.scrape('127.0.0.1').status_code, 200)
+        self.assertEqual(self.scrape('203.0.113.5').status_code, 403)
+
+    def test_empty_allow_list_denies_everyone(self):
+        with mock.patch.object(metrics, 'METRICS_ALLOWED_IPS', []):
+            self.assertEqual(self.scrape('127.0.0.1').status_code, 403)
+
+    def test_listed_scraper(self):
+        with mock.patch.object(metrics, 'METRICS_ALLOWED_IPS', ['10.0.0.7']):
+            self.assertEqual(self.scrape('10.0.0.7').status_code, 200)
+            self.assertEqual(self.scrape('127.0.0.1').status_code, 403)
@@ -0,0 +1,136 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from ..management.commands import precompute_aquifer_grid
+from ..utils import data_fetch_utils, precomputed_store
+from ..utils.data_fetch_utils import generate_formatted_depth_data, fetch_watertable_depth
+from ..utils.precomputed_store import (PrecomputedAquiferStore, PrecomputedCell, PrecomputedNoDataError,
+                                       NO_DATA_CELL, STATUS_NO_DATA, lookup_precomputed)
+
+DEPTH_DATA = {'aquifer_layer': ['100qa', '114bse'], 'is_aquifer': [True, False], 'depth_to_base': [10.0, 210.0]}
+
+
+def bbox_around(x, y, half_width=50.0):
+    return f'{x - half_width}, {y - half_width}, {x + half_width}, {y + half_width}', 101, 101, 50, 50
+
+
+class PrecomputedStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'grid.sqlite3'
+        store = PrecomputedAquiferStore.create(self.path, cell_size=100, origin=(0.0, 0.0))
+        store.put(10, -20, depth_data=DEPTH_DATA, watertable_depth=3.5)
+        store.put(11, -20, status=STATUS_NO_DATA)
+        store.commit()
+        self.store = PrecomputedAquiferStore(self.path)
+
+    def test_lookup(self):
+        self.assertEqual(self.store.cell_size, 100)
+        self.assertEqual(self.store.lookup(1000.0, -1999.5), PrecomputedCell(DEPTH_DATA, 3.5))
+        self.assertEqual(self.store.lookup(1099.9, -1900.1), PrecomputedCell(DEPTH_DATA, 3.5))
+        self.assertIs(self.store.lookup(1100.0, -1950.0), NO_DATA_CELL)
+        self.assertIsNone(self.store.lookup(999.9, -1950.0))
+
+    def test_a_store_keeps_its_grid(self):
+        PrecomputedAquiferStore.create(self.path, cell_size=100, origin=(0.0, 0.0))
+        with self.assertRaises(ValueError):
+            PrecomputedAquiferStore.create(self.path, cell_size=50, origin=(0.0, 0.0))
+
+    def test_lookups_are_served_without_the_wms(self):
+        with mock.patch.object(precomputed_store, 'get_precomputed_store', return_value=self.store), \
+                mock.patch.object(data_fetch_utils, 'request_wms_layers', side_effect=AssertionError), \
+                mock.patch.object(data_fetch_utils, 'request_watertable_depth', side_effect=AssertionError):
+            bbox_params = bbox_around(1050.0, -1950.0)
+            self.assertEqual(lookup_precomputed(bbox_params), PrecomputedCell(DEPTH_DATA, 3.5))
+            self.assertEqual(generate_formatted_depth_data(None, bbox_params=bbox_params), DEPTH_DATA)
+            self.assertEqual(fetch_watertable_depth(None, bbox_params=bbox_params), 3.5)
+
+    def test_no_data_cells_do_not_fall_back_to_the_wms(self):
+        with mock.patch.object(precomputed_store, 'get_precomputed_store', return_value=self.store), \
+                mock.patch.object(data_fetch_utils, 'request_wms_layers', side_effect=AssertionError), \
+                mock.patch.object(data_fetch_utils, 'request_watertable_depth', side_effect=AssertionError), \
+                self.assertLogs('geobackend_api', 'ERROR'):
+            bbox_params = bbox_around(1150.0, -1950.0)
+            with self.assertRaises(PrecomputedNoDataError):
+                lookup_precomputed(bbox_params)
+            with self.assertRaisesMessage(Exception, 'No aquifer data at this location'):
+                generate_formatted_depth_data(None, bbox_params=bbox_params)
+            with self.assertRaisesMessage(Exception, 'No aquifer data at this location'):
+                fetch_watertable_depth(None, bbox_params=bbox_params)
+
+    def test_outside_coverage_falls_back_to_the_wms(self):
+        with mock.patch.object(precomputed_store, 'get_precomputed_store', return_value=self.store):
+            self.assertIsNone(lookup_precomputed(bbox_around(50.0, 50.0)))
+
+
+class PrecomputeAquiferGridCommandTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'grid.sqlite3'
+        self.requests = []
+        self.failing_cells = set()
+        patcher = mock.patch.object(precompute_aquifer_grid, 'request_wms_uncached', self.request_wms)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request_wms(self, request_type, bbox_params, **params):
+        minx, miny, maxx, maxy = (float(v) for v in bbox_params[0].split(','))
+        centre = ((minx + maxx) / 2, (miny + maxy) / 2)
+        self.requests.append((request_type, centre))
+        if centre in self.failing_cells:
+            raise ConnectionError('upstream unavailable')
+        if request_type == 'layers':
+            # cells east of x = 200 are outside the aquifer model
+            return ['100qa', '114bse'] if centre[0] < 200 else ['114bse']
+        if request_type == 'aquifer_info':
+            return {'100qa': {'Aqdepth': 0.0, 'Thickness': 10.0}, '114bse': {'Aqdepth': 10.0}}
+        return 3.5
+
+    def sweep(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        # 3 x 2 cells of 100 m
+        call_command('precompute_aquifer_grid', '--bbox', '0', '0', '299', '199', '--cell-size', '100',
+                     '--output', str(self.path), '--rate', '1000000', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def layer_requests(self):
+        return [centre for request_type, centre in self.requests if request_type == 'layers']
+
+    def test_resumes_from_stored_cells(self):
+        self.sweep('--limit', '2', '--checkpoint-every', '1')
+        self.assertEqual(self.layer_requests(), [(50.0, 50.0), (150.0, 50.0)])
+        self.requests.clear()
+        stdout, _ = self.sweep()
+        self.assertEqual(self.layer_requests(), [(250.0, 50.0), (50.0, 150.0), (150.0, 150.0), (250.0, 150.0)])
+        self.assertIn('4 new, 2 already stored, 0 failed', stdout)
+
+        store = PrecomputedAquiferStore(self.path)
+        self.assertEqual(store.count(), {1: 4, 0: 2})
+        self.assertEqual(store.lookup(50.0, 150.0), PrecomputedCell(DEPTH_DATA, 3.5))
+        self.assertIs(store.lookup(250.0, 150.0), NO_DATA_CELL)
+
+    def test_failed_cells_are_retried(self):
+        self.failing_cells = {(150.0, 50.0)}
+        _, stderr = self.sweep()
+        self.assertIn('cell (1, 0) failed', stderr)
+        self.failing_cells = set()
+        self.requests.clear()
+        stdout, _ = self.sweep()
+        self.assertEqual(self.layer_requests(), [(150.0, 50.0)])
+        self.assertIn('1 new, 5 already stored', stdout)
+
+    def test_cell_size_must_match_the_quantized_grid(self):
+        with mock.patch.multiple(precompute_aquifer_grid, WMS_SPATIAL_QUANTIZATION=True, WMS_GRID_CELL_SIZE=50):
+            with self.assertRaisesMessage(CommandError, '--cell-size must be WMS_GRID_CELL_SIZE'):
+                self.sweep()
+        self.assertEqual(self.requests, [])
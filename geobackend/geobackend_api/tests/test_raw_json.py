@@ -0,0 +1,73 @@
+from importlib import import_module
+
+import numpy as np
+import orjson
+import pandas as pd
+from django.apps import apps
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from ..fields import RawJSON
+from ..models import WellBoreCalculationResult
+from ..renderers import ORJSONRenderer
+from ..utils.serialization_utils import encode_results
+
+decode_legacy_result_data = import_module(
+    'geobackend_api.migrations.0006_decode_legacy_result_data').decode_legacy_result_data
+
+RESULTS = {
+    'installation_results': {'pump_depth': np.float64(12.5), 'note': 'café "A"'},
+    'cost_results': pd.DataFrame({'stage': ['drill'], 'cost': [np.int64(1000)]}),
+}
+DECODED = {'installation_results': {'pump_depth': 12.5, 'note': 'café "A"'},
+           'cost_results': [{'stage': 'drill', 'cost': 1000}]}
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_render(self):
+        renderer = ORJSONRenderer()
+        self.assertEqual(renderer.render(None), b'')
+        self.assertEqual(orjson.loads(renderer.render({'data': RESULTS})), {'data': DECODED})
+
+    def test_fragments_are_embedded_as_is(self):
+        fragments, json_results = encode_results(RESULTS)
+        rendered = ORJSONRenderer().render({'message': 'ok', 'data': fragments})
+        self.assertEqual(rendered, b'{"message":"ok","data":' + json_results + b'}')
+        self.assertEqual(ORJSONRenderer().render(orjson.Fragment(json_results)), json_results)
+
+
+class RawJSONFieldTests(TestCase):
+
+    def test_round_trip(self):
+        json_results = encode_results(RESULTS)[1]
+        for value in (RawJSON(json_results), RawJSON(json_results.decode('utf-8')), DECODED):
+            with self.subTest(value=type(value).__name__):
+                row = WellBoreCalculationResult.objects.create(session_key='session-a', result_data=value)
+                row.refresh_from_db()
+                self.assertEqual(row.result_data, DECODED)
+                row.delete()
+
+    def test_raw_json_is_written_as_is(self):
+        WellBoreCalculationResult.objects.create(session_key='session-a', result_data=RawJSON(b'{"a": [1, 2.50]}'))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT result_data FROM geobackend_api_wellborecalculationresult')
+            self.assertEqual(cursor.fetchone()[0], '{"a": [1, 2.50]}')
+
+
+class DecodeLegacyResultDataTests(TestCase):
+
+    def test_double_encoded_rows_are_decoded(self):
+        json_results = encode_results(RESULTS)[1].decode('utf-8')
+        # what JSONField stored when it was given the encoded results
+        legacy = WellBoreCalculationResult.objects.create(session_key='legacy', result_data=json_results)
+        current = WellBoreCalculationResult.objects.create(session_key='current', result_data=RawJSON(json_results))
+        text = WellBoreCalculationResult.objects.create(session_key='text', result_data='not json')
+        self.assertEqual(WellBoreCalculationResult.objects.get(id=legacy.id).result_data, json_results)
+
+        decode_legacy_result_data(apps, None, batch_size=1)
+        for row in (legacy, current):
+            row.refresh_from_db()
+            self.assertEqual(row.result_data, DECODED)
+        text.refresh_from_db()
+        self.assertEqual(text.result_data, 'not json')
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from unittest import mock
+
+import fakeredis
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from ..models import WellBoreCalculationResult
+from ..services import result_service
+from ..services.result_service import ModelResultStore, RedisResultStore, RESULT_KEY_PREFIX
+from ..session_backends import cache, cached_db, db, existing_sessions
+from ..utils.write_behind import OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST
+
+
+def make_store(overflow=OVERFLOW_DROP_NEWEST, max_size=1):
+    with mock.patch.multiple(result_service, RESULT_WRITE_BEHIND=True, RESULT_WRITE_OVERFLOW=overflow,
+                             RESULT_WRITE_QUEUE_SIZE=max_size):
+        store = ModelResultStore()
+    # no background thread; tests flush explicitly
+    store.writer._ensure_started = lambda: None
+    return store
+
+
+class ModelResultStorePendingTests(TestCase):
+
+    def test_written_results_leave_pending(self):
+        store = make_store()
+        store.save('session-a', b'{"a":1}')
+        self.assertEqual(store.get('session-a'), b'{"a":1}')
+        store.writer.flush()
+        self.assertEqual(store._pending, {})
+        self.assertEqual(bytes(store.get('session-a')), b'{"a":1}')
+
+    def test_failed_write_is_not_served(self):
+        store = make_store()
+        store.save('session-a', b'{"a":1}')
+        with mock.patch.object(result_service, 'upsert_results', side_effect=RuntimeError), \
+                self.assertLogs('geobackend_api.utils.write_behind', 'ERROR'):
+            store.writer.flush()
+        self.assertEqual(store._pending, {})
+        self.assertIsNone(store.get('session-a'))
+
+    def test_dropped_newest_is_not_served(self):
+        store = make_store(OVERFLOW_DROP_NEWEST)
+        store.save('session-a', b'{"a":1}')
+        store.save('session-b', b'{"b":1}')
+        self.assertNotIn('session-b', store._pending)
+        self.assertIsNone(store.get('session-b'))
+
+    def test_evicted_oldest_is_not_served(self):
+        store = make_store(OVERFLOW_DROP_OLDEST)
+        store.save('session-a', b'{"a":1}')
+        store.save('session-b', b'{"b":1}')
+        self.assertEqual(list(store._pending), ['session-b'])
+        self.assertIsNone(store.get('session-a'))
+
+    def test_discard_keeps_newer_results(self):
+        store = make_store(OVERFLOW_DROP_OLDEST, max_size=2)
+        store.save('session-a', b'{"a":1}')
+        store.save('session-b', b'{"b":1}')
+        store.save('session-a', b'{"a":2}')
+        # the first session-a result was evicted, its replacement is still queued
+        self.assertEqual(store.get('session-a'), b'{"a":2}')
+
+    def test_clear_expired_does_not_skip_discarded_sessions(self):
+        store = make_store(OVERFLOW_DROP_NEWEST)
+        store.save('session-a', b'{"a":1}')
+        store.writer.flush()
+        store.save('session-a', b'{"a":2}')
+        with mock.patch.object(result_service, 'upsert_results', side_effect=RuntimeError), \
+                self.assertLogs('geobackend_api.utils.write_behind', 'ERROR'):
+            store.writer.flush()
+        self.assertEqual(store.clear_expired(lambda session_keys: set(), max_age=3600), 1)
+
+
+class ClearExpiredTests(TestCase):
+
+    def setUp(self):
+        self.store = make_store()
+        for session_key in ('session-a', 'session-b', 'session-c', 'session-d', 'session-e'):
+            result_service.upsert_results([(session_key, b'{}')])
+        WellBoreCalculationResult.objects.filter(session_key='session-e').update(
+            updated_at=timezone.now() - timedelta(hours=2))
+
+    def test_sessions_are_checked_in_chunks(self):
+        chunks = []
+
+        def existing_sessions(session_keys):
+            chunks.append(list(session_keys))
+            return {'session-a', 'session-c', 'session-e'}
+
+        self.assertEqual(self.store.clear_expired(existing_sessions, max_age=3600, chunk_size=2), 3)
+        # session-e was removed for its age, without a check
+        self.assertEqual(chunks, [['session-a', 'session-b'], ['session-c', 'session-d']])
+        self.assertEqual(sorted(WellBoreCalculationResult.objects.values_list('session_key', flat=True)),
+                         ['session-a', 'session-c'])
+
+    def test_pending_results_are_kept(self):
+        self.store.save('session-b', b'{"b":2}')
+        self.assertEqual(self.store.clear_expired(lambda session_keys: set(), max_age=3600), 4)
+        self.assertEqual(list(WellBoreCalculationResult.objects.values_list('session_key', flat=True)),
+                         ['session-b'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ExistingSessionsTests(TestCase):
+
+    def create_sessions(self, engine):
+        stores = [engine.SessionStore() for _ in range(2)]
+        for store in stores:
+            store['a'] = 1
+            store.create()
+        return [store.session_key for store in stores]
+
+    def test_engines(self):
+        for engine in (cache, cached_db, db):
+            with self.subTest(engine=engine.__name__):
+                session_keys = self.create_sessions(engine)
+                self.assertEqual(existing_sessions(engine.SessionStore(), session_keys + ['missing']),
+                                 set(session_keys))
+
+    def test_cached_db_sessions_outside_the_cache(self):
+        session_keys = self.create_sessions(cached_db)
+        caches['default'].clear()
+        self.assertEqual(existing_sessions(cached_db.SessionStore(), session_keys), set(session_keys))
+
+
+class RedisResultStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeStrictRedis(server=server)
+        patcher = mock.patch.multiple(result_service, redis_client=self.redis,
+                                      get_async_redis_client=lambda: fakeredis.FakeAsyncRedis(server=server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = RedisResultStore(ttl=600)
+
+    def test_save_and_get(self):
+        json_results = b'{"installation_results":{"pump_depth":12.5}}' * 20
+        self.assertIsNone(self.store.get('session-a'))
+        self.store.save('session-a', json_results)
+        self.assertEqual(self.store.get('session-a'), json_results)
+        # stored compressed
+        self.assertLess(len(self.redis.get(RESULT_KEY_PREFIX + 'session-a')), len(json_results))
+        self.store.save('session-a', '{"a":2}')
+        self.assertEqual(self.store.get('session-a'), b'{"a":2}')
+
+    def test_results_expire_with_the_session(self):
+        self.store.save('session-a', b'{"a":1}')
+        ttl = self.redis.ttl(RESULT_KEY_PREFIX + 'session-a')
+        self.assertGreater(ttl, 590)
+        self.assertLessEqual(ttl, 600)
+        self.assertEqual(self.store.clear_expired(lambda session_keys: set(), max_age=0), 0)
+        self.assertEqual(self.store.get('session-a'), b'{"a":1}')
+
+    def test_delete(self):
+        self.store.save('session-a', b'{"a":1}')
+        self.store.delete('session-a')
+        self.assertIsNone(self.store.get('session-a'))
+
+    def test_async(self):
+        async def save_and_get():
+            await self.store.asave('session-a', b'{"a":1}')
+            return await self.store.aget('session-a')
+
+        self.assertEqual(async_to_sync(save_and_get)(), b'{"a":1}')
+        self.assertEqual(self.store.get('session-a'), b'{"a":1}')
+
+    def test_unreadable_results_are_discarded(self):
+        self.redis.set(RESULT_KEY_PREFIX + 'session-a', b'{"a":1}')
+        with self.assertLogs('geobackend_api.services.result_service', 'WARNING'):
+            self.assertIsNone(self.store.get('session-a'))
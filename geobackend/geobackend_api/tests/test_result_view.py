@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from ..models import WellBoreCalculationResult
+from ..services import result_service
+from ..views import RESULT_CACHE_CONTROL, WellBoreResultView, result_etag
+
+RESULT_URL = '/api/calculate-wellbore/result'
+RESULTS = b'{"installation_results":{"depth":120.5},"cost_results":{"total":1000}}'
+
+
+@override_settings(SESSION_ENGINE='geobackend_api.session_backends.db',
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WellBoreResultViewTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(result_service, RESULT_WRITE_BEHIND=False,
+                                      _result_store=result_service.ModelResultStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        throttles = mock.patch.object(WellBoreResultView, 'throttle_classes', [])
+        throttles.start()
+        self.addCleanup(throttles.stop)
+
+    def start_session(self, client=None):
+        session = (client or self.client).session
+        session.save()
+        return session.session_key
+
+    def test_no_session(self):
+        response = self.client.get(RESULT_URL)
+        self.assertEqual(response.status_code, 404)
+        # reading results never starts a session
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_no_results(self):
+        self.start_session()
+        self.assertEqual(self.client.get(RESULT_URL).status_code, 404)
+
+    def test_results_with_etag(self):
+        result_service.save_calculation_result(self.start_session(), RESULTS)
+        response = self.client.get(RESULT_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'installation_results': {'depth': 120.5},
+                                                   'cost_results': {'total': 1000}})
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(response['Cache-Control'], RESULT_CACHE_CONTROL)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_revalidation(self):
+        result_service.save_calculation_result(self.start_session(), RESULTS)
+        etag = self.client.get(RESULT_URL)['ETag']
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get(RESULT_URL, HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(RESULT_URL, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_new_results_change_the_etag(self):
+        session_key = self.start_session()
+        result_service.save_calculation_result(session_key, RESULTS)
+        etag = self.client.get(RESULT_URL)['ETag']
+        result_service.save_calculation_result(session_key, b'{"installation_results":null}')
+        response = self.client.get(RESULT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_stored_bytes_are_served_as_written(self):
+        json_results = b'{"installation_results": {"depth": 120.50}, "cost_results": null}'
+        result_service.save_calculation_result(self.start_session(), json_results)
+        response = self.client.get(RESULT_URL)
+        self.assertIn(b'"data":' + json_results, response.content)
+        self.assertEqual(response['ETag'], result_etag(json_results))
+
+    def test_results_by_id_are_not_served(self):
+        result_service.save_calculation_result(self.start_session(), RESULTS)
+        result_id = WellBoreCalculationResult.objects.get().id
+        self.assertEqual(self.client.get(f'{RESULT_URL}/{result_id}').status_code, 404)
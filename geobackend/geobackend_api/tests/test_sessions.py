@@ -0,0 +1,117 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..checks import check_session_engine
+from ..models import WellBoreCalculationResult
+from ..services import result_service
+from ..session_backends import cache, db
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class SessionEngineCheckTests(SimpleTestCase):
+
+    def test_result_aware_engines_pass(self):
+        for engine in ('cache', 'cached_db', 'db'):
+            with self.subTest(engine=engine), \
+                    override_settings(SESSION_ENGINE=f'geobackend_api.session_backends.{engine}'):
+                self.assertEqual(check_session_engine(None), [])
+
+    def test_stock_engine_fails(self):
+        with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache'):
+            errors = check_session_engine(None)
+        self.assertEqual([error.id for error in errors], ['geobackend_api.E002'])
+
+    def test_unknown_engine_fails(self):
+        with override_settings(SESSION_ENGINE='geobackend_api.session_backends.missing'):
+            errors = check_session_engine(None)
+        self.assertEqual([error.id for error in errors], ['geobackend_api.E001'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DeleteResultsMixinTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(result_service, RESULT_WRITE_BEHIND=False,
+                                      _result_store=result_service.ModelResultStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def session_with_results(self, engine):
+        session = engine.SessionStore()
+        session['a'] = 1
+        session.create()
+        result_service.save_calculation_result(session.session_key, b'{"a":1}')
+        return session
+
+    def test_delete_removes_the_results(self):
+        for engine in (cache, db):
+            with self.subTest(engine=engine.__name__):
+                session = self.session_with_results(engine)
+                session.delete()
+                self.assertFalse(engine.SessionStore().exists(session.session_key))
+                self.assertFalse(WellBoreCalculationResult.objects.exists())
+
+    def test_delete_by_key(self):
+        session = self.session_with_results(cache)
+        other = self.session_with_results(cache)
+        cache.SessionStore().delete(session.session_key)
+        self.assertEqual(list(WellBoreCalculationResult.objects.values_list('session_key', flat=True)),
+                         [other.session_key])
+
+    def test_cycle_key_keeps_no_results_under_the_old_key(self):
+        session = self.session_with_results(cache)
+        old_key = session.session_key
+        session.cycle_key()
+        self.assertIsNone(result_service.load_calculation_result(old_key))
+
+    def test_flush_without_a_session(self):
+        cache.SessionStore().flush()
+        self.assertFalse(WellBoreCalculationResult.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ClearExpiredResultsCommandTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(result_service, RESULT_WRITE_BEHIND=False,
+                                      _result_store=result_service.ModelResultStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_command(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('clear_expired_results', stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_results_of_expired_sessions_are_removed(self):
+        live = db.SessionStore()
+        live.create()
+        expired = db.SessionStore()
+        expired.set_expiry(-1)
+        expired.create()
+        for session_key in (live.session_key, expired.session_key, 'never-existed'):
+            result_service.save_calculation_result(session_key, b'{}')
+
+        with override_settings(SESSION_ENGINE='geobackend_api.session_backends.db'):
+            stdout, stderr = self.run_command()
+        self.assertIn('Removed 2 expired result(s)', stdout)
+        self.assertEqual(stderr, '')
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [live.session_key])
+        self.assertEqual(list(WellBoreCalculationResult.objects.values_list('session_key', flat=True)),
+                         [live.session_key])
+
+    def test_cache_sessions(self):
+        live = cache.SessionStore()
+        live.create()
+        result_service.save_calculation_result(live.session_key, b'{}')
+        result_service.save_calculation_result('gone', b'{}')
+        with override_settings(SESSION_ENGINE='geobackend_api.session_backends.cache'):
+            stdout, _ = self.run_command()
+        self.assertIn('Removed 1 expired result(s)', stdout)
+        self.assertEqual(list(WellBoreCalculationResult.objects.values_list('session_key', flat=True)),
+                         [live.session_key])
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from ..utils.single_flight import SingleFlight, AsyncSingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def run_leader_and_follower(self, flight, fn):
+        """
+        starts the leader, then a follower once the leader is inside fn;
+        returns both futures
+        """
+        started = threading.Event()
+
+        def leader():
+            started.set()
+            return fn()
+
+        # the follower logs at debug level once it has joined the leader's call
+        with ThreadPoolExecutor(max_workers=2) as executor, \
+                self.assertLogs('geobackend_api.utils.single_flight', 'DEBUG') as logs:
+            leading = executor.submit(flight.do, 'key', leader)
+            started.wait(5)
+            following = executor.submit(flight.do, 'key', self.fail)
+            while not logs.records:
+                time.sleep(0.001)
+            self.release.set()
+        return leading, following
+
+    def setUp(self):
+        self.release = threading.Event()
+
+    def test_followers_share_the_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            self.release.wait(5)
+            return 'result'
+
+        leading, following = self.run_leader_and_follower(flight, fn)
+        self.assertEqual(leading.result(), 'result')
+        self.assertEqual(following.result(), 'result')
+        self.assertEqual(calls, [1])
+
+    def test_leader_failure_reaches_followers(self):
+        flight = SingleFlight()
+
+        def fn():
+            self.release.wait(5)
+            raise ValueError('upstream failed')
+
+        leading, following = self.run_leader_and_follower(flight, fn)
+        self.assertRaisesMessage(ValueError, 'upstream failed', leading.result)
+        self.assertRaisesMessage(ValueError, 'upstream failed', following.result)
+
+    def test_failure_is_not_remembered(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('key', self.raise_value_error)
+        self.assertEqual(flight.do('key', lambda: 'retried'), 'retried')
+        self.assertEqual(flight._calls, {})
+
+    @staticmethod
+    def raise_value_error():
+        raise ValueError
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+
+    def test_leader_failure_reaches_waiters(self):
+        async def scenario():
+            flight = AsyncSingleFlight()
+            release = asyncio.Event()
+
+            async def fn():
+                await release.wait()
+                raise ValueError('upstream failed')
+
+            leading = asyncio.create_task(flight.do('key', fn))
+            await asyncio.sleep(0)
+            waiting = asyncio.create_task(flight.do('key', fn))
+            await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(leading, waiting, return_exceptions=True), flight
+
+        (leading, waiting), flight = asyncio.run(scenario())
+        self.assertIsInstance(leading, ValueError)
+        self.assertIs(waiting, leading)
+        self.assertEqual(flight._futures, {})
+
+    def test_waiter_takes_over_from_a_cancelled_leader(self):
+        async def scenario():
+            flight = AsyncSingleFlight()
+            calls = []
+
+            async def fn():
+                calls.append(1)
+                await asyncio.sleep(0.01 if len(calls) > 1 else 10)
+                return 'result'
+
+            leading = asyncio.create_task(flight.do('key', fn))
+            await asyncio.sleep(0)
+            waiting = asyncio.create_task(flight.do('key', fn))
+            await asyncio.sleep(0)
+            leading.cancel()
+            result = await waiting
+            return result, leading.cancelled(), calls
+
+        result, leader_cancelled, calls = asyncio.run(scenario())
+        self.assertEqual(result, 'result')
+        self.assertTrue(leader_cancelled)
+        self.assertEqual(calls, [1, 1])
+
+    def test_cancelled_waiter_does_not_cancel_the_leader(self):
+        async def scenario():
+            flight = AsyncSingleFlight()
+
+            async def fn():
+                await asyncio.sleep(0.01)
+                return 'result'
+
+            leading = asyncio.create_task(flight.do('key', fn))
+            await asyncio.sleep(0)
+            waiting = asyncio.create_task(flight.do('key', fn))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            return await leading, waiting
+
+        result, waiting = asyncio.run(scenario())
+        self.assertEqual(result, 'result')
+        self.assertTrue(waiting.cancelled())
@@ -0,0 +1,161 @@
+from unittest import mock
+
+import fakeredis
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from ..serializers import SweepUserInputSerializer
+from ..services import calculation_service
+from ..services.sweep_service import run_parameter_sweep, flatten_scalars, expand_outputs
+from ..utils import calculation_cache
+
+INITIAL_INPUT_VALUES = {
+    'required_flow_rate': 5,
+    'hydraulic_conductivity': 10,
+    'average_porosity': 0.3,
+    'bore_lifetime_year': 30,
+    'long_term_decline_rate': 1,
+    'allowable_drawdown': 25,
+    'safety_margin': 25,
+}
+
+DEPTH_DATA = {'aquifer_layer': ['100qa', '114bse'], 'is_aquifer': [True, False], 'depth_to_base': [10.0, 210.0]}
+
+
+def sweep_request(sweep, **extra):
+    return {
+        'coordinates': [-37.8, 144.9],
+        'crs_type': 'epsg:4326',
+        'min_resolution': 100,
+        'pixels': [100, 100],
+        'is_production_pump': 'true',
+        'initial_input_values': INITIAL_INPUT_VALUES,
+        'sweep': sweep,
+        **extra,
+    }
+
+
+class SweepValidationTests(SimpleTestCase):
+
+    def validate(self, sweep, **extra):
+        serializer = SweepUserInputSerializer(data=sweep_request(sweep, **extra))
+        serializer.is_valid()
+        return serializer
+
+    def test_valid_sweep(self):
+        serializer = self.validate({'required_flow_rate': [5, 10, 5.0], 'average_porosity': [0.2, 0.3]})
+        self.assertEqual(serializer.errors, {})
+        # duplicates are dropped
+        self.assertEqual(serializer.validated_data['sweep'],
+                         {'required_flow_rate': [5.0, 10.0], 'average_porosity': [0.2, 0.3]})
+
+    def test_unknown_input(self):
+        serializer = self.validate({'groundwater_depth': [1, 2]})
+        self.assertIn('cannot sweep', str(serializer.errors['sweep']))
+
+    def test_values_use_the_input_constraints(self):
+        serializer = self.validate({'average_porosity': [0.3, 1.5]})
+        self.assertIn('average_porosity', serializer.errors['sweep'])
+
+    def test_empty_sweeps(self):
+        self.assertIn('sweep', self.validate({}).errors)
+        self.assertIn('sweep', self.validate({'required_flow_rate': []}).errors)
+
+    @override_settings(SWEEP_MAX_COMBINATIONS=4)
+    def test_combination_limit(self):
+        self.assertEqual(self.validate({'required_flow_rate': [1, 2], 'safety_margin': [10, 20]}).errors, {})
+        serializer = self.validate({'required_flow_rate': [1, 2, 3], 'safety_margin': [10, 20]})
+        self.assertIn('6 combinations', str(serializer.errors['sweep']))
+
+    def test_outputs_may_not_be_empty(self):
+        self.assertIn('outputs', self.validate({'required_flow_rate': [1]}, outputs=[]).errors)
+
+
+class FlattenScalarsTests(SimpleTestCase):
+
+    def test_lists_and_records_are_keyed_by_position(self):
+        results = {'installation_results': {'depth': 42.0, 'screen': [1, 2.5]},
+                   'cost_results': [{'stage': 'drill', 'cost': 1000.5}, {'stage': 'pump', 'cost': None}],
+                   'note': 'ok'}
+        self.assertEqual(flatten_scalars(results), {
+            'installation_results.depth': 42.0,
+            'installation_results.screen.0': 1,
+            'installation_results.screen.1': 2.5,
+            'cost_results.0.stage': 'drill',
+            'cost_results.0.cost': 1000.5,
+            'cost_results.1.stage': 'pump',
+            'cost_results.1.cost': None,
+            'note': 'ok',
+        })
+
+    def test_outputs_naming_a_group_expand(self):
+        columns = ['a.b', 'a.c.0', 'a.c.1', 'ab']
+        self.assertEqual(expand_outputs(['a.c', 'ab', 'a.c.0'], columns), ['a.c.0', 'a.c.1', 'ab'])
+        with self.assertRaisesMessage(ValueError, "outputs ['a.d', 'a.c.2']"):
+            expand_outputs(['a.b', 'a.d', 'a.c.2'], columns)
+
+
+def stub_calculation(is_production_pump, depth_data, initial_input_values):
+    flow_rate = initial_input_values['required_flow_rate']
+    if flow_rate > 50:
+        raise ValueError('flow rate too high')
+    return {'installation_results': {'depth': flow_rate * 2},
+            'cost_results': pd.DataFrame({'stage': ['drill', 'pump'],
+                                          'cost': [1000.0 * flow_rate, initial_input_values['safety_margin']]})}
+
+
+class RunParameterSweepTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        self.calculations = []
+        patchers = [
+            mock.patch.multiple(calculation_cache, redis_client=self.redis, CALCULATION_CACHE_ENABLED=True),
+            mock.patch.multiple(calculation_service,
+                                _calculation_stats={'in_flight': 0, 'overdue': 0},
+                                _perform_wellbore_calculation_in_worker=self.calculate),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def calculate(self, *args):
+        self.calculations.append(args[2]['required_flow_rate'])
+        return stub_calculation(*args)
+
+    def sweep(self, sweep, outputs=None):
+        return run_parameter_sweep('true', DEPTH_DATA, INITIAL_INPUT_VALUES, sweep, outputs=outputs)
+
+    def test_table(self):
+        table, summary = self.sweep({'required_flow_rate': [5.0, 60.0], 'safety_margin': [10.0, 20.0]})
+        self.assertEqual(table['columns'], ['required_flow_rate', 'safety_margin', 'status', 'error',
+                                            'installation_results.depth',
+                                            'cost_results.0.stage', 'cost_results.0.cost',
+                                            'cost_results.1.stage', 'cost_results.1.cost'])
+        self.assertEqual(table['rows'], [
+            [5.0, 10.0, 'ok', None, 10.0, 'drill', 5000.0, 'pump', 10.0],
+            [5.0, 20.0, 'ok', None, 10.0, 'drill', 5000.0, 'pump', 20.0],
+            [60.0, 10.0, 'error', 'flow rate too high', None, None, None, None, None],
+            [60.0, 20.0, 'error', 'flow rate too high', None, None, None, None, None],
+        ])
+        self.assertEqual(summary, {'combinations': 4, 'cached': 0, 'calculated': 2, 'failed': 2})
+
+    def test_cached_combinations_are_read_in_one_round_trip(self):
+        sweep = {'required_flow_rate': [5.0, 10.0]}
+        first, _ = self.sweep(sweep)
+        self.calculations.clear()
+        with mock.patch.object(self.redis, 'get', side_effect=AssertionError('one GET per combination')), \
+                mock.patch.object(self.redis, 'mget', wraps=self.redis.mget) as mget:
+            table, summary = self.sweep({'required_flow_rate': [5.0, 10.0, 20.0]})
+        mget.assert_called_once()
+        self.assertEqual(self.calculations, [20.0])
+        self.assertEqual(summary['cached'], 2)
+        self.assertEqual(table['rows'][:2], first['rows'])
+
+    def test_outputs(self):
+        table, _ = self.sweep({'required_flow_rate': [5.0]}, outputs=['cost_results.1', 'installation_results.depth'])
+        self.assertEqual(table['columns'], ['required_flow_rate', 'status', 'error', 'cost_results.1.stage',
+                                            'cost_results.1.cost', 'installation_results.depth'])
+        self.assertEqual(table['rows'], [[5.0, 'ok', None, 'pump', 25.0, 10.0]])
+        with self.assertRaisesMessage(ValueError, "outputs ['cost_results.total']"):
+            self.sweep({'required_flow_rate': [5.0]}, outputs=['cost_results.total'])
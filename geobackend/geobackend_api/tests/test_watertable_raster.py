@@ -0,0 +1,124 @@
+import math
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..utils import watertable_raster
+from ..utils.watertable_raster import (WatertableRaster, parse_arc_grid, new_raster_version,
+                                       publish_raster_version, get_watertable_raster, sample_watertable_depth)
+
+ARC_GRID = """ncols 3
+nrows 2
+xllcorner 1000
+yllcorner 1980
+cellsize 10
+NODATA_value -9999
+1.5 2.5 -9999
+4 5.25 6
+"""
+
+
+def write_raster(path, values, origin_x=1000.0, origin_y=2000.0, pixel_size=10.0):
+    values = np.asarray(values, dtype=float)
+    data = WatertableRaster.create(path, origin_x, origin_y, pixel_size, values.shape[1], values.shape[0])
+    data[:] = values
+    data.flush()
+    del data
+
+
+class ParseArcGridTests(SimpleTestCase):
+
+    def test_corner_header(self):
+        values, west, north, cell_size = parse_arc_grid(ARC_GRID)
+        self.assertEqual((west, north, cell_size), (1000, 2000, 10))
+        np.testing.assert_array_equal(values, [[1.5, 2.5, np.nan], [4, 5.25, 6]])
+
+    def test_centre_header(self):
+        text = ARC_GRID.replace('xllcorner 1000', 'xllcenter 1005').replace('yllcorner 1980', 'yllcenter 1985')
+        _, west, north, _ = parse_arc_grid(text)
+        self.assertEqual((west, north), (1000, 2000))
+
+    def test_value_count_must_match(self):
+        with self.assertRaisesMessage(ValueError, 'expected 3 x 2'):
+            parse_arc_grid(ARC_GRID.replace('4 5.25 6', '4 5.25'))
+
+
+class WatertableRasterTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'watertable.npy'
+        write_raster(self.path, parse_arc_grid(ARC_GRID)[0])
+        self.raster = WatertableRaster(self.path)
+
+    def test_sample(self):
+        self.assertEqual((self.raster.width, self.raster.height), (3, 2))
+        self.assertEqual(self.raster.sample(1000.0, 2000.0), 1.5)
+        self.assertEqual(self.raster.sample(1019.9, 1990.1), 2.5)
+        self.assertEqual(self.raster.sample(1015.0, 1985.0), 5.25)
+        # nodata and outside the raster
+        self.assertIsNone(self.raster.sample(1025.0, 1995.0))
+        self.assertIsNone(self.raster.sample(999.9, 1995.0))
+        self.assertIsNone(self.raster.sample(1005.0, 2000.1))
+        self.assertIsNone(self.raster.sample(1005.0, 1980.0))
+
+    def test_sample_many_matches_sample(self):
+        xs = np.array([1000.0, 1019.9, 1015.0, 1025.0, 999.9, 1005.0, 1005.0])
+        ys = np.array([2000.0, 1990.1, 1985.0, 1995.0, 1995.0, 2000.1, 1980.0])
+        expected = [self.raster.sample(x, y) for x, y in zip(xs, ys)]
+        sampled = self.raster.sample_many(xs, ys)
+        self.assertEqual([None if math.isnan(value) else value for value in sampled], expected)
+
+    def test_sample_watertable_depth_uses_the_bbox_centre(self):
+        with mock.patch.object(watertable_raster, 'get_watertable_raster', return_value=self.raster):
+            self.assertEqual(sample_watertable_depth(('1010.0, 1980.0, 1020.0, 1990.0', 1, 1, 0, 0)), 5.25)
+            self.assertIsNone(sample_watertable_depth(('0.0, 0.0, 10.0, 10.0', 1, 1, 0, 0)))
+
+
+class RasterVersionTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'watertable.npy'
+        patcher = mock.patch.multiple(watertable_raster, WATERTABLE_SOURCE='raster',
+                                      WATERTABLE_RASTER_PATH=str(self.path), WATERTABLE_RASTER_CHECK_INTERVAL=0,
+                                      _raster=None, _raster_version=None, _raster_checked_at=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def publish(self, value, keep=2):
+        version_path = new_raster_version(self.path)
+        write_raster(version_path, [[value]])
+        publish_raster_version(self.path, version_path, keep=keep)
+        return version_path
+
+    def test_publish_swaps_the_link(self):
+        first = self.publish(1.0)
+        self.assertTrue(self.path.is_symlink())
+        self.assertEqual(self.path.resolve(), first)
+        self.assertEqual(get_watertable_raster().sample(1005.0, 1995.0), 1.0)
+
+        second = self.publish(2.0)
+        self.assertEqual(self.path.resolve(), second)
+        self.assertEqual(get_watertable_raster().sample(1005.0, 1995.0), 2.0)
+        # the sidecar is read from the version the link points at
+        self.assertEqual(get_watertable_raster().path, second)
+
+    def test_old_versions_are_removed(self):
+        versions = [self.publish(float(value), keep=2) for value in range(4)]
+        remaining = sorted(path.name for path in (versions[0].parent.parent).iterdir())
+        self.assertEqual(remaining, [versions[2].parent.name, versions[3].parent.name])
+
+    def test_unchanged_raster_is_not_reloaded(self):
+        self.publish(1.0)
+        raster = get_watertable_raster()
+        self.assertIs(get_watertable_raster(), raster)
+
+    def test_missing_raster(self):
+        with self.assertLogs('geobackend_api.utils.watertable_raster', 'WARNING'):
+            self.assertIsNone(get_watertable_raster())
@@ -0,0 +1,65 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..utils import wms_client
+from ..utils.wms_client import WMSClient, DEFAULT_HEADERS, get_wms_client
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.headers.get('User-Agent', '').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WMSClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/wms"
+        self.client = WMSClient(connect_timeout=1, read_timeout=2)
+        self.addCleanup(self.client.close)
+
+    def test_connection_is_kept_alive(self):
+        for _ in range(3):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+        host = f"http://127.0.0.1:{self.server.server_port}"
+        self.assertEqual(self.client.get_pool_stats(), {host: {'opened': 1, 'requests': 3, 'reused': 2}})
+
+    def test_default_headers_and_timeout(self):
+        with mock.patch.object(self.client.session, 'get', wraps=self.client.session.get) as get:
+            response = self.client.get(self.url)
+        self.assertEqual(response.text, DEFAULT_HEADERS['User-Agent'])
+        self.assertEqual(get.call_args.kwargs['timeout'], (1, 2))
+
+    def test_no_stats_before_the_first_request(self):
+        self.assertEqual(self.client.get_pool_stats(), {})
+
+
+class GetWMSClientTests(SimpleTestCase):
+
+    def test_one_client_per_process(self):
+        with mock.patch.object(wms_client, '_client', None):
+            clients = []
+            threads = [threading.Thread(target=lambda: clients.append(get_wms_client())) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len({id(client) for client in clients}), 1)
+            self.assertIs(get_wms_client(), clients[0])
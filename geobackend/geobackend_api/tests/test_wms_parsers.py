@@ -0,0 +1,95 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from ..benchmarks import FIXTURE_DIR, iter_fixtures
+from ..benchmarks.parsers import PARITY_CASES, PARSE_TARGETS, check_parity
+from ..management.commands.record_wms_fixtures import scrub
+from ..utils import data_fetch_utils, wms_client
+from ..utils.stub_wms import StubWMSServer, load_responses
+from ..utils.wms_parsers import PARSER_BACKENDS, extract_watertable_text
+from .fakes import serve_in_thread
+
+
+class ParserParityTests(SimpleTestCase):
+
+    def test_backends_agree(self):
+        self.assertEqual(check_parity(), [])
+
+    def test_label_inside_inline_child(self):
+        self.assertEqual(extract_watertable_text(PARITY_CASES['watertable_text']['inline_label']), '12.5 m')
+
+    def test_label_with_siblings_is_not_matched(self):
+        self.assertIsNone(extract_watertable_text(PARITY_CASES['watertable_text']['label_and_sibling']))
+
+
+class FixtureParityTests(SimpleTestCase):
+    """
+    every fixture response, synthetic or recorded with record_wms_fixtures,
+    reads the same through the streaming parsers as through BeautifulSoup
+    """
+
+    def test_extractors_match_bs4(self):
+        for request_type, (extractor, _) in PARSE_TARGETS.items():
+            for site, html in iter_fixtures(request_type):
+                with self.subTest(fixture=f'{site}.{request_type}'):
+                    expected = getattr(PARSER_BACKENDS['bs4'], extractor)(html)
+                    self.assertTrue(expected)
+                    self.assertEqual(getattr(PARSER_BACKENDS['fast'], extractor)(html), expected)
+
+    def test_parse_functions_match_bs4(self):
+        for request_type, (_, parse) in PARSE_TARGETS.items():
+            for site, html in iter_fixtures(request_type):
+                with self.subTest(fixture=f'{site}.{request_type}'):
+                    response = SimpleNamespace(status_code=200, text=html)
+                    outputs = {}
+                    for name, backend in PARSER_BACKENDS.items():
+                        with mock.patch.object(data_fetch_utils, 'html_parser', backend):
+                            outputs[name] = parse(response)
+                    self.assertEqual(outputs['fast'], outputs['bs4'])
+
+    def test_parsed_values(self):
+        response = SimpleNamespace(status_code=200, text=(FIXTURE_DIR / 'gippsland.layers.html').read_text())
+        self.assertEqual(data_fetch_utils.parse_wms_layers(response)[:3], ['100qa', '102utqa', '103utqd'])
+        response.text = (FIXTURE_DIR / 'gippsland.watertable_depth.html').read_text()
+        self.assertEqual(data_fetch_utils.parse_watertable_depth(response), 3.05)
+        response.text = (FIXTURE_DIR / 'gippsland.aquifer_info.html').read_text()
+        aquifer_info = data_fetch_utils.parse_aquifer_info(response)
+        self.assertEqual(aquifer_info['100qa']['Aqdepth'], 0.0)
+        self.assertEqual(aquifer_info['111lta']['Thickness'], 142.7)
+
+
+class RecordWMSFixturesCommandTests(SimpleTestCase):
+
+    def setUp(self):
+        self.stub = StubWMSServer(('127.0.0.1', 0), load_responses(FIXTURE_DIR))
+        base_url = f"{serve_in_thread(self, self.stub)}/geoserver/vvg/wms"
+        patcher = mock.patch.object(data_fetch_utils, 'WMS_BASE_URL', base_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(wms_client, '_client', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = Path(directory.name)
+
+    def test_records_every_request_type(self):
+        call_command('record_wms_fixtures', 'ballarat', '--coordinates', '-37.56', '143.85',
+                     '--output', str(self.output), stdout=StringIO())
+        self.assertEqual(sorted(path.name for path in self.output.iterdir()),
+                         ['ballarat.aquifer_info.html', 'ballarat.layers.html', 'ballarat.watertable_depth.html'])
+        recorded = (self.output / 'ballarat.watertable_depth.html').read_text()
+        self.assertTrue(recorded.startswith('<!-- recorded from GeoServer on '))
+        # the recorded set is complete, so the stub WMS can serve it
+        self.assertEqual(list(load_responses(self.output)['layers']), ['ballarat'])
+
+    def test_the_geoserver_host_is_scrubbed(self):
+        host = data_fetch_utils.WMS_BASE_URL.split('/')[2]
+        self.assertEqual(scrub(f'<link href="http://{host}/geoserver/styles/x.css">'),
+                         '<link href="http://geoserver.invalid/geoserver/styles/x.css">')
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..utils.write_behind import (WriteBehindQueue, OVERFLOW_SYNC, OVERFLOW_DROP_NEWEST,
+                                  OVERFLOW_DROP_OLDEST)
+
+
+def make_queue(overflow, write_batch=None, max_size=1):
+    written, discarded = [], []
+    writer = WriteBehindQueue(write_batch or written.extend, key=lambda item: item[0],
+                              max_size=max_size, overflow=overflow, on_discard=discarded.extend)
+    # no background thread, so the queue stays full until flushed
+    writer._ensure_started = lambda: None
+    return writer, written, discarded
+
+
+class WriteBehindQueueOverflowTests(SimpleTestCase):
+
+    def test_sync_writes_on_the_caller(self):
+        writer, written, discarded = make_queue(OVERFLOW_SYNC)
+        writer.put(('a', 1))
+        writer.put(('b', 2))
+        self.assertEqual(written, [('b', 2)])
+        writer.flush()
+        self.assertEqual(written, [('b', 2), ('a', 1)])
+        self.assertEqual(discarded, [])
+        self.assertEqual(writer.stats()['sync_writes'], 1)
+
+    def test_drop_newest_discards_the_new_item(self):
+        writer, written, discarded = make_queue(OVERFLOW_DROP_NEWEST)
+        writer.put(('a', 1))
+        writer.put(('b', 2))
+        writer.flush()
+        self.assertEqual(written, [('a', 1)])
+        self.assertEqual(discarded, [('b', 2)])
+        self.assertEqual(writer.stats()['dropped'], 1)
+
+    def test_drop_oldest_discards_the_queued_item(self):
+        writer, written, discarded = make_queue(OVERFLOW_DROP_OLDEST)
+        writer.put(('a', 1))
+        writer.put(('b', 2))
+        writer.flush()
+        self.assertEqual(written, [('b', 2)])
+        self.assertEqual(discarded, [('a', 1)])
+
+    def test_failed_batch_is_discarded(self):
+        def fail(batch):
+            raise RuntimeError('database is down')
+
+        writer, written, discarded = make_queue(OVERFLOW_SYNC, write_batch=fail, max_size=10)
+        writer.put(('a', 1))
+        writer.put(('a', 2))
+        writer.put(('b', 3))
+        with self.assertLogs('geobackend_api.utils.write_behind', 'ERROR'):
+            writer.flush()
+        # coalesced before the write, so only the last item per key is reported
+        self.assertEqual(sorted(discarded), [('a', 2), ('b', 3)])
+        self.assertEqual(writer.stats()['failed'], 2)
+
+    def test_discard_callback_errors_are_logged(self):
+        writer, written, discarded = make_queue(OVERFLOW_DROP_NEWEST)
+        writer.on_discard = mock.Mock(side_effect=RuntimeError)
+        writer.put(('a', 1))
+        with self.assertLogs('geobackend_api.utils.write_behind', 'ERROR'):
+            writer.put(('b', 2))
+        self.assertEqual(writer.stats()['queued'], 1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            WriteBehindQueue(list, overflow='block')
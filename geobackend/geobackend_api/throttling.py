@@ -0,0 +1,29 @@
+from asgiref.sync import sync_to_async
+from rest_framework.throttling import AnonRateThrottle
+
+
+class AsyncAnonRateThrottle(AnonRateThrottle):
+    """
+    AnonRateThrottle for async views. The request history is read and
+    written through the cache's async API, so the Redis round trips run
+    on the cache's thread pool rather than on the event loop.
+    """
+
+    async def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        # request.user may load the session
+        self.key = await sync_to_async(self.get_cache_key)(request, view)
+        if self.key is None:
+            return True
+
+        self.history = await self.cache.aget(self.key, [])
+        self.now = self.timer()
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+        if len(self.history) >= self.num_requests:
+            return self.throttle_failure()
+
+        self.history.insert(0, self.now)
+        await self.cache.aset(self.key, self.history, self.duration)
+        return True
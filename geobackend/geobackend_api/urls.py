@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework import routers
 from .views import *
@@ -6,8 +7,14 @@ router = routers.DefaultRouter()
 # router.register('depth-profile', views.DepthProfileViewSet)
 # router.register('depth-layer', views.DepthLayerViewSet)
 
+# the async view only pays off under ASGI; WSGI deployments keep the sync one
+wellbore_calc_view = AsyncWellBoreCalcView if getattr(settings, 'USE_ASYNC_VIEWS', False) else WellBoreCalcView
+
 urlpatterns = [
-    path('calculate-wellbore', WellBoreCalcView.as_view()),
+    path('calculate-wellbore', wellbore_calc_view.as_view()),
+    path('calculate-wellbore/batch', WellBoreBatchCalcView.as_view()),
+    path('calculate-wellbore/sweep', WellBoreSweepCalcView.as_view()),
+    path('calculate-wellbore/result', WellBoreResultView.as_view()),
     path('calculate-profile', TestWellboreCalculationView.as_view()),
 
 ] 
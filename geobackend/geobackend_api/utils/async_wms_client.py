@@ -0,0 +1,56 @@
+import asyncio
+import weakref
+import logging
+
+import httpx
+from django.conf import settings
+
+from .wms_client import DEFAULT_HEADERS, WMS_CONNECT_TIMEOUT, WMS_READ_TIMEOUT, WMS_POOL_MAXSIZE
+
+logger = logging.getLogger(__name__)
+
+# upper bound on simultaneous upstream connections per event loop
+WMS_ASYNC_MAX_CONNECTIONS = getattr(settings, 'WMS_ASYNC_MAX_CONNECTIONS', 100)
+
+
+class AsyncWMSClient:
+    """
+    asyncio counterpart of WMSClient, backed by a pooled httpx.AsyncClient.
+    httpx clients are bound to the event loop they were created on,
+    so one instance is kept per running loop.
+    """
+
+    def __init__(self,
+                 connect_timeout: float = WMS_CONNECT_TIMEOUT,
+                 read_timeout: float = WMS_READ_TIMEOUT,
+                 max_connections: int = WMS_ASYNC_MAX_CONNECTIONS,
+                 max_keepalive_connections: int = WMS_POOL_MAXSIZE):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_keepalive_connections),
+        )
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        return await self.client.get(url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_wms_client() -> AsyncWMSClient:
+    """
+    returns the WMS client for the running event loop, creating it on first use
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncWMSClient()
+        _clients[loop] = client
+        logger.info("Async WMS client initialised: max_connections=%s", WMS_ASYNC_MAX_CONNECTIONS)
+    return client
@@ -1,9 +1,17 @@
 import redis
-import pickle
+import redis.asyncio
+import asyncio
+import threading
+import weakref
+import json
+import zlib
+import uuid
 import logging
 from hashlib import md5
 from django.conf import settings
 
+from .local_cache import LocalTTLCache
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_REDIS_URL='redis://127.0.0.1:6379/1' #TODO: relocate this
@@ -12,6 +20,58 @@ REDIS_URL = getattr(settings, 'REDIS_URL', DEFAULT_REDIS_URL)
 redis_client = redis.StrictRedis.from_url(REDIS_URL)
 CACHE_TIMEOUT = 3600 * 24  # Cache timeout of 1 day
 
+# cached values are framed as MAGIC + version + flags + payload,
+# where payload is compact JSON, optionally zlib compressed
+CACHE_MAGIC = b'GBC'
+CACHE_FORMAT_VERSION = 1
+FLAG_COMPRESSED = 0x01
+CACHE_COMPRESSION = getattr(settings, 'CACHE_COMPRESSION', True)
+CACHE_COMPRESSION_MIN_BYTES = getattr(settings, 'CACHE_COMPRESSION_MIN_BYTES', 512)
+
+# in-process first tier in front of Redis. Nothing invalidates it: a WMS product
+# only changes with the GeoServer data, so entries simply expire after LOCAL_CACHE_TTL
+LOCAL_CACHE_MAX_ENTRIES = getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 1024)
+LOCAL_CACHE_TTL = getattr(settings, 'LOCAL_CACHE_TTL', 300)
+
+local_cache = LocalTTLCache(max_entries=LOCAL_CACHE_MAX_ENTRIES, ttl=LOCAL_CACHE_TTL)
+
+_stats_lock = threading.Lock()
+_cache_stats = {
+    'local': {'hits': 0, 'misses': 0},
+    'redis': {'hits': 0, 'misses': 0},
+}
+
+# short-lived locks used to elect one worker to fetch a missing key
+LOCK_PREFIX = 'lock:'
+# deletes the lock only if it is still held by the caller's token
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_release_lock = redis_client.register_script(_RELEASE_LOCK_SCRIPT)
+
+# asyncio clients are bound to the loop they were created on
+_async_redis_clients = weakref.WeakKeyDictionary()
+
+
+class CacheDecodeError(ValueError):
+    """
+    raised for cached bytes that were not written by encode_cache_value,
+    or were written by an incompatible format version
+    """
+
+
+def get_async_redis_client():
+    loop = asyncio.get_running_loop()
+    client = _async_redis_clients.get(loop)
+    if client is None:
+        client = redis.asyncio.StrictRedis.from_url(REDIS_URL)
+        _async_redis_clients[loop] = client
+    return client
+
+
 def generate_cache_key(params):
     """
     Generate a unique cache key based on the request parameters
@@ -19,15 +79,163 @@ def generate_cache_key(params):
     key_string = str(params)
     return md5(key_string.encode('utf-8')).hexdigest()
 
+
+def encode_cache_value(value, compress: bool = CACHE_COMPRESSION) -> bytes:
+    """
+    serialises a JSON-compatible value (parsed WMS products) for Redis
+    """
+    return frame_payload(json.dumps(value, separators=(',', ':')).encode('utf-8'), compress)
+
+
+def decode_cache_value(data: bytes):
+    return json.loads(unframe_payload(data))
+
+
+def frame_payload(payload: bytes, compress: bool = CACHE_COMPRESSION) -> bytes:
+    """
+    frames already encoded bytes in the cache format, compressing large payloads
+    """
+    flags = 0
+    if compress and len(payload) >= CACHE_COMPRESSION_MIN_BYTES:
+        payload = zlib.compress(payload)
+        flags |= FLAG_COMPRESSED
+    return CACHE_MAGIC + bytes((CACHE_FORMAT_VERSION, flags)) + payload
+
+
+def unframe_payload(data: bytes) -> bytes:
+    header_size = len(CACHE_MAGIC) + 2
+    if len(data) < header_size or not data.startswith(CACHE_MAGIC):
+        raise CacheDecodeError("Unrecognised cache entry")
+    version, flags = data[len(CACHE_MAGIC)], data[len(CACHE_MAGIC) + 1]
+    if version != CACHE_FORMAT_VERSION:
+        raise CacheDecodeError(f"Unsupported cache format version: {version}")
+    payload = data[header_size:]
+    if flags & FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    return payload
+
+
+def _decode_or_none(key, cached_data):
+    if cached_data is None:
+        logger.info("No cache found for key: %s", key)
+        return None
+    try:
+        value = decode_cache_value(cached_data)
+    except (CacheDecodeError, zlib.error, ValueError) as e:
+        # entries from an older format are treated as a miss and overwritten
+        logger.warning("Discarding unreadable cache entry %s: %s", key, e)
+        return None
+    logger.info("Cache hit for key: %s", key)
+    return value
+
+
+def _count(tier, hit):
+    with _stats_lock:
+        _cache_stats[tier]['hits' if hit else 'misses'] += 1
+
+
+def get_cache_stats() -> dict:
+    """
+    hit/miss counters per tier since process start
+    """
+    with _stats_lock:
+        return {tier: dict(counts) for tier, counts in _cache_stats.items()}
+
+
+def _get_local(key):
+    value = local_cache.get(key)
+    _count('local', value is not None)
+    return value
+
+
+def _fill_local(key, value):
+    _count('redis', value is not None)
+    if value is not None:
+        local_cache.set(key, value)
+    return value
+
+
 def get_cache(key):
+    value = _get_local(key)
+    if value is not None:
+        logger.debug("Local cache hit for key: %s", key)
+        return value
+    return _fill_local(key, _decode_or_none(key, redis_client.get(key)))
+
+
+def set_cache(key, value, timeout=CACHE_TIMEOUT):
+    redis_client.setex(key, timeout, encode_cache_value(value))
+    local_cache.set(key, value, ttl=timeout)
+    logger.info("Data cached with key: %s", key)
+
+
+async def aget_cache(key):
+    value = _get_local(key)
+    if value is not None:
+        logger.debug("Local cache hit for key: %s", key)
+        return value
+    return _fill_local(key, _decode_or_none(key, await get_async_redis_client().get(key)))
+
+
+async def aset_cache(key, value, timeout=CACHE_TIMEOUT):
+    await get_async_redis_client().setex(key, timeout, encode_cache_value(value))
+    local_cache.set(key, value, ttl=timeout)
+    logger.info("Data cached with key: %s", key)
+
+
+def peek_cache(key):
+    """
+    reads key from Redis only, without touching the local tier or the stats;
+    used by workers polling for a result another worker is fetching
+    """
     cached_data = redis_client.get(key)
-    if cached_data:
-        logger.info(f"Cache hit for key: {key}")
-        return pickle.loads(cached_data)
-    logger.info(f"No cache found for key: {key}")
+    if cached_data is None:
+        return None
+    try:
+        return decode_cache_value(cached_data)
+    except (CacheDecodeError, zlib.error, ValueError):
+        return None
+
+
+def acquire_lock(key, timeout: float):
+    """
+    tries to take the cross-worker lock for key
+    returns a token to pass to release_lock, or None if it is held elsewhere
+    """
+    token = uuid.uuid4().hex
+    if redis_client.set(LOCK_PREFIX + key, token, nx=True, px=int(timeout * 1000)):
+        return token
     return None
 
-def set_cache(key, value, timeout=CACHE_TIMEOUT):
-    pickled_data = pickle.dumps(value)
-    redis_client.setex(key, timeout, pickled_data)
-    logger.info(f"Data cached with key: {key}")
+
+def release_lock(key, token):
+    _release_lock(keys=[LOCK_PREFIX + key], args=[token])
+
+
+def is_locked(key) -> bool:
+    return bool(redis_client.exists(LOCK_PREFIX + key))
+
+
+async def apeek_cache(key):
+    cached_data = await get_async_redis_client().get(key)
+    if cached_data is None:
+        return None
+    try:
+        return decode_cache_value(cached_data)
+    except (CacheDecodeError, zlib.error, ValueError):
+        return None
+
+
+async def aacquire_lock(key, timeout: float):
+    token = uuid.uuid4().hex
+    if await get_async_redis_client().set(LOCK_PREFIX + key, token, nx=True, px=int(timeout * 1000)):
+        return token
+    return None
+
+
+async def arelease_lock(key, token):
+    await get_async_redis_client().eval(_RELEASE_LOCK_SCRIPT, 1, LOCK_PREFIX + key, token)
+
+
+async def ais_locked(key) -> bool:
+    return bool(await get_async_redis_client().exists(LOCK_PREFIX + key))
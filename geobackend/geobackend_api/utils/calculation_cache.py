@@ -0,0 +1,160 @@
+import json
+import math
+import threading
+import logging
+from hashlib import sha256
+from importlib import metadata
+
+import redis
+from django.conf import settings
+
+from .cache_utils import redis_client, get_async_redis_client
+
+logger = logging.getLogger(__name__)
+
+# finished wellbore calculations, stored as serialization_utils.pack_results bytes
+CALCULATION_CACHE_ENABLED = getattr(settings, 'CALCULATION_CACHE_ENABLED', True)
+CALCULATION_CACHE_TTL = getattr(settings, 'CALCULATION_CACHE_TTL', 3600 * 24)  # seconds
+CALCULATION_CACHE_MAX_BYTES = getattr(settings, 'CALCULATION_CACHE_MAX_BYTES', 256 * 1024)
+# significant digits kept when normalising floats for the cache key
+CALCULATION_CACHE_FLOAT_DIGITS = getattr(settings, 'CALCULATION_CACHE_FLOAT_DIGITS', 12)
+
+CALCULATION_KEY_PREFIX = 'calc:'
+
+try:
+    # results of a different calculation library version are not reused
+    _CALCULATOR_VERSION = metadata.version('geodrillcalc')
+except metadata.PackageNotFoundError:
+    _CALCULATOR_VERSION = 'unknown'
+
+_stats_lock = threading.Lock()
+_calculation_cache_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'oversize': 0, 'errors': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _calculation_cache_stats[name] += 1
+
+
+def get_calculation_cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_calculation_cache_stats)
+
+
+def canonicalize(value):
+    """
+    normalises calculation inputs so that equal inputs serialise identically:
+    numbers become floats rounded to CALCULATION_CACHE_FLOAT_DIGITS significant
+    digits (so 10, 10.0 and 10.000000000001 match), tuples become lists
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if math.isnan(number) or math.isinf(number):
+        return repr(number)
+    # + 0.0 folds -0.0 into 0.0
+    return float(f'{number:.{CALCULATION_CACHE_FLOAT_DIGITS}g}') + 0.0
+
+
+def calculation_cache_key(is_production_pump, depth_data, initial_input_values) -> str:
+    canonical = json.dumps([_CALCULATOR_VERSION,
+                            bool(is_production_pump),
+                            canonicalize(depth_data),
+                            canonicalize(initial_input_values)],
+                           sort_keys=True, separators=(',', ':'))
+    return CALCULATION_KEY_PREFIX + sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _decode(key, cached_data):
+    if cached_data is None:
+        _count('misses')
+        return None
+    _count('hits')
+    logger.info("Calculation cache hit for key: %s", key)
+    return cached_data
+
+
+def _encode(key, payload: bytes | str):
+    data = payload.encode('utf-8') if isinstance(payload, str) else payload
+    if len(data) > CALCULATION_CACHE_MAX_BYTES:
+        _count('oversize')
+        logger.warning("Not caching calculation %s: %d bytes exceeds CALCULATION_CACHE_MAX_BYTES",
+                       key, len(data))
+        return None
+    return data
+
+
+def get_calculation_result(key) -> bytes | None:
+    """
+    returns the results stored for key (see unpack_results), or None
+    """
+    if not CALCULATION_CACHE_ENABLED:
+        return None
+    try:
+        return _decode(key, redis_client.get(key))
+    except redis.RedisError as e:
+        # the calculation can always be run, so an unavailable cache is a miss
+        _count('errors')
+        logger.warning("Calculation cache read failed for %s: %s", key, e)
+        return None
+
+
+def get_calculation_results(keys) -> list:
+    """
+    get_calculation_result for many keys in one round trip
+    """
+    if not CALCULATION_CACHE_ENABLED or not keys:
+        return [None] * len(keys)
+    try:
+        cached = redis_client.mget(keys)
+    except redis.RedisError as e:
+        _count('errors')
+        logger.warning("Calculation cache read failed for %d keys: %s", len(keys), e)
+        return [None] * len(keys)
+    return [_decode(key, cached_data) for key, cached_data in zip(keys, cached)]
+
+
+def set_calculation_result(key, payload: bytes | str, timeout=CALCULATION_CACHE_TTL):
+    if not CALCULATION_CACHE_ENABLED:
+        return
+    data = _encode(key, payload)
+    if data is None:
+        return
+    try:
+        redis_client.setex(key, timeout, data)
+        _count('stores')
+    except redis.RedisError as e:
+        _count('errors')
+        logger.warning("Calculation cache write failed for %s: %s", key, e)
+
+
+async def aget_calculation_result(key) -> bytes | None:
+    if not CALCULATION_CACHE_ENABLED:
+        return None
+    try:
+        return _decode(key, await get_async_redis_client().get(key))
+    except redis.RedisError as e:
+        _count('errors')
+        logger.warning("Calculation cache read failed for %s: %s", key, e)
+        return None
+
+
+async def aset_calculation_result(key, payload: bytes | str, timeout=CALCULATION_CACHE_TTL):
+    if not CALCULATION_CACHE_ENABLED:
+        return
+    data = _encode(key, payload)
+    if data is None:
+        return
+    try:
+        await get_async_redis_client().setex(key, timeout, data)
+        _count('stores')
+    except redis.RedisError as e:
+        _count('errors')
+        logger.warning("Calculation cache write failed for %s: %s", key, e)
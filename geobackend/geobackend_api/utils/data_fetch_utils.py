@@ -1,15 +1,28 @@
 import time
+import asyncio
+import weakref
+from functools import lru_cache
 from pyproj import Transformer
 import numpy as np
 import requests
+import httpx
 import urllib
 import re
-from bs4 import BeautifulSoup
+from django.conf import settings
 
 
 import logging
 
-from .cache_utils import generate_cache_key, get_cache, set_cache
+from .cache_utils import (generate_cache_key, get_cache, set_cache, aget_cache, aset_cache,
+                          peek_cache, acquire_lock, release_lock, is_locked,
+                          apeek_cache, aacquire_lock, arelease_lock, ais_locked)
+from .single_flight import SingleFlight, AsyncSingleFlight
+from .wms_parsers import get_parser_backend
+from .precomputed_store import lookup_precomputed
+from .watertable_raster import sample_watertable_depth
+from .wms_client import WMSClient, get_wms_client
+from .async_wms_client import AsyncWMSClient, get_async_wms_client
+from .timing import timed
 
 
 # global variables
@@ -92,125 +105,348 @@ num_to_code_mapping = {
 }
 
 
-logging.basicConfig(
-            filename='api_requests.log',
-            level=logging.INFO, 
-            format="%(asctime)s %(levelname)s %(message)s", 
-            datefmt="%Y-%m-%d %H:%M:%S")
+# spatial quantization: snap queried points to the source raster grid (EPSG:3857)
+# so that every point inside one cell produces the same upstream request
+WMS_SPATIAL_QUANTIZATION = getattr(settings, 'WMS_SPATIAL_QUANTIZATION', False)
+WMS_GRID_CELL_SIZE = getattr(settings, 'WMS_GRID_CELL_SIZE', 100)  # metre
+WMS_GRID_ORIGIN = getattr(settings, 'WMS_GRID_ORIGIN', (0.0, 0.0))
+# odd, so that the centre pixel (x, y) covers exactly the snapped cell
+WMS_CANONICAL_PIXELS = getattr(settings, 'WMS_CANONICAL_PIXELS', (101, 101))
+
+# single-flight coalescing of concurrent misses for the same WMS cache key
+WMS_SINGLE_FLIGHT_LOCK_TIMEOUT = getattr(settings, 'WMS_SINGLE_FLIGHT_LOCK_TIMEOUT', 35)  # seconds
+WMS_SINGLE_FLIGHT_WAIT_TIMEOUT = getattr(settings, 'WMS_SINGLE_FLIGHT_WAIT_TIMEOUT', 35)
+WMS_SINGLE_FLIGHT_POLL_INTERVAL = getattr(settings, 'WMS_SINGLE_FLIGHT_POLL_INTERVAL', 0.05)
+_wms_single_flight = SingleFlight()
+_async_single_flights = weakref.WeakKeyDictionary()
+
+# GeoServer WMS endpoint; point it at serve_stub_wms for load tests
+WMS_BASE_URL = getattr(settings, 'WMS_BASE_URL', 'https://geo.cerdi.edu.au/geoserver/vvg/wms')
+
+# HTML parser backend for GetFeatureInfo responses: 'fast' (streaming) or 'bs4'
+WMS_HTML_PARSER = getattr(settings, 'WMS_HTML_PARSER', 'fast')
+html_parser = get_parser_backend(WMS_HTML_PARSER)
+_layer_field_pattern = re.compile(r"(\w+)\s+(\d+)")
+_number_pattern = re.compile(r"(\d+\.?\d*)")
+
 logger = logging.getLogger('geobackend_api')
 
 #exported methods
 def generate_formatted_depth_data(coordinates, 
                                   min_resolution: int | float = 100, 
                                   pixels=(100, 100), 
-                                  crs_type: str = 'wgs84'):
+                                  crs_type: str = 'wgs84',
+                                  bbox_params=None):
     try:
-        bbox_params = get_bbox_params(
-            coordinates, min_resolution, pixels, crs_type)
-        layer_request = request_wms_layers(bbox_params)
-        layers = parse_wms_layers(layer_request)
+        if bbox_params is None:
+            bbox_params = get_bbox_params(
+                coordinates, min_resolution, pixels, crs_type)
+        precomputed = lookup_precomputed(bbox_params)
+        if precomputed is not None:
+            return precomputed.depth_data
+        layers = request_wms_layers(bbox_params)
         layers_as_string = stringify_layers(layers)
-        depth_request = request_wms_aquifer_info(layers_as_string, bbox_params)
-        layer_data = parse_aquifer_info(depth_request)
+        layer_data = request_wms_aquifer_info(layers_as_string, bbox_params)
         formatted_depth_data = format_data_depth_table(layer_data)
         return formatted_depth_data
     except Exception as e:
-        logger.error(f"Error generating formatted depth data: {str(e)}")
+        logger.error("Error generating formatted depth data: %s", e)
         raise Exception(f"Error generating formatted depth data: {str(e)}")
 
 
 def fetch_watertable_depth(coordinates, 
                          min_resolution: int | float = 100, 
                          pixels=(100, 100), 
-                         crs_type: str = 'wgs84') -> float:
+                         crs_type: str = 'wgs84',
+                         bbox_params=None) -> float:
+    try:
+        if bbox_params is None:
+            bbox_params = get_bbox_params(
+                coordinates, min_resolution, pixels, crs_type)
+        precomputed = lookup_precomputed(bbox_params)
+        if precomputed is not None:
+            return precomputed.watertable_depth
+        sampled = sample_watertable_depth(bbox_params)
+        if sampled is not None:
+            return sampled
+        return request_watertable_depth(bbox_params)
+    except Exception as e:
+        logger.error("Error retrieving watertable depth: %s", e)
+        raise Exception(f"Error retrieving watertable depth: {str(e)}")
+
+
+async def agenerate_formatted_depth_data(coordinates,
+                                         min_resolution: int | float = 100,
+                                         pixels=(100, 100),
+                                         crs_type: str = 'wgs84',
+                                         bbox_params=None):
+    """
+    asyncio variant of generate_formatted_depth_data
+    """
     try:
-        bbox_params = get_bbox_params(
-            coordinates, min_resolution, pixels, crs_type)
-        wd_request = request_watertable_depth(bbox_params)
-        return parse_watertable_depth(wd_request)
+        if bbox_params is None:
+            bbox_params = get_bbox_params(
+                coordinates, min_resolution, pixels, crs_type)
+        precomputed = lookup_precomputed(bbox_params)
+        if precomputed is not None:
+            return precomputed.depth_data
+        layers = await arequest_wms_layers(bbox_params)
+        layers_as_string = stringify_layers(layers)
+        layer_data = await arequest_wms_aquifer_info(layers_as_string, bbox_params)
+        formatted_depth_data = format_data_depth_table(layer_data)
+        return formatted_depth_data
     except Exception as e:
-        logger.error(f"Error retrieving watertable depth: {str(e)}")
+        logger.error("Error generating formatted depth data: %s", e)
+        raise Exception(f"Error generating formatted depth data: {str(e)}")
+
+
+async def afetch_watertable_depth(coordinates,
+                                  min_resolution: int | float = 100,
+                                  pixels=(100, 100),
+                                  crs_type: str = 'wgs84',
+                                  bbox_params=None) -> float:
+    """
+    asyncio variant of fetch_watertable_depth
+    """
+    try:
+        if bbox_params is None:
+            bbox_params = get_bbox_params(
+                coordinates, min_resolution, pixels, crs_type)
+        precomputed = lookup_precomputed(bbox_params)
+        if precomputed is not None:
+            return precomputed.watertable_depth
+        sampled = sample_watertable_depth(bbox_params)
+        if sampled is not None:
+            return sampled
+        return await arequest_watertable_depth(bbox_params)
+    except Exception as e:
+        logger.error("Error retrieving watertable depth: %s", e)
         raise Exception(f"Error retrieving watertable depth: {str(e)}")
-    
+
 
 #requests
-def load_or_get_results(url, params):
+def load_or_get_results(url, params, parser, client: WMSClient | None = None):
+    """
+    returns the parsed product of a WMS request, from the cache if present.
+    Only the parsed product is cached, so a hit skips HTML parsing entirely.
+    parser: one of the parse_* functions, applied to the response
+
+    Concurrent misses for the same key are coalesced: within a process,
+    callers wait on one in-flight fetch; across workers, the holder of a
+    short Redis lock fetches while the others poll the cache for its result.
+    """
     cache_key = generate_cache_key(params)
     cached_result = get_cache(cache_key)
 
-    if cached_result:
+    if cached_result is not None:
         return cached_result
 
+    return _wms_single_flight.do(cache_key, _fetch_once_across_workers,
+                                 url, cache_key, parser, client)
+
+
+def _fetch_once_across_workers(url, cache_key, parser, client):
+    token = acquire_lock(cache_key, WMS_SINGLE_FLIGHT_LOCK_TIMEOUT)
+    if token is None:
+        result = _wait_for_other_worker(cache_key)
+        if result is not None:
+            return result
+        # the other worker failed or timed out; fetch it ourselves
+        token = acquire_lock(cache_key, WMS_SINGLE_FLIGHT_LOCK_TIMEOUT)
+    try:
+        # the previous holder may have finished between our cache miss and the lock
+        result = peek_cache(cache_key)
+        if result is not None:
+            return result
+        return _fetch_and_cache(url, cache_key, parser, client)
+    finally:
+        if token is not None:
+            release_lock(cache_key, token)
+
+
+def _wait_for_other_worker(cache_key):
+    deadline = time.monotonic() + WMS_SINGLE_FLIGHT_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WMS_SINGLE_FLIGHT_POLL_INTERVAL)
+        result = peek_cache(cache_key)
+        if result is not None or not is_locked(cache_key):
+            return result
+    logger.warning("Timed out waiting for in-flight WMS request: %s", cache_key)
+    return None
+
+
+def _fetch_and_cache(url, cache_key, parser, client: WMSClient | None = None):
     try:
-        start_time = time.time()
-        logger.info(f'Request started at {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_time))}.{int((start_time % 1) * 1000):03d}, url: {url}')
-       
-        #implement logging here
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'
-        }
-
-        response = requests.get(url, headers=headers)
+        start = time.perf_counter()
+        # pooled keep-alive session, see wms_client
+        client = client or get_wms_client()
+        response = client.get(url)
         response.raise_for_status()
-        
-        end_time = time.time()
-        logger.info(f'Request completed at {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(end_time))}.{int((end_time % 1) * 1000):03d}, url: {url}, status: {response.status_code}, time_taken: {end_time - start_time:.2f} seconds')
-        set_cache(cache_key, response)
-        return response
+        logger.info('WMS request took %.3f s, status: %s, url: %s',
+                    time.perf_counter() - start, response.status_code, url)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('WMS pool stats: %s', client.get_pool_stats())
+        with timed('parse'):
+            result = parser(response)
+        set_cache(cache_key, result)
+        return result
     except requests.exceptions.RequestException as e:
         logger.error(e)
-        return {
-            "status": "error",
-            "error": {
-                "message": str(e)
-            }
-        }
+        raise
+
+
+async def aload_or_get_results(url, params, parser, client: AsyncWMSClient | None = None):
+    """
+    asyncio variant of load_or_get_results
+    """
+    cache_key = generate_cache_key(params)
+    cached_result = await aget_cache(cache_key)
+
+    if cached_result is not None:
+        return cached_result
+
+    return await _get_async_single_flight().do(cache_key, _afetch_once_across_workers,
+                                               url, cache_key, parser, client)
+
+
+async def _afetch_once_across_workers(url, cache_key, parser, client):
+    token = await aacquire_lock(cache_key, WMS_SINGLE_FLIGHT_LOCK_TIMEOUT)
+    if token is None:
+        result = await _await_other_worker(cache_key)
+        if result is not None:
+            return result
+        token = await aacquire_lock(cache_key, WMS_SINGLE_FLIGHT_LOCK_TIMEOUT)
+    try:
+        result = await apeek_cache(cache_key)
+        if result is not None:
+            return result
+        return await _afetch_and_cache(url, cache_key, parser, client)
+    finally:
+        if token is not None:
+            await arelease_lock(cache_key, token)
+
+
+async def _await_other_worker(cache_key):
+    deadline = time.monotonic() + WMS_SINGLE_FLIGHT_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(WMS_SINGLE_FLIGHT_POLL_INTERVAL)
+        result = await apeek_cache(cache_key)
+        if result is not None or not await ais_locked(cache_key):
+            return result
+    logger.warning("Timed out waiting for in-flight WMS request: %s", cache_key)
+    return None
+
+
+async def _afetch_and_cache(url, cache_key, parser, client: AsyncWMSClient | None = None):
+    try:
+        start = time.perf_counter()
+        client = client or get_async_wms_client()
+        response = await client.get(url)
+        response.raise_for_status()
+        logger.info('WMS request took %.3f s, status: %s, url: %s',
+                    time.perf_counter() - start, response.status_code, url)
+        with timed('parse'):
+            result = parser(response)
+        await aset_cache(cache_key, result)
+        return result
+    except httpx.HTTPError as e:
+        logger.error(e)
+        raise
+
+
+def _get_async_single_flight() -> AsyncSingleFlight:
+    loop = asyncio.get_running_loop()
+    flight = _async_single_flights.get(loop)
+    if flight is None:
+        flight = _async_single_flights[loop] = AsyncSingleFlight()
+    return flight
 
 
 def _request_wms(request_type: str, **request_params):
     """
     abstracted WMS request method
     request_type: 'layers', 'aquifer_info', 'watertable_depth'
+    returns the parsed product for the request type, see wms_response_parsers
     """
     params = generate_wms_request_params(**request_params,
                                          **wms_request_dict[request_type])
     url = generate_wms_request_url(params)
-    return load_or_get_results(url, params)
+    # the stage covers cache lookups and waits on other requests as well as the WMS call
+    with timed(f'wms_{request_type}'):
+        return load_or_get_results(url, params, wms_response_parsers[request_type],
+                                   client=get_wms_client())
 
 
+def request_wms_uncached(request_type: str, **request_params):
+    """
+    _request_wms without the cache, its single-flight locks or the timing
+    stages, for bulk jobs such as precompute_aquifer_grid that visit every
+    location once and would only evict the entries serving requests
+    """
+    params = generate_wms_request_params(**request_params,
+                                         **wms_request_dict[request_type])
+    response = get_wms_client().get(generate_wms_request_url(params))
+    response.raise_for_status()
+    return wms_response_parsers[request_type](response)
 
-def request_wms_layers(bbox_params):
+
+def request_wms_layers(bbox_params) -> list:
     """
     bbox_params: bbox, width, height, x, y in order
+    returns the sorted layer codes, see parse_wms_layers
     """
     return _request_wms('layers', bbox_params=bbox_params)
 
 
 
-def request_wms_aquifer_info(layer_string: str, bbox_params) -> requests.Response:
+def request_wms_aquifer_info(layer_string: str, bbox_params) -> dict:
     """
     layer_string: stringified representation of the requested layers
     bbox_params: same params as wms_layer_request
+    returns layer code -> field values, see parse_aquifer_info
     """
     return _request_wms('aquifer_info', layers=layer_string, query_layers=layer_string, bbox_params=bbox_params)
 
 
 
-def request_watertable_depth(bbox_params):
+def request_watertable_depth(bbox_params) -> float:
     return _request_wms('watertable_depth', bbox_params=bbox_params)
 
 
+async def _arequest_wms(request_type: str, **request_params):
+    """
+    asyncio variant of _request_wms
+    """
+    params = generate_wms_request_params(**request_params,
+                                         **wms_request_dict[request_type])
+    url = generate_wms_request_url(params)
+    with timed(f'wms_{request_type}'):
+        return await aload_or_get_results(url, params, wms_response_parsers[request_type],
+                                          client=get_async_wms_client())
+
+
+async def arequest_wms_layers(bbox_params) -> list:
+    return await _arequest_wms('layers', bbox_params=bbox_params)
+
+
+async def arequest_wms_aquifer_info(layer_string: str, bbox_params) -> dict:
+    return await _arequest_wms('aquifer_info', layers=layer_string, query_layers=layer_string, bbox_params=bbox_params)
+
+
+async def arequest_watertable_depth(bbox_params) -> float:
+    return await _arequest_wms('watertable_depth', bbox_params=bbox_params)
+
+
 #parsing the request response
 def parse_wms_layers(response: requests.Response) -> list:
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        layers = sorted([code.text.lower()
-                        for code in soup.find_all('div', class_='aquifer-id')])
+        layers = sorted([code.lower()
+                        for code in html_parser.aquifer_ids(response.text)])
         layers += ['114bse']  # basement layer at the bottom
         return layers
     else:
         logger.error(
-            f"Error in parse_wms_layers: {response.status_code}, {response.text}")
+            "Error in parse_wms_layers: %s, %s", response.status_code, response.text)
         raise requests.exceptions.HTTPError(
             f"Error: {response.status_code}, {response.text}")
 
@@ -218,54 +454,44 @@ def parse_wms_layers(response: requests.Response) -> list:
 def parse_aquifer_info(response: requests.Response) -> dict:
     if response.status_code != 200:
         logger.error(
-            f"Error in parse_layer_info: {response.status_code}, {response.text}")
+            "Error in parse_layer_info: %s, %s", response.status_code, response.text)
         raise requests.exceptions.HTTPError(
             f"Error: {response.status_code}, {response.text}")
 
     data = {}
-    soup = BeautifulSoup(response.text, 'html.parser')
-    rows = soup.find_all('div', class_='row')
-
-    for row in rows:
-        cols = row.find_all('div')
-        if len(cols) == 2:
-            key = cols[0].text.strip()
-            value = cols[1].text.strip()
-
-            match = re.match(r"(\w+)\s+(\d+)", key)
-            if match:
-                field, num_part = match.groups()
-                if num_part in num_to_code_mapping:
-                    layer_code = num_to_code_mapping[num_part]
-                    if layer_code not in data:
-                        data[layer_code] = {}
-                    try:
-                        # Handle the -9999 value
-                        float_value = float(value.replace(',', ''))
-                        if float_value == -9999:
-                            logger.info(
-                                f"Aqdepth for {layer_code} is -9999, treating as 0")
-                            float_value = 0
-                        data[layer_code][field] = float_value
-                    except ValueError:
-                        logger.error(
-                            f"Could not convert {value} to float for {key}")
+    for key, value in html_parser.rows(response.text):
+        match = _layer_field_pattern.match(key)
+        if match:
+            field, num_part = match.groups()
+            if num_part in num_to_code_mapping:
+                layer_code = num_to_code_mapping[num_part]
+                if layer_code not in data:
+                    data[layer_code] = {}
+                try:
+                    # Handle the -9999 value
+                    float_value = float(value.replace(',', ''))
+                    if float_value == -9999:
+                        logger.info("Aqdepth for %s is -9999, treating as 0", layer_code)
+                        float_value = 0
+                    data[layer_code][field] = float_value
+                except ValueError:
+                    logger.error(
+                        "Could not convert %s to float for %s", value, key)
     return data
 
 
 def parse_watertable_depth(response: requests.Response) -> float:
     if response.status_code != 200:
         logger.error(
-            f"Error in parse_layer_info: {response.status_code}, {response.text}")
+            "Error in parse_layer_info: %s, %s", response.status_code, response.text)
         raise requests.exceptions.HTTPError(
             f"Error: {response.status_code}, {response.text}")
     try:
+        depth_text = html_parser.watertable_text(response.text)
+        if depth_text is None:
+            raise AttributeError("Depth to watertable cell not found")
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        depth_row = soup.find('td', string='Depth to watertable').find_next('td')
-    
-
-        match = re.search(r"(\d+\.?\d*)", depth_row.text)
+        match = _number_pattern.search(depth_text)
         return float(match.group())
     except AttributeError as e:
         logger.error("AttributeError: Depth value not available")
@@ -274,12 +500,30 @@ def parse_watertable_depth(response: requests.Response) -> float:
         logger.error("ValueError: No numeric value found")
         raise ValueError("Error: No numeric value found") from e
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         raise Exception("An unexpected error occurred") from e
 
 
+# parsed products are what gets cached, keyed by request type
+wms_response_parsers = {
+    'layers': parse_wms_layers,
+    'aquifer_info': parse_aquifer_info,
+    'watertable_depth': parse_watertable_depth,
+}
+
+
 #formatters and helpers
 
+@lru_cache(maxsize=32)
+def get_transformer(source_crs: str, target_crs: str = 'epsg:3857') -> Transformer:
+    """
+    returns a cached Transformer for the (source, target) CRS pair.
+    Building one requires a PROJ database lookup, so they are created
+    once per process and reused; pyproj transformers are thread-safe.
+    """
+    return Transformer.from_crs(source_crs, target_crs)
+
+
 def get_bbox_params(coordinates, min_resolution: int | float = 100, pixels=(100, 100), crs_type: str = 'wgs84'):
     """
     transforms provided coordinates into web mercator coordinate system
@@ -292,11 +536,55 @@ def get_bbox_params(coordinates, min_resolution: int | float = 100, pixels=(100,
     output: 
     f'{bbox_xy}'.strip('()')
     """
-    x, y = Transformer.from_crs(crs_type, 'epsg:3857').transform(
+    x, y = get_transformer(crs_type, 'epsg:3857').transform(
         *coordinates)  # EPSG:3857 for mercator
+    if WMS_SPATIAL_QUANTIZATION:
+        x, y = snap_to_grid(x, y)
+        min_resolution, pixels = WMS_GRID_CELL_SIZE, WMS_CANONICAL_PIXELS
+    return _format_bbox(x, y, min_resolution, pixels), *_get_bbox_pixel_params(pixels)
+
+
+def snap_to_grid(x, y, cell_size: int | float = WMS_GRID_CELL_SIZE, origin=WMS_GRID_ORIGIN):
+    """
+    returns the centre of the grid cell containing (x, y)
+    x, y: EPSG:3857 scalars or arrays
+    """
+    col = np.floor((np.asarray(x) - origin[0]) / cell_size)
+    row = np.floor((np.asarray(y) - origin[1]) / cell_size)
+    return origin[0] + (col + 0.5) * cell_size, origin[1] + (row + 0.5) * cell_size
+
+
+def transform_coordinates(coordinates, crs_type: str = 'wgs84', target_crs: str = 'epsg:3857') -> np.ndarray:
+    """
+    vectorised coordinate transform for bulk callers
+
+    inputs: coordinates: array-like of shape (n, 2), in the axis order of crs_type
+    output: ndarray of shape (n, 2) in target_crs
+    """
+    coords = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    xs, ys = get_transformer(crs_type, target_crs).transform(
+        coords[:, 0], coords[:, 1])
+    return np.column_stack((xs, ys))
+
+
+def get_bbox_params_bulk(coordinates, min_resolution: int | float = 100, pixels=(100, 100), crs_type: str = 'wgs84') -> list:
+    """
+    get_bbox_params for many coordinates, transformed in a single call
+    returns a list of bbox params in the order of the input
+    """
+    points = transform_coordinates(coordinates, crs_type)
+    if WMS_SPATIAL_QUANTIZATION:
+        points = np.column_stack(snap_to_grid(points[:, 0], points[:, 1]))
+        min_resolution, pixels = WMS_GRID_CELL_SIZE, WMS_CANONICAL_PIXELS
+    pixel_params = _get_bbox_pixel_params(pixels)
+    return [(_format_bbox(x, y, min_resolution, pixels), *pixel_params)
+            for x, y in points]
+
+
+def _format_bbox(x, y, min_resolution, pixels) -> str:
     incre = np.array(pixels) * min_resolution / 2
-    bbox_xy = x-incre[0], y-incre[1], x+incre[0], y+incre[1]
-    return f'{bbox_xy}'.strip('()'), *_get_bbox_pixel_params(pixels)
+    bbox_xy = tuple(float(v) for v in (x-incre[0], y-incre[1], x+incre[0], y+incre[1]))
+    return f'{bbox_xy}'.strip('()')
 
 
 def _get_bbox_pixel_params(pixels):
@@ -334,8 +622,8 @@ def generate_wms_request_params(bbox_params,
     return params
 
 
-def generate_wms_request_url(params,
-                             base_url="https://geo.cerdi.edu.au/geoserver/vvg/wms"):
+def generate_wms_request_url(params, base_url=None):
+    base_url = base_url or WMS_BASE_URL
     return f"{base_url}?{urllib.parse.urlencode(params)}"
 
 
@@ -360,7 +648,7 @@ def format_data_depth_table(layer_data: list) -> dict:
             'Thickness', 0)  # basement thickness fixed at 200
         depth = aquidepth + thickness
         if key != '100qa' and (depth == 0 or thickness == 0):
-            logger.warning(f"Filtered layer {key}: depth_to_base={depth}, thickness={thickness}")
+            logger.warning("Filtered layer %s: depth_to_base=%s, thickness=%s", key, depth, thickness)
             continue
         layer_dict['aquifer_layer'].append(key)
         layer_dict['is_aquifer'].append(is_aquifer[key])
@@ -0,0 +1,79 @@
+import copy
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class InterfacePool:
+    """
+    Pool of pre-built objects that are expensive to construct.
+
+    Each object is checked out by one caller at a time and reset before it
+    is handed out again: with its own reset() method when it has one,
+    otherwise by restoring a deep copy of the attributes it had right after
+    construction. Objects whose use raised are discarded rather than reset,
+    and objects that cannot be snapshotted are not pooled.
+    """
+
+    def __init__(self, factory, max_size: int = 4):
+        self.factory = factory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._idle = []  # (instance, pristine attributes)
+        self.created = 0
+        self.reused = 0
+
+    def _create(self):
+        instance = self.factory()
+        with self._lock:
+            self.created += 1
+        if self.max_size <= 0:
+            return instance, False
+        if hasattr(instance, 'reset'):
+            return instance, None
+        try:
+            return instance, copy.deepcopy(vars(instance))
+        except Exception as e:
+            logger.warning("%s cannot be snapshotted, not pooling it: %s", type(instance).__name__, e)
+            return instance, False
+
+    def warm(self, count: int | None = None):
+        """
+        builds instances up front, so the first requests do not pay for them
+        """
+        for _ in range(self.max_size if count is None else count):
+            entry = self._create()
+            with self._lock:
+                if entry[1] is False or len(self._idle) >= self.max_size:
+                    return
+                self._idle.append(entry)
+
+    @contextmanager
+    def checkout(self):
+        with self._lock:
+            entry = self._idle.pop() if self._idle else None
+            if entry is not None:
+                self.reused += 1
+        if entry is None:
+            entry = self._create()
+
+        instance, pristine = entry
+        yield instance
+
+        # only reached when the caller did not raise; a failed instance is dropped
+        if pristine is False:
+            return
+        if pristine is None:
+            instance.reset()
+        else:
+            vars(instance).clear()
+            vars(instance).update(copy.deepcopy(pristine))
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'idle': len(self._idle), 'created': self.created, 'reused': self.reused}
@@ -0,0 +1,100 @@
+import atexit
+import queue
+import random
+import logging
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+# fraction of requests whose payload is logged, and the characters kept of it
+LOG_PAYLOAD_SAMPLE_RATE = getattr(settings, 'LOG_PAYLOAD_SAMPLE_RATE', 0.01)
+LOG_PAYLOAD_MAX_CHARS = getattr(settings, 'LOG_PAYLOAD_MAX_CHARS', 500)
+
+_queue_handlers = weakref.WeakSet()
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Puts records on a bounded in-memory queue; a background QueueListener
+    hands them to the wrapped handlers, so file and console writes never
+    run on the request thread. Records arriving while the queue is full
+    are dropped rather than blocking. The queue is drained at exit.
+
+    Configured in LOGGING with the wrapped handlers as cfg:// references:
+        'queue': {'()': 'geobackend_api.utils.logging_utils.QueueListenerHandler',
+                  'handlers': ['cfg://handlers.console', 'cfg://handlers.file']}
+    (dictConfig sets handlers up in name order, so they must sort before this one)
+    """
+
+    def __init__(self, handlers, queue_size: int = 10000, respect_handler_level: bool = True):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        # dictConfig resolves cfg:// references on item access, not on iteration
+        handlers = [handlers[index] for index in range(len(handlers))]
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=respect_handler_level)
+        self.listener.start()
+        atexit.register(self.stop)
+        _queue_handlers.add(self)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """
+        writes out the queued records and stops the listener thread
+        """
+        thread = self.listener._thread
+        if thread is None:
+            return
+        # QueueListener.stop() enqueues its sentinel without waiting, which fails on a full queue
+        try:
+            self.queue.put(self.listener._sentinel, timeout=5)
+        except queue.Full:
+            return
+        thread.join()
+        self.listener._thread = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def get_log_queue_stats() -> dict:
+    """
+    records waiting for the writer thread and records dropped, over all queue handlers
+    """
+    handlers = list(_queue_handlers)
+    return {
+        'pending': sum(handler.queue.qsize() for handler in handlers),
+        'dropped': sum(handler.dropped for handler in handlers),
+    }
+
+
+class Truncated:
+    """
+    log argument rendered as str(value) cut to max_chars, only when the
+    record is actually emitted:
+        logger.info("Received data: %s", Truncated(data))
+    """
+    __slots__ = ('value', 'max_chars')
+
+    def __init__(self, value, max_chars: int = LOG_PAYLOAD_MAX_CHARS):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self):
+        text = str(self.value)
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... ({len(text)} chars)"
+
+
+def sample_payload(rate: float = LOG_PAYLOAD_SAMPLE_RATE) -> bool:
+    """
+    True for roughly rate of the calls; decides whether a request's payload is logged
+    """
+    return rate >= 1 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,111 @@
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+# Prometheus metrics served at /metrics; needs prometheus_client
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True) and prometheus_client is not None
+# clients allowed to scrape /metrics, empty denies every client
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+
+# request stages are mostly milliseconds; WMS calls and calculations can take seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+if METRICS_ENABLED:
+    registry = prometheus_client.CollectorRegistry()
+    request_seconds = prometheus_client.Histogram(
+        'geobackend_request_seconds', 'Request latency',
+        ['route', 'method', 'status'], buckets=LATENCY_BUCKETS, registry=registry)
+    stage_seconds = prometheus_client.Histogram(
+        'geobackend_stage_seconds', 'Latency of request stages, see utils.timing',
+        ['stage'], buckets=LATENCY_BUCKETS, registry=registry)
+else:
+    registry = request_seconds = stage_seconds = None
+
+
+def observe_request(route, method, status, seconds):
+    if METRICS_ENABLED:
+        request_seconds.labels(route, method, status).observe(seconds)
+
+
+def observe_stage(stage, seconds):
+    if METRICS_ENABLED:
+        stage_seconds.labels(stage).observe(seconds)
+
+
+class StatsCollector:
+    """
+    Reports the counters the cache, pool and writer modules keep anyway,
+    read at scrape time so requests pay nothing for them.
+    """
+
+    def collect(self):
+        # imported here, the services import this module through utils.timing
+        from .cache_utils import get_cache_stats
+        from .calculation_cache import get_calculation_cache_stats
+        from .logging_utils import get_log_queue_stats
+        from .wms_client import get_pool_stats
+        from ..services.calculation_service import get_calculation_stats, get_interface_pool_stats
+        from ..services.result_service import get_result_writer_stats
+
+        cache = CounterMetricFamily('geobackend_wms_cache', 'WMS response cache lookups',
+                                    labels=['tier', 'result'])
+        for tier, counts in get_cache_stats().items():
+            cache.add_metric([tier, 'hit'], counts['hits'])
+            cache.add_metric([tier, 'miss'], counts['misses'])
+        yield cache
+
+        calculation_cache = CounterMetricFamily('geobackend_calculation_cache', 'Calculation cache events',
+                                                labels=['event'])
+        for event, count in get_calculation_cache_stats().items():
+            calculation_cache.add_metric([event], count)
+        yield calculation_cache
+
+        wms_pool = CounterMetricFamily('geobackend_wms_connections', 'WMS connection pool usage',
+                                       labels=['host', 'kind'])
+        for host, counts in get_pool_stats().items():
+            for kind, count in counts.items():
+                wms_pool.add_metric([host, kind], count)
+        yield wms_pool
+
+        calculations = GaugeMetricFamily('geobackend_calculations', 'Calculations holding a slot; overdue '
+                                         'ones timed out for their caller but are still running',
+                                         labels=['kind'])
+        for kind, count in get_calculation_stats().items():
+            calculations.add_metric([kind], count)
+        yield calculations
+
+        interface_pool = GaugeMetricFamily('geobackend_interface_pool', 'Calculation interface pool',
+                                           labels=['kind'])
+        for kind, count in get_interface_pool_stats().items():
+            interface_pool.add_metric([kind], count)
+        yield interface_pool
+
+        writer = GaugeMetricFamily('geobackend_result_writer', 'Result writer queue',
+                                   labels=['kind'])
+        for kind, count in get_result_writer_stats().items():
+            writer.add_metric([kind], count)
+        yield writer
+
+        log_queue = get_log_queue_stats()
+        yield CounterMetricFamily('geobackend_log_records_dropped', 'Log records dropped while the log queue was full',
+                                  value=log_queue['dropped'])
+        yield GaugeMetricFamily('geobackend_log_queue_pending', 'Log records waiting to be written',
+                                value=log_queue['pending'])
+
+
+if METRICS_ENABLED:
+    registry.register(StatsCollector())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    returns the Prometheus text exposition of this process' metrics and its content type
+    """
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,174 @@
+import json
+import math
+import sqlite3
+import threading
+import logging
+from collections import namedtuple
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_FIRST = getattr(settings, 'PRECOMPUTED_FIRST', False)
+PRECOMPUTED_STORE_PATH = getattr(settings, 'PRECOMPUTED_STORE_PATH', None)
+
+STORE_FORMAT_VERSION = '1'
+STATUS_OK = 1
+STATUS_NO_DATA = 0  # swept, but the WMS has no aquifer data for the cell
+
+PrecomputedCell = namedtuple('PrecomputedCell', ['depth_data', 'watertable_depth'])
+# a swept cell without aquifer data
+NO_DATA_CELL = PrecomputedCell(None, None)
+
+
+class PrecomputedNoDataError(ValueError):
+    """
+    raised for a location the sweep found no aquifer data for, instead of asking the WMS again
+    """
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    col INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    depth_data TEXT,
+    watertable_depth REAL,
+    PRIMARY KEY (col, row)
+) WITHOUT ROWID;
+"""
+
+
+class PrecomputedAquiferStore:
+    """
+    Local store of formatted depth tables and watertable depths on a
+    regular EPSG:3857 grid.
+
+    The grid is its own spatial index: a point maps to (col, row) with
+    one division, and cells are clustered on that primary key, so a
+    lookup is a single B-tree probe. Connections are kept per thread.
+    """
+
+    def __init__(self, path, readonly: bool = True):
+        self.path = Path(path)
+        self.readonly = readonly
+        self._local = threading.local()
+        meta = dict(self._connection().execute('SELECT key, value FROM meta').fetchall()) \
+            if readonly else {}
+        self.origin = (float(meta.get('origin_x', 0)), float(meta.get('origin_y', 0)))
+        self.cell_size = float(meta.get('cell_size', 0)) or None
+
+    @classmethod
+    def create(cls, path, cell_size: float, origin=(0.0, 0.0)):
+        """
+        opens path for writing, creating the store if needed;
+        an existing store must use the same grid
+        """
+        store = cls(path, readonly=False)
+        connection = store._connection()
+        connection.executescript(_SCHEMA)
+        meta = dict(connection.execute('SELECT key, value FROM meta').fetchall())
+        grid = {'version': STORE_FORMAT_VERSION, 'cell_size': repr(float(cell_size)),
+                'origin_x': repr(float(origin[0])), 'origin_y': repr(float(origin[1]))}
+        if meta and any(meta.get(key) != value for key, value in grid.items()):
+            raise ValueError(f"{path} was built for a different grid: {meta}")
+        connection.executemany('INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)', grid.items())
+        connection.commit()
+        store.origin = (float(origin[0]), float(origin[1]))
+        store.cell_size = float(cell_size)
+        return store
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self.readonly:
+                connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            else:
+                connection = sqlite3.connect(self.path)
+            self._local.connection = connection
+        return connection
+
+    def cell_index(self, x, y) -> tuple[int, int]:
+        return (math.floor((x - self.origin[0]) / self.cell_size),
+                math.floor((y - self.origin[1]) / self.cell_size))
+
+    def cell_centre(self, col, row) -> tuple[float, float]:
+        return (self.origin[0] + (col + 0.5) * self.cell_size,
+                self.origin[1] + (row + 0.5) * self.cell_size)
+
+    def lookup(self, x, y) -> PrecomputedCell | None:
+        """
+        x, y: EPSG:3857
+        returns the cell containing the point, NO_DATA_CELL for a cell swept
+        without aquifer data, or None outside coverage
+        """
+        row = self._connection().execute(
+            'SELECT status, depth_data, watertable_depth FROM cells WHERE col = ? AND row = ?',
+            self.cell_index(x, y)).fetchone()
+        if row is None:
+            return None
+        status, depth_data, watertable_depth = row
+        if status != STATUS_OK:
+            return NO_DATA_CELL
+        return PrecomputedCell(json.loads(depth_data), watertable_depth)
+
+    def has_cell(self, col, row) -> bool:
+        return self._connection().execute(
+            'SELECT 1 FROM cells WHERE col = ? AND row = ?', (col, row)).fetchone() is not None
+
+    def put(self, col, row, depth_data=None, watertable_depth=None, status=STATUS_OK):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cells (col, row, status, depth_data, watertable_depth) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (col, row, status,
+             json.dumps(depth_data, separators=(',', ':')) if depth_data is not None else None,
+             watertable_depth))
+
+    def commit(self):
+        self._connection().commit()
+
+    def count(self) -> dict:
+        return dict(self._connection().execute(
+            'SELECT status, COUNT(*) FROM cells GROUP BY status').fetchall())
+
+
+_store = None
+_store_lock = threading.Lock()
+_store_checked = False
+
+
+def get_precomputed_store() -> PrecomputedAquiferStore | None:
+    """
+    returns the configured store when precomputed-first mode is on and
+    the store file exists, otherwise None
+    """
+    global _store, _store_checked
+    if not PRECOMPUTED_FIRST or _store_checked:
+        return _store
+    with _store_lock:
+        if not _store_checked:
+            if PRECOMPUTED_STORE_PATH and Path(PRECOMPUTED_STORE_PATH).exists():
+                _store = PrecomputedAquiferStore(PRECOMPUTED_STORE_PATH)
+                logger.info("Serving precomputed aquifer data from %s", PRECOMPUTED_STORE_PATH)
+            else:
+                logger.warning("PRECOMPUTED_FIRST is set but %s does not exist", PRECOMPUTED_STORE_PATH)
+            _store_checked = True
+    return _store
+
+
+def lookup_precomputed(bbox_params) -> PrecomputedCell | None:
+    """
+    looks up the centre of a WMS bbox in the precomputed store
+    returns None outside coverage; raises PrecomputedNoDataError for a cell swept without data
+    """
+    store = get_precomputed_store()
+    if store is None:
+        return None
+    minx, miny, maxx, maxy = (float(v) for v in bbox_params[0].split(','))
+    cell = store.lookup((minx + maxx) / 2, (miny + maxy) / 2)
+    if cell is NO_DATA_CELL:
+        raise PrecomputedNoDataError("No aquifer data at this location")
+    return cell
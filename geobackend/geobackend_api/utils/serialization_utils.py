@@ -1,8 +1,11 @@
 from django.core.serializers.json import DjangoJSONEncoder
 
 import numpy as np
+import orjson
 import pandas as pd
 
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
 
 class GeoDjangoJSONEncoder(DjangoJSONEncoder):
     """
@@ -15,9 +18,78 @@ class GeoDjangoJSONEncoder(DjangoJSONEncoder):
         elif isinstance(obj, np.ndarray):
             return obj.tolist()
         elif isinstance(obj, np.generic):
-            return np.asscalar(obj)
+            return obj.item()
         return super().default(obj)
 
 
+_django_encoder = DjangoJSONEncoder()
+
+
+def orjson_default(obj):
+    """
+    types orjson does not serialise natively; mirrors GeoDjangoJSONEncoder
+    """
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict(orient='records')
+    elif isinstance(obj, pd.Series):
+        return obj.tolist()
+    elif isinstance(obj, np.ndarray):
+        # non-contiguous or object arrays, which OPT_SERIALIZE_NUMPY rejects
+        return obj.tolist()
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    # Decimal, timedelta, lazy translation strings, ...
+    return _django_encoder.default(obj)
+
+
+def dumps_json(value) -> bytes:
+    """
+    serialises value to JSON bytes with orjson, in one native pass
+    """
+    return orjson.dumps(value, default=orjson_default, option=ORJSON_OPTIONS)
+
+
+def loads_json(data):
+    return orjson.loads(data)
 
 
+def encode_results(results: dict) -> tuple[dict, bytes]:
+    """
+    encodes calculation results once
+    returns ({key: orjson.Fragment}, JSON bytes of the whole results); the
+    fragments embed the already encoded values in a response body as is
+    """
+    fragments, json_results, _ = pack_results(results)
+    return fragments, json_results
+
+
+def pack_results(results: dict) -> tuple[dict, bytes, bytes]:
+    """
+    encode_results, plus the form kept in the calculation cache: the JSON
+    prefixed with a line listing each key and the length of its encoded
+    value, so unpack_results can slice the fragments back out without
+    decoding anything
+    """
+    values = {key: dumps_json(value) for key, value in results.items()}
+    fragments = {key: orjson.Fragment(value) for key, value in values.items()}
+    json_results = orjson.dumps(fragments)
+    index = orjson.dumps([[key, len(value)] for key, value in values.items()])
+    return fragments, json_results, index + b'\n' + json_results
+
+
+def unpack_results(data: bytes) -> tuple[dict, bytes]:
+    """
+    inverse of pack_results: returns ({key: orjson.Fragment}, JSON bytes).
+    Plain JSON (without the index line) is decoded and re-encoded instead
+    """
+    if data[:1] != b'[':
+        return encode_results(loads_json(data))
+    index, json_results = data.split(b'\n', 1)
+    fragments = {}
+    # json_results is {"key":value,...} as written by orjson.dumps(fragments)
+    position = 1
+    for key, length in orjson.loads(index):
+        position += len(orjson.dumps(key)) + 1
+        fragments[key] = orjson.Fragment(json_results[position:position + length])
+        position += length + 1
+    return fragments, json_results
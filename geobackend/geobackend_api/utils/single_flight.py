@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs fn,
+    later callers block until it finishes and receive the same result
+    (or the same exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            logger.debug("Joining in-flight call for key: %s", key)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio variant of SingleFlight; instances must only be used
+    from the event loop they were created on
+    """
+
+    def __init__(self):
+        self._futures = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._futures.get(key)
+        if future is not None:
+            logger.debug("Joining in-flight call for key: %s", key)
+            try:
+                # shield, so a cancelled waiter does not cancel the shared call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    # the leading call was cancelled rather than this waiter: take over
+                    return await self.do(key, fn, *args, **kwargs)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # mark retrieved so a flight without waiters does not log a warning
+                future.exception()
+            raise
+        finally:
+            del self._futures[key]
@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+import logging
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+from .data_fetch_utils import wms_request_dict
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TYPES = ('layers', 'aquifer_info', 'watertable_depth')
+
+
+def classify_request(params: dict) -> str | None:
+    """
+    params: query parameters of a GetFeatureInfo request, single values
+    returns the request type (see wms_request_dict) or None for anything else
+    """
+    if params.get('request', '').lower() != 'getfeatureinfo':
+        return None
+    query_layers = params.get('query_layers', '')
+    for request_type in ('layers', 'watertable_depth'):
+        if query_layers == wms_request_dict[request_type]['query_layers']:
+            return request_type
+    # aquifer info queries the layers found by the layers request
+    return 'aquifer_info' if query_layers else None
+
+
+def load_responses(fixture_dir) -> dict:
+    """
+    reads <site>.<request_type>.html files into {request_type: {site: html bytes}}
+    only sites with a response for every request type are kept
+    """
+    responses = {request_type: {} for request_type in REQUEST_TYPES}
+    for path in sorted(Path(fixture_dir).glob('*.html')):
+        site, request_type = path.name.split('.')[:2]
+        if request_type in responses:
+            responses[request_type][site] = path.read_bytes()
+    sites = set.intersection(*(set(by_site) for by_site in responses.values()))
+    if not sites:
+        raise ValueError(f"No complete set of {', '.join(REQUEST_TYPES)} responses in {fixture_dir}")
+    return {request_type: {site: by_site[site] for site in sorted(sites)}
+            for request_type, by_site in responses.items()}
+
+
+class StubWMSServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the GeoServer WMS, for load tests. Replays canned
+    GetFeatureInfo responses by request type (by default the synthetic
+    benchmark fixtures). The site is picked from a hash
+    of the bbox, so all three requests for a location describe the same site,
+    and repeated requests get identical responses.
+
+    latency / jitter: seconds added to every response, latency +- jitter (uniform)
+    error_rate: fraction of requests answered with error_status instead
+    """
+    daemon_threads = True
+
+    def __init__(self, address, responses: dict, latency: float = 0, jitter: float = 0,
+                 error_rate: float = 0, error_status: int = 503, seed=None):
+        super().__init__(address, StubWMSRequestHandler)
+        self.responses = responses
+        self.sites = sorted(next(iter(responses.values())))
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {request_type: 0 for request_type in (*REQUEST_TYPES, 'errors', 'unknown')}
+
+    def count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def draw(self) -> tuple[float, bool]:
+        """
+        returns (delay in seconds, whether to fail) for one request
+        """
+        with self._random_lock:
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            fail = self._random.random() < self.error_rate
+        return max(delay, 0), fail
+
+    def site_for(self, bbox: str) -> str:
+        return self.sites[int(md5(bbox.encode('utf-8')).hexdigest(), 16) % len(self.sites)]
+
+
+class StubWMSRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, as GeoServer
+    server: StubWMSServer
+
+    def do_GET(self):
+        params = {key.lower(): values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        request_type = classify_request(params)
+        delay, fail = self.server.draw()
+        if delay:
+            time.sleep(delay)
+
+        if request_type is None:
+            self.server.count('unknown')
+            self._send(400, b'Unsupported request')
+        elif fail:
+            self.server.count('errors')
+            self._send(self.server.error_status, b'Injected error')
+        else:
+            self.server.count(request_type)
+            site = self.server.site_for(params.get('bbox', ''))
+            self._send(200, self.server.responses[request_type][site], 'text/html; charset=utf-8')
+
+    def _send(self, status, body: bytes, content_type='text/plain; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
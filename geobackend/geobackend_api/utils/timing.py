@@ -0,0 +1,99 @@
+import time
+import contextvars
+import logging
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# per-request stage timings, reported in the Server-Timing header and /metrics
+REQUEST_TIMING_ENABLED = getattr(settings, 'REQUEST_TIMING_ENABLED', True)
+
+# {stage: [seconds, count]} of the request being handled, None outside a request
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class _Stage:
+    __slots__ = ('name', 'timings', 'start')
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        # stages of one request may run on several threads; a lost update only skews a header value
+        entry = self.timings.get(self.name)
+        if entry is None:
+            self.timings[self.name] = [elapsed, 1]
+        else:
+            entry[0] += elapsed
+            entry[1] += 1
+        metrics.observe_stage(self.name, elapsed)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def timed(name):
+    """
+    with timed('calculation'): ...
+    adds the block's duration to the current request's timings; outside a
+    timed request (or with REQUEST_TIMING_ENABLED off) this is a no-op.
+    Stages may nest and repeat, repeated stages are summed
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        return _NO_STAGE
+    return _Stage(name, timings)
+
+
+def start_request_timing():
+    """
+    starts collecting timings for the current context; returns a token for end_request_timing
+    """
+    return _request_timings.set({})
+
+
+def end_request_timing(token) -> dict:
+    """
+    returns {stage: (seconds, count)} collected since start_request_timing
+    """
+    timings = _request_timings.get()
+    _request_timings.reset(token)
+    return {name: tuple(entry) for name, entry in (timings or {}).items()}
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit, running fn in a copy of the caller's context so that
+    stages timed on the worker thread count towards the caller's request
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def format_server_timing(timings: dict, total: float | None = None) -> str:
+    """
+    {stage: (seconds, count)} -> 'validation;dur=1.2, calculation;dur=30.1, total;dur=35.0'
+    durations in milliseconds
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, (seconds, count) in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(entries)
@@ -0,0 +1,231 @@
+import os
+import json
+import math
+import time
+import shutil
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 'wms': GetFeatureInfo per request; 'raster': sample the local raster built by
+# `manage.py build_watertable_raster`, falling back to the WMS outside its coverage
+WATERTABLE_SOURCE = getattr(settings, 'WATERTABLE_SOURCE', 'wms')
+WATERTABLE_RASTER_PATH = getattr(settings, 'WATERTABLE_RASTER_PATH', None)
+# seconds between checks for a newly published raster
+WATERTABLE_RASTER_CHECK_INTERVAL = getattr(settings, 'WATERTABLE_RASTER_CHECK_INTERVAL', 30)
+
+RASTER_DTYPE = np.float32
+
+
+class WatertableRaster:
+    """
+    Watertable depth raster held as a memory-mapped .npy array with a JSON
+    sidecar describing its geotransform (EPSG:3857, north-up).
+
+    The array is mapped read-only, so pages are loaded on first touch and
+    shared between every worker process on the host. Cells without data
+    hold NaN.
+    """
+
+    def __init__(self, path):
+        # a published raster is a symlink into its version directory; resolving
+        # it once keeps the array and its sidecar from the same version
+        self.path = Path(path).resolve()
+        meta = json.loads(self.meta_path(self.path).read_text())
+        self.origin_x = float(meta['origin_x'])  # west edge
+        self.origin_y = float(meta['origin_y'])  # north edge
+        self.pixel_size = float(meta['pixel_size'])
+        self.data = np.load(self.path, mmap_mode='r')
+        self.height, self.width = self.data.shape
+
+    @staticmethod
+    def meta_path(path) -> Path:
+        path = Path(path)
+        return path.with_name(path.name + '.json')
+
+    @classmethod
+    def create(cls, path, origin_x: float, origin_y: float, pixel_size: float, width: int, height: int):
+        """
+        allocates an empty (all NaN) raster on disk and returns a writable memmap of it;
+        call flush() on the memmap once filled
+        """
+        path = Path(path)
+        data = np.lib.format.open_memmap(path, mode='w+', dtype=RASTER_DTYPE, shape=(height, width))
+        data[:] = np.nan
+        cls.meta_path(path).write_text(json.dumps({
+            'crs': 'epsg:3857',
+            'origin_x': origin_x,
+            'origin_y': origin_y,
+            'pixel_size': pixel_size,
+            'width': width,
+            'height': height,
+        }, indent=2))
+        return data
+
+    def pixel_index(self, x, y):
+        """
+        x, y: EPSG:3857 scalars or arrays
+        returns (col, row) as integer arrays; may fall outside the raster
+        """
+        col = np.floor((np.asarray(x, dtype=float) - self.origin_x) / self.pixel_size).astype(np.int64)
+        row = np.floor((self.origin_y - np.asarray(y, dtype=float)) / self.pixel_size).astype(np.int64)
+        return col, row
+
+    def sample_many(self, xs, ys) -> np.ndarray:
+        """
+        vectorised lookup of many points
+        xs, ys: EPSG:3857 arrays
+        returns a float64 array, NaN outside the raster or where it has no data
+        """
+        col, row = self.pixel_index(xs, ys)
+        inside = (col >= 0) & (col < self.width) & (row >= 0) & (row < self.height)
+        values = np.full(col.shape, np.nan)
+        values[inside] = self.data[row[inside], col[inside]]
+        return values
+
+    def sample(self, x, y) -> float | None:
+        """
+        x, y: EPSG:3857
+        returns the depth at the point, or None without coverage
+        """
+        col = math.floor((x - self.origin_x) / self.pixel_size)
+        row = math.floor((self.origin_y - y) / self.pixel_size)
+        if not (0 <= col < self.width and 0 <= row < self.height):
+            return None
+        value = float(self.data[row, col])
+        return None if math.isnan(value) else value
+
+
+def new_raster_version(path) -> Path:
+    """
+    path of the raster file in a new, empty version directory next to path;
+    build it there with WatertableRaster.create, then publish_raster_version
+    """
+    path = Path(path)
+    # names sort in build order, also for builds within the same second
+    version = path.with_name(path.name + '.versions') / f"{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}-{os.getpid()}"
+    version.mkdir(parents=True)
+    return version / path.name
+
+
+def publish_raster_version(path, version_path, keep: int = 2):
+    """
+    points the symlink at path to version_path in one atomic rename, so
+    readers see either the old or the new raster with its own sidecar, and
+    removes all but the keep newest versions. Workers still mapping a
+    removed version keep reading it until they reload
+    """
+    path, version_path = Path(path), Path(version_path)
+    link = path.with_name(f".{path.name}.{os.getpid()}.link")
+    link.unlink(missing_ok=True)
+    link.symlink_to(version_path.relative_to(path.parent))
+    os.replace(link, path)
+    # sidecar of a raster written in place, before versions were used
+    WatertableRaster.meta_path(path).unlink(missing_ok=True)
+    for old in sorted(version_path.parent.parent.iterdir())[:-max(keep, 1)]:
+        if old != version_path.parent:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+_raster = None
+_raster_lock = threading.Lock()
+_raster_version = None  # (resolved path, mtime) of the loaded raster
+_raster_checked_at = None
+
+
+def get_watertable_raster() -> WatertableRaster | None:
+    """
+    returns the configured raster when WATERTABLE_SOURCE is 'raster' and
+    the raster file exists, otherwise None. Every
+    WATERTABLE_RASTER_CHECK_INTERVAL seconds the path is checked again and
+    a newly published version is loaded in place of the current one
+    """
+    global _raster_checked_at
+    if WATERTABLE_SOURCE != 'raster':
+        return None
+    checked_at = _raster_checked_at
+    if checked_at is not None and time.monotonic() - checked_at < WATERTABLE_RASTER_CHECK_INTERVAL:
+        return _raster
+    with _raster_lock:
+        if _raster_checked_at is checked_at:
+            _load_published_raster()
+            _raster_checked_at = time.monotonic()
+    return _raster
+
+
+def _load_published_raster():
+    global _raster, _raster_version
+    path = Path(WATERTABLE_RASTER_PATH) if WATERTABLE_RASTER_PATH else None
+    try:
+        target = path.resolve(strict=True)
+        version = (target, target.stat().st_mtime_ns)
+    except (AttributeError, OSError):
+        if _raster is not None or _raster_checked_at is None:
+            logger.warning("WATERTABLE_SOURCE is 'raster' but %s does not exist", WATERTABLE_RASTER_PATH)
+        _raster = _raster_version = None
+        return
+    if version == _raster_version:
+        return
+    try:
+        raster = WatertableRaster(target)
+    except (OSError, ValueError, KeyError) as e:
+        # e.g. a raster written in place, caught half way; keep the current one
+        logger.warning("Could not load watertable raster %s: %s", target, e)
+        return
+    _raster, _raster_version = raster, version
+    logger.info("Sampling watertable depth from %s (%s x %s px)", target, raster.width, raster.height)
+
+
+def sample_watertable_depth(bbox_params) -> float | None:
+    """
+    samples the raster at the centre of a WMS bbox, the pixel GetFeatureInfo queries
+    """
+    raster = get_watertable_raster()
+    if raster is None:
+        return None
+    minx, miny, maxx, maxy = (float(v) for v in bbox_params[0].split(','))
+    return raster.sample((minx + maxx) / 2, (miny + maxy) / 2)
+
+
+def sample_watertable_depths(points) -> np.ndarray | None:
+    """
+    points: array-like of shape (n, 2), EPSG:3857
+    returns depths in input order (NaN without coverage), or None when no raster is configured
+    """
+    raster = get_watertable_raster()
+    if raster is None:
+        return None
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    return raster.sample_many(points[:, 0], points[:, 1])
+
+
+def parse_arc_grid(text: str):
+    """
+    parses an ESRI ASCII grid (GeoServer WCS 'ArcGrid' output)
+    returns (array with NaN for nodata, west edge, north edge, cell size)
+    """
+    header = {}
+    lines = text.splitlines()
+    index = 0
+    while index < len(lines):
+        parts = lines[index].split()
+        if len(parts) != 2 or not parts[0][0].isalpha():
+            break
+        header[parts[0].lower()] = float(parts[1])
+        index += 1
+    ncols, nrows, cell_size = int(header['ncols']), int(header['nrows']), header['cellsize']
+    west = header['xllcorner'] if 'xllcorner' in header else header['xllcenter'] - cell_size / 2
+    south = header['yllcorner'] if 'yllcorner' in header else header['yllcenter'] - cell_size / 2
+    values = np.array(' '.join(lines[index:]).split(), dtype=RASTER_DTYPE)
+    if values.size != ncols * nrows:
+        raise ValueError(f"ArcGrid has {values.size} values, expected {ncols} x {nrows}")
+    values = values.reshape(nrows, ncols)
+    if 'nodata_value' in header:
+        values[values == header['nodata_value']] = np.nan
+    return values, west, south + nrows * cell_size, cell_size
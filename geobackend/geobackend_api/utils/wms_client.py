@@ -0,0 +1,92 @@
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'
+}
+
+WMS_CONNECT_TIMEOUT = getattr(settings, 'WMS_CONNECT_TIMEOUT', 5)
+WMS_READ_TIMEOUT = getattr(settings, 'WMS_READ_TIMEOUT', 30)
+WMS_POOL_CONNECTIONS = getattr(settings, 'WMS_POOL_CONNECTIONS', 4)  # number of hosts kept pooled
+WMS_POOL_MAXSIZE = getattr(settings, 'WMS_POOL_MAXSIZE', 16)  # connections kept alive per host
+
+
+class WMSClient:
+    """
+    Shared HTTP client for GeoServer WMS calls.
+
+    Wraps a single requests.Session so that connections to each host are
+    pooled and kept alive across requests. urllib3's pool manager is
+    thread-safe, so one instance is shared by every worker thread.
+    """
+
+    def __init__(self,
+                 connect_timeout: float = WMS_CONNECT_TIMEOUT,
+                 read_timeout: float = WMS_READ_TIMEOUT,
+                 pool_connections: int = WMS_POOL_CONNECTIONS,
+                 pool_maxsize: int = WMS_POOL_MAXSIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=False)
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def get(self, url, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def get_pool_stats(self) -> dict:
+        """
+        returns per-host connection counts:
+        opened: new TCP(+TLS) connections made
+        requests: requests sent through the pool
+        reused: requests served on an already open connection
+        """
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            opened, sent = pool.num_connections, pool.num_requests
+            stats[host] = {
+                'opened': opened,
+                'requests': sent,
+                'reused': max(sent - opened, 0),
+            }
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_wms_client() -> WMSClient:
+    """
+    returns the process-wide WMS client, creating it on first use
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WMSClient()
+                logger.info("WMS client initialised: timeout=%s, pool_maxsize=%s",
+                            _client.timeout, WMS_POOL_MAXSIZE)
+    return _client
+
+
+def get_pool_stats() -> dict:
+    return get_wms_client().get_pool_stats()
@@ -0,0 +1,207 @@
+"""
+Targeted streaming parsers for the three GeoServer GetFeatureInfo
+response shapes used by data_fetch_utils.
+
+They run html.parser's tokenizer directly and keep only the text of the
+elements they need, instead of building a full BeautifulSoup tree, and
+return exactly what the original BeautifulSoup lookups select. Both
+backends are kept behind the same interface; see get_parser_backend.
+"""
+from html.parser import HTMLParser
+from types import SimpleNamespace
+
+from bs4 import BeautifulSoup
+
+
+class _DivRecord:
+    __slots__ = ('classes', 'parts', 'descendants')
+
+    def __init__(self, classes):
+        self.classes = classes
+        self.parts = []
+        self.descendants = None  # only collected for div.row
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+class _DivTextParser(HTMLParser):
+    """
+    tracks open <div> elements and collects the text of the ones that match:
+    div.aquifer-id (text) and div.row (text of every descendant div)
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._open = []
+        self._capturing = []  # open records whose text is needed
+        self._rows = []  # open div.row records
+        self.aquifer_ids = []
+        self.rows = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'div':
+            return
+        classes = ()
+        for name, value in attrs:
+            if name == 'class' and value:
+                classes = value.split()
+        record = _DivRecord(classes)
+        if self._rows:
+            for row in self._rows:
+                row.descendants.append(record)
+            self._capturing.append(record)
+        if 'aquifer-id' in classes:
+            self.aquifer_ids.append(record)
+            if record not in self._capturing:
+                self._capturing.append(record)
+        if 'row' in classes:
+            record.descendants = []
+            self._rows.append(record)
+            self.rows.append(record)
+        self._open.append(record)
+
+    def handle_endtag(self, tag):
+        if tag != 'div' or not self._open:
+            return
+        record = self._open.pop()
+        if self._capturing and self._capturing[-1] is record:
+            self._capturing.pop()
+        if self._rows and self._rows[-1] is record:
+            self._rows.pop()
+
+    def handle_data(self, data):
+        for record in self._capturing:
+            record.parts.append(data)
+
+
+# elements without an end tag, which html.parser reports as start tags only
+_VOID_ELEMENTS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                            'link', 'meta', 'source', 'track', 'wbr'))
+
+
+class _WatertableParser(HTMLParser):
+    """
+    finds the first <td> whose string is the label and returns the text of
+    the next <td> in document order. As with bs4's .string, the label may
+    sit inside a chain of single children, e.g. <td><b>label</b></td>
+    """
+
+    def __init__(self, label):
+        super().__init__(convert_charrefs=True)
+        self.label = label
+        self._td_parts = None
+        self._children = []  # child counts of the open elements inside the current <td>
+        self._td_single = True
+        self._label_found = False
+        self.value = None
+
+    def _add_child(self):
+        self._children[-1] += 1
+        if self._children[-1] > 1:
+            self._td_single = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.value is not None:
+            return
+        if tag == 'td':
+            self._td_parts = []
+            self._children = [0]
+            self._td_single = True
+        elif self._td_parts is not None:
+            self._add_child()
+            if tag not in _VOID_ELEMENTS:
+                self._children.append(0)
+
+    def handle_endtag(self, tag):
+        if self._td_parts is None or self.value is not None:
+            return
+        if tag != 'td':
+            if len(self._children) > 1:
+                self._children.pop()
+            return
+        text = ''.join(self._td_parts)
+        if self._label_found:
+            self.value = text
+        elif self._td_single and text == self.label:
+            self._label_found = True
+        self._td_parts = None
+
+    def handle_data(self, data):
+        if self._td_parts is not None and self.value is None:
+            self._td_parts.append(data)
+            self._add_child()
+
+
+def extract_aquifer_ids(html: str) -> list:
+    """
+    texts of every div.aquifer-id, in document order
+    """
+    parser = _DivTextParser()
+    parser.feed(html)
+    parser.close()
+    return [record.text for record in parser.aquifer_ids]
+
+
+def extract_rows(html: str) -> list:
+    """
+    (key, value) texts, stripped, of every div.row that contains exactly two divs
+    """
+    parser = _DivTextParser()
+    parser.feed(html)
+    parser.close()
+    return [(row.descendants[0].text.strip(), row.descendants[1].text.strip())
+            for row in parser.rows if len(row.descendants) == 2]
+
+
+def extract_watertable_text(html: str, label: str = 'Depth to watertable'):
+    """
+    text of the cell following the label cell, or None if either is missing
+    """
+    parser = _WatertableParser(label)
+    parser.feed(html)
+    parser.close()
+    return parser.value
+
+
+# reference implementation, the lookups data_fetch_utils used originally
+def bs4_extract_aquifer_ids(html: str) -> list:
+    soup = BeautifulSoup(html, 'html.parser')
+    return [code.text for code in soup.find_all('div', class_='aquifer-id')]
+
+
+def bs4_extract_rows(html: str) -> list:
+    soup = BeautifulSoup(html, 'html.parser')
+    rows = []
+    for row in soup.find_all('div', class_='row'):
+        cols = row.find_all('div')
+        if len(cols) == 2:
+            rows.append((cols[0].text.strip(), cols[1].text.strip()))
+    return rows
+
+
+def bs4_extract_watertable_text(html: str, label: str = 'Depth to watertable'):
+    soup = BeautifulSoup(html, 'html.parser')
+    label_cell = soup.find('td', string=label)
+    if label_cell is None:
+        return None
+    value_cell = label_cell.find_next('td')
+    return None if value_cell is None else value_cell.text
+
+
+PARSER_BACKENDS = {
+    'fast': SimpleNamespace(aquifer_ids=extract_aquifer_ids,
+                            rows=extract_rows,
+                            watertable_text=extract_watertable_text),
+    'bs4': SimpleNamespace(aquifer_ids=bs4_extract_aquifer_ids,
+                           rows=bs4_extract_rows,
+                           watertable_text=bs4_extract_watertable_text),
+}
+
+
+def get_parser_backend(name: str = 'fast'):
+    try:
+        return PARSER_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown WMS HTML parser backend: {name}") from None
@@ -0,0 +1,173 @@
+import atexit
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# what put() does when the queue is full
+OVERFLOW_SYNC = 'sync'  # write the item on the caller's thread
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # discard the new item
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # discard the oldest queued item
+OVERFLOW_POLICIES = (OVERFLOW_SYNC, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST)
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue drained by a background thread that hands items to
+    write_batch in batches of up to batch_size, at least every
+    flush_interval seconds. Items sharing a key are coalesced within a
+    batch, last write wins. Pending items are flushed at interpreter exit.
+
+    on_discard, if given, is called with the items that will never be
+    written: those dropped by the overflow policy and those of a failed batch.
+    """
+
+    def __init__(self, write_batch, key=None, max_size: int = 1000, batch_size: int = 100,
+                 flush_interval: float = 0.5, overflow: str = OVERFLOW_SYNC, name: str = 'write-behind',
+                 on_discard=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.write_batch = write_batch
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.name = name
+        self.on_discard = on_discard
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'dropped': 0, 'sync_writes': 0, 'failed': 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _discard(self, items):
+        if self.on_discard is None:
+            return
+        try:
+            self.on_discard(items)
+        except Exception:
+            logger.exception("%s discard callback failed", self.name)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {**self._stats, 'pending': self._queue.qsize()}
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def try_put(self, item) -> bool:
+        """
+        queues item if there is room, without applying the overflow policy
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            return False
+        self._count('queued')
+        return True
+
+    def write_now(self, item):
+        """
+        writes item on the calling thread, bypassing the queue
+        """
+        self._write([item])
+        self._count('sync_writes')
+
+    def put(self, item):
+        """
+        queues item for writing; applies the overflow policy when full
+        """
+        if self.try_put(item):
+            return
+
+        if self.overflow == OVERFLOW_SYNC:
+            logger.warning("%s queue full, writing on the request thread", self.name)
+            self.write_now(item)
+        elif self.overflow == OVERFLOW_DROP_NEWEST:
+            logger.warning("%s queue full, dropping the new item", self.name)
+            self._count('dropped')
+            self._discard([item])
+        else:
+            try:
+                oldest = self._queue.get_nowait()
+                self._count('dropped')
+                logger.warning("%s queue full, dropped the oldest item", self.name)
+                self._discard([oldest])
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+                self._count('queued')
+            except queue.Full:
+                self._count('dropped')
+                self._discard([item])
+
+    def _drain(self, first) -> list:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        if self.key is not None:
+            # last write wins within a batch
+            batch = list({self.key(item): item for item in batch}.values())
+        try:
+            self.write_batch(batch)
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception:
+            self._count('failed', len(batch))
+            logger.exception("%s failed to write %d item(s)", self.name, len(batch))
+            self._discard(batch)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # give concurrent requests a moment to join the batch
+            deadline = time.monotonic() + self.flush_interval
+            batch = self._drain(first)
+            while len(batch) < self.batch_size and time.monotonic() < deadline \
+                    and not self._stopping.is_set():
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def flush(self):
+        """
+        writes everything queued so far on the calling thread
+        """
+        while True:
+            try:
+                first = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._write(self._drain(first))
+
+    def close(self, timeout: float = 5):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
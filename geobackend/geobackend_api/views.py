@@ -2,77 +2,61 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.throttling import AnonRateThrottle
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from hashlib import blake2b
+import orjson
 import logging
 
 
 from .models import *
 from .serializers import *
 # from .utils.data_fetch_utils import generate_formatted_depth_data, fetch_watertable_depth
-from .utils.serialization_utils import GeoDjangoJSONEncoder
+from .utils.serialization_utils import encode_results
+from .utils.timing import timed
+from .utils.logging_utils import Truncated, sample_payload
+from .utils import metrics
+from .throttling import AsyncAnonRateThrottle
 
-from .services.calculation_service import perform_wellbore_calculation
-from .services.data_fetch_service import fetch_depth_data_and_watertable
+from .services.calculation_service import (perform_wellbore_calculation, perform_cached_wellbore_calculation,
+                                           aperform_cached_wellbore_calculation, complete_initial_input_values,
+                                           CalculationQueueFullError, CalculationTimeoutError)
+from .services.data_fetch_service import fetch_depth_data_and_watertable, afetch_depth_data_and_watertable
+from .services.batch_service import run_batch_calculation
+from .services.sweep_service import run_parameter_sweep
+from .services.result_service import save_calculation_result, asave_calculation_result, load_calculation_result
 
-import json
 
 
 logger = logging.getLogger(__name__)
 
+RESULT_CACHE_CONTROL = getattr(settings, 'RESULT_CACHE_CONTROL', 'private, no-cache')
 
-class WellBoreCalcView(APIView):
-    throttle_classes = [AnonRateThrottle]
 
-    def post(self, request, *args, **kwargs):
-        data = request.data
-        session_key = self.get_or_create_session_key(request=request)
-        depth_data = {}  # initialise depth data
-        logger.info(f"Session {session_key} - Received data: {data}")
+class WellBoreCalcMixin:
+    """
+    Stages shared by the sync and async wellbore calculation views
+    """
 
-        # stage 1. validate the user input
+    def validate_user_input(self, data, session_key):
         serializer = UserInputSerializer(data=data)
-        if not serializer.is_valid():
+        with timed('validation'):
+            is_valid = serializer.is_valid()
+        if not is_valid:
             logger.error(
-                f"Session {session_key} - User input validation failed: {serializer.errors}")
-            return self.create_response(message="Invalid input data.",
-                                        details=serializer.errors,
-                                        status=status.HTTP_400_BAD_REQUEST)
+                "Session %s - User input validation failed: %s", session_key, serializer.errors)
+            return None, self.create_response(message="Invalid input data.",
+                                              details=serializer.errors,
+                                              status=status.HTTP_400_BAD_REQUEST)
+        return serializer.validated_data, None
 
-        validated_data = serializer.validated_data
-
-        # stage 2. fetch WMS aquifer/groundwater data
-        coordinates = validated_data['coordinates']
-        crs_type = validated_data['crs_type']
-        min_resolution = validated_data['min_resolution']
-        pixels = validated_data['pixels']
-        initial_input_values = validated_data['initial_input_values']
-        is_production_pump = validated_data['is_production_pump']
-
-        # query WMS data
-        try:
-            depth_data, watertable_depth = fetch_depth_data_and_watertable(coordinates=coordinates,
-                                                                           min_resolution=min_resolution,
-                                                                           pixels=pixels,
-                                                                           crs_type=crs_type)
-            logger.info(
-                f"Session {session_key} - Fetched depth data and watertable depth")
-            logger.info(
-                depth_data)
-            logger.info(f"watertable depth: {watertable_depth} m")
-        except Exception as e:
-            # logger.error(
-            #     f"Session {session_key} - Error fetching WMS data: {e}")
-            return self.create_response(message="Error fetching data.",
-                                        details=str(e),
-                                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        # logger.info(f'Session {session_key} - {depth_data}')
-        # logger.info(f'Session {session_key} - WMS depth: {watertable_depth}')
-
-        # stage 3. validate calculation input
-        initial_input_values['groundwater_depth'] = watertable_depth
-        initial_input_values['top_aquifer_layer'] = depth_data['aquifer_layer'][0]
-
-        # lower tertiary aquifer
-        initial_input_values['target_aquifer_layer'] = '111lta'
+    def validate_calculation_input(self, is_production_pump, depth_data,
+                                   watertable_depth, initial_input_values, session_key):
+        complete_initial_input_values(initial_input_values, depth_data, watertable_depth)
 
         calculation_input_serializer = CalculationInputSerializer(
             data={
@@ -81,41 +65,48 @@ class WellBoreCalcView(APIView):
                 "initial_input_values": initial_input_values,
             }
         )
-        if not calculation_input_serializer.is_valid():
+        with timed('validation'):
+            is_valid = calculation_input_serializer.is_valid()
+        if not is_valid:
             logger.error(
-                f"Session {session_key} - Calculation input serialization failed: {calculation_input_serializer.errors}")
+                "Session %s - Calculation input serialization failed: %s",
+                session_key, calculation_input_serializer.errors)
             return self.create_response(
                 message='Failed serialization.',
                 data={"aquifer_table": depth_data},
                 details=calculation_input_serializer.errors,
                 status=status.HTTP_400_BAD_REQUEST)
+        return None
 
-        try:
-            results = perform_wellbore_calculation(
-                is_production_pump, depth_data, initial_input_values)
-            logger.info(f"Session {session_key} - Calculation successful.")
-        except ValueError as e:
+    def fetch_error_response(self, e):
+        return self.create_response(message="Error fetching data.",
+                                    details=str(e),
+                                    status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def calculation_error_response(self, e, depth_data):
+        if isinstance(e, CalculationQueueFullError):
+            return self.create_response('Calculation service is busy.',
+                                        data={"aquifer_table": depth_data},
+                                        details=str(e),
+                                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if isinstance(e, CalculationTimeoutError):
+            return self.create_response('Calculation timed out.',
+                                        data={"aquifer_table": depth_data},
+                                        details=str(e),
+                                        status=status.HTTP_504_GATEWAY_TIMEOUT)
+        if isinstance(e, ValueError):
             return self.create_response(
                 message='Error during calculation:\n',
                 data={"aquifer_table": depth_data},
                 details=str(e),
                 status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            return self.create_response('An error occurred during calculation.',
-                                        data={"aquifer_table": depth_data},
-                                        details=str(e),
-                                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                                        )
-
-        # TODO: exporting the results to dict format
-        json_results = json.dumps(results, cls=GeoDjangoJSONEncoder)
+        return self.create_response('An error occurred during calculation.',
+                                    data={"aquifer_table": depth_data},
+                                    details=str(e),
+                                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                                    )
 
-        # Save the results to the model
-        _, created = WellBoreCalculationResult.objects.update_or_create(
-            session_key=session_key, result_data=json_results)
-
-        logger.info(
-            f"Session {session_key} - {'Created' if created else 'Updated'} WellBoreCalculationResult results for {session_key}")
+    def success_response(self, depth_data, results):
         return self.create_response(message='Calculation successful',
                                     data={
                                         "aquifer_table": depth_data,
@@ -124,11 +115,6 @@ class WellBoreCalcView(APIView):
                                     },
                                     status=status.HTTP_200_OK)
 
-    def get_or_create_session_key(self, request):
-        if not request.session.session_key:
-            request.session.create()
-        return request.session.session_key
-
     def create_response(self,
                         message,
                         data=None,
@@ -143,11 +129,276 @@ class WellBoreCalcView(APIView):
         }, status=status)
 
 
-class TestWellboreCalculationView(APIView):
+class WellBoreCalcView(WellBoreCalcMixin, APIView):
+    throttle_classes = [AnonRateThrottle]
+
     def post(self, request, *args, **kwargs):
         data = request.data
+        # the session is only created once there are results to store under it
+        session_key = request.session.session_key
+        depth_data = {}  # initialise depth data
+        if sample_payload():
+            logger.info("Session %s - Received data: %s", session_key, Truncated(data))
+
+        # stage 1. validate the user input
+        validated_data, error_response = self.validate_user_input(data, session_key)
+        if error_response is not None:
+            return error_response
+
+        # stage 2. fetch WMS aquifer/groundwater data
+        coordinates = validated_data['coordinates']
+        crs_type = validated_data['crs_type']
+        min_resolution = validated_data['min_resolution']
+        pixels = validated_data['pixels']
+        initial_input_values = validated_data['initial_input_values']
+        is_production_pump = validated_data['is_production_pump']
+
+        # query WMS data
+        try:
+            depth_data, watertable_depth = fetch_depth_data_and_watertable(coordinates=coordinates,
+                                                                           min_resolution=min_resolution,
+                                                                           pixels=pixels,
+                                                                           crs_type=crs_type)
+            logger.info("Session %s - Fetched depth data and watertable depth", session_key)
+            logger.debug("Session %s - depth data: %s, watertable depth: %s m",
+                         session_key, Truncated(depth_data), watertable_depth)
+        except Exception as e:
+            return self.fetch_error_response(e)
+
+        # stage 3. validate calculation input
+        error_response = self.validate_calculation_input(is_production_pump, depth_data,
+                                                         watertable_depth, initial_input_values,
+                                                         session_key)
+        if error_response is not None:
+            return error_response
+
+        try:
+            results, json_results = perform_cached_wellbore_calculation(
+                is_production_pump, depth_data, initial_input_values)
+            logger.info("Session %s - Calculation successful.", session_key)
+        except Exception as e:
+            return self.calculation_error_response(e, depth_data)
+
+        # Save the results to the model, off the request path
+        with timed('persistence'):
+            session_key = self.get_or_create_session_key(request=request)
+            save_calculation_result(session_key, json_results)
+        logger.info("Session %s - Queued WellBoreCalculationResult", session_key)
+        return self.success_response(depth_data, results)
+
+    def get_or_create_session_key(self, request):
         if not request.session.session_key:
             request.session.create()
+        return request.session.session_key
+
+
+class AsyncWellBoreCalcView(WellBoreCalcMixin, AsyncAPIView):
+    """
+    asyncio implementation of WellBoreCalcView for ASGI deployments.
+    WMS and Redis waits are awaited on the event loop, and the
+    calculation itself runs on the calculation thread pool.
+    """
+    throttle_classes = [AsyncAnonRateThrottle]
+
+    async def post(self, request, *args, **kwargs):
+        data = request.data
+        # the key comes from the cookie; the session is not loaded here
+        session_key = request.session.session_key
+        depth_data = {}  # initialise depth data
+        if sample_payload():
+            logger.info("Session %s - Received data: %s", session_key, Truncated(data))
+
+        # stage 1. validate the user input
+        validated_data, error_response = self.validate_user_input(data, session_key)
+        if error_response is not None:
+            return error_response
+
+        # stage 2. fetch WMS aquifer/groundwater data
+        coordinates = validated_data['coordinates']
+        crs_type = validated_data['crs_type']
+        min_resolution = validated_data['min_resolution']
+        pixels = validated_data['pixels']
+        initial_input_values = validated_data['initial_input_values']
+        is_production_pump = validated_data['is_production_pump']
+
+        try:
+            depth_data, watertable_depth = await afetch_depth_data_and_watertable(coordinates=coordinates,
+                                                                                  min_resolution=min_resolution,
+                                                                                  pixels=pixels,
+                                                                                  crs_type=crs_type)
+            logger.info("Session %s - Fetched depth data and watertable depth", session_key)
+            logger.debug("Session %s - depth data: %s, watertable depth: %s m",
+                         session_key, Truncated(depth_data), watertable_depth)
+        except Exception as e:
+            return self.fetch_error_response(e)
+
+        # stage 3. validate calculation input
+        error_response = self.validate_calculation_input(is_production_pump, depth_data,
+                                                         watertable_depth, initial_input_values,
+                                                         session_key)
+        if error_response is not None:
+            return error_response
+
+        try:
+            results, json_results = await aperform_cached_wellbore_calculation(
+                is_production_pump, depth_data, initial_input_values)
+            logger.info("Session %s - Calculation successful.", session_key)
+        except Exception as e:
+            return self.calculation_error_response(e, depth_data)
+
+        with timed('persistence'):
+            session_key = await self.aget_or_create_session_key(request=request)
+            await asave_calculation_result(session_key, json_results)
+        logger.info("Session %s - Queued WellBoreCalculationResult", session_key)
+        return self.success_response(depth_data, results)
+
+    async def aget_or_create_session_key(self, request):
+        if not request.session.session_key:
+            await sync_to_async(request.session.create)()
+        return request.session.session_key
+
+
+class WellBoreBatchCalcView(WellBoreCalcMixin, APIView):
+    """
+    Runs the wellbore calculation for a list of sites in one request.
+    Per-site failures are reported in the results instead of failing the batch.
+    """
+    throttle_classes = [AnonRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchUserInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error("Batch input validation failed: %s", serializer.errors)
+            return self.create_response(message="Invalid input data.",
+                                        details=serializer.errors,
+                                        status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        try:
+            results, summary = run_batch_calculation(
+                sites=validated_data['sites'],
+                crs_type=validated_data['crs_type'],
+                min_resolution=validated_data['min_resolution'],
+                pixels=validated_data['pixels'],
+                is_production_pump=validated_data['is_production_pump'],
+                initial_input_values=validated_data.get('initial_input_values'),
+            )
+        except Exception as e:
+            # per-site errors are reported in the results; this is a batch-wide failure
+            logger.error("Batch calculation failed: %s", e)
+            return self.fetch_error_response(e)
+        return self.create_response(message='Batch calculation complete',
+                                    data={"results": results},
+                                    details=summary,
+                                    status=status.HTTP_200_OK)
+
+
+class WellBoreSweepCalcView(WellBoreCalcMixin, APIView):
+    """
+    Evaluates the wellbore calculation at one site for every combination
+    of the swept input values. The site's WMS data is fetched once.
+    """
+    throttle_classes = [AnonRateThrottle]
+
+    def post(self, request, *args, **kwargs):
+        serializer = SweepUserInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error("Sweep input validation failed: %s", serializer.errors)
+            return self.create_response(message="Invalid input data.",
+                                        details=serializer.errors,
+                                        status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        initial_input_values = validated_data['initial_input_values']
+        is_production_pump = validated_data['is_production_pump']
+        try:
+            depth_data, watertable_depth = fetch_depth_data_and_watertable(
+                coordinates=validated_data['coordinates'],
+                min_resolution=validated_data['min_resolution'],
+                pixels=validated_data['pixels'],
+                crs_type=validated_data['crs_type'])
+        except Exception as e:
+            return self.fetch_error_response(e)
+
+        # the base inputs are validated once; swept values were validated by the serializer
+        error_response = self.validate_calculation_input(is_production_pump, depth_data,
+                                                         watertable_depth, initial_input_values,
+                                                         session_key=None)
+        if error_response is not None:
+            return error_response
+
+        try:
+            table, summary = run_parameter_sweep(is_production_pump, depth_data, initial_input_values,
+                                                 sweep=validated_data['sweep'],
+                                                 outputs=validated_data.get('outputs'))
+        except Exception as e:
+            return self.calculation_error_response(e, depth_data)
+        return self.create_response(message='Parameter sweep complete',
+                                    data={"aquifer_table": depth_data,
+                                          "watertable_depth": watertable_depth,
+                                          "results": table},
+                                    details=summary,
+                                    status=status.HTTP_200_OK)
+
+
+class WellBoreResultView(WellBoreCalcMixin, APIView):
+    """
+    Returns the results last stored for the session. Responses carry a content-hash
+    ETag, so revisits revalidate with If-None-Match instead of recalculating.
+    """
+
+    def get(self, request, *args, **kwargs):
+        # reading results never starts a session
+        session_key = request.session.session_key
+        json_results = load_calculation_result(session_key) if session_key else None
+        if json_results is None:
+            return self.create_response(message='No results for this session.',
+                                        status=status.HTTP_404_NOT_FOUND)
+
+        etag = result_etag(json_results)
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.create_response(message='Stored calculation results',
+                                            data=orjson.Fragment(json_results),
+                                            status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        response['Cache-Control'] = RESULT_CACHE_CONTROL
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+
+def result_etag(json_results) -> str:
+    if isinstance(json_results, str):
+        json_results = json_results.encode('utf-8')
+    return quote_etag(blake2b(json_results, digest_size=16).hexdigest())
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """
+    If-None-Match uses weak comparison: W/"x" matches "x", and * matches anything
+    """
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in etags)
+
+
+def metrics_view(request):
+    """
+    Prometheus metrics of this process, see utils.metrics
+    """
+    if not metrics.METRICS_ENABLED:
+        return HttpResponse('Metrics are disabled.', status=404, content_type='text/plain')
+    if request.META.get('REMOTE_ADDR') not in metrics.METRICS_ALLOWED_IPS:
+        return HttpResponse('Forbidden.', status=403, content_type='text/plain')
+    body, content_type = metrics.render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+class TestWellboreCalculationView(APIView):
+    def post(self, request, *args, **kwargs):
+        data = request.data
 
         # extract parameters from request
         is_production_pump = data["is_production_pump"]
@@ -157,13 +408,13 @@ class TestWellboreCalculationView(APIView):
         # convert depth data to pandas dataframe
         results = perform_wellbore_calculation(
             is_production_pump, depth_data, initial_input_values)
-        json_results = json.dumps(results, cls=GeoDjangoJSONEncoder)
+        results, json_results = encode_results(results)
         # Save the results to the model
 
+        if not request.session.session_key:
+            request.session.create()
         session_key = request.session.session_key
-        _, created = WellBoreCalculationResult.objects.update_or_create(
-            session_key=session_key, result_data=json_results)
-        logging.info(
-            f"{'Created' if created else 'Updated'} WellBoreCalculationResult results for {session_key}")
+        save_calculation_result(session_key, json_results)
+        logger.info("Queued WellBoreCalculationResult results for %s", session_key)
 
         return Response({'data': results}, status=status.HTTP_200_OK)